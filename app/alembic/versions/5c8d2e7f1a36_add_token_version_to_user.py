@@ -0,0 +1,24 @@
+"""Add token_version to user
+
+Revision ID: 5c8d2e7f1a36
+Revises: e4a7c1b93d05
+Create Date: 2026-10-18 16:02:41.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8d2e7f1a36'
+down_revision = 'e4a7c1b93d05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('users', 'token_version')
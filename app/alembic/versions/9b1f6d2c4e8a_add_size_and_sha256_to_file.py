@@ -0,0 +1,28 @@
+"""Add size and sha256 to file
+
+Revision ID: 9b1f6d2c4e8a
+Revises: 5034f9c72f24
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1f6d2c4e8a'
+down_revision = '5034f9c72f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('files', sa.Column('size', sa.BigInteger(), nullable=True))
+    op.add_column('files', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_files_sha256'), 'files', ['sha256'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_files_sha256'), table_name='files')
+    op.drop_column('files', 'sha256')
+    op.drop_column('files', 'size')
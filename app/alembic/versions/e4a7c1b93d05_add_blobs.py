@@ -0,0 +1,38 @@
+"""Add blobs
+
+Revision ID: e4a7c1b93d05
+Revises: 9b1f6d2c4e8a
+Create Date: 2026-10-18 14:37:09.284615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c1b93d05'
+down_revision = '9b1f6d2c4e8a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('filename', sa.String(length=69), nullable=False),
+    sa.Column('media_type', sa.String(length=32), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256'),
+    sa.UniqueConstraint('filename')
+    )
+    op.alter_column('files', 'filename', existing_type=sa.String(length=41), type_=sa.String(length=69), existing_nullable=False)
+    op.drop_constraint('files_filename_key', 'files', type_='unique')
+    op.create_index(op.f('ix_files_filename'), 'files', ['filename'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_files_filename'), table_name='files')
+    op.create_unique_constraint('files_filename_key', 'files', ['filename'])
+    op.alter_column('files', 'filename', existing_type=sa.String(length=69), type_=sa.String(length=41), existing_nullable=False)
+    op.drop_table('blobs')
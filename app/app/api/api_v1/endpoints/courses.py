@@ -1,24 +1,28 @@
 import logging
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
+from app.api.serialization import orm_response
+from app.crud.loaders import Selection
 from app.exceptions import ConflictException, NotFoundException
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Course])
 def read_courses(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
+    selection: Optional[Selection] = Depends(deps.get_selection),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("course")),
 ) -> Any:
-    return crud.course.get_multi(db, skip=skip, limit=limit)
+    courses = pagination.paginate(db, crud.course.with_selection(selection))
+    return orm_response(schemas.Course, courses, pagination.response, selection)
 
 
 @router.get("/{course_id}", response_model=schemas.Course)
@@ -26,10 +30,11 @@ def read_course_by_id(
     *,
     db: Session = Depends(deps.get_db),
     course_id: str,
+    selection: Optional[Selection] = Depends(deps.get_selection),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("course")),
 ) -> Any:
-    if course := crud.course.get(db, id=course_id):
-        return course
+    if course := crud.course.with_selection(selection).get(db, id=course_id):
+        return orm_response(schemas.Course, course, selection=selection)
     raise NotFoundException(detail="The course with this ID does not exist!")
 
 
@@ -55,6 +60,31 @@ def create_course(
     return crud.course.create(db, obj_in=course_in)
 
 
+@router.post("/bulk", response_model=list[schemas.Course])
+def create_courses(
+    *,
+    db: Session = Depends(deps.get_db),
+    courses_in: list[schemas.CourseCreate],
+    current_admin: models.Admin = Depends(deps.get_current_admin_with_permission("course")),
+) -> Any:
+    """
+    Create several courses in a single transaction, rejecting the whole batch if any of them already exists
+    """
+    details = [(course_in.name, course_in.course_code, course_in.term_id) for course_in in courses_in]
+    if len(set(details)) != len(details):
+        raise ConflictException(detail="The same course was passed more than once!")
+    if existing := crud.course.get_multi_by_details(db, objs_in=courses_in):
+        raise ConflictException(
+            detail={
+                "msg": "Courses with these details already exist in the system!",
+                "courses": [course.id for course in existing],
+            }
+        )
+
+    logging.info(f"Admin {current_admin.user_id} ({current_admin.user.email}) is creating {len(courses_in)} Courses")
+    return crud.course.create_multi(db, objs_in=courses_in)
+
+
 @router.put("/{course_id}", response_model=schemas.Course)
 def update_course(
     *,
@@ -1,13 +1,17 @@
 import logging
 from collections import defaultdict
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Depends
 from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
+from app.api.serialization import ndjson_response, orm_response
+from app.crud.loaders import Selection
 from app.exceptions import (
     BadRequestException,
     ConflictException,
@@ -16,47 +20,61 @@ from app.exceptions import (
 )
 from app.schemas import AdminPermissions
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Division])
-def read_divisions(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
-    _: models.Admin = Depends(deps.get_current_admin_with_permission("course")),
+async def read_divisions(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    pagination: deps.Pagination = Depends(),
+    selection: Optional[Selection] = Depends(deps.get_selection),
+    _: models.Admin = Depends(deps.get_current_admin_with_permission_async("course")),
 ) -> Any:
-    return crud.division.get_multi(db, skip=skip, limit=limit)
+    divisions = await pagination.paginate_async(db, crud.division_async.with_selection(selection))
+    return orm_response(schemas.Division, divisions, pagination.response, selection)
 
 
 @router.get("/{division_id}", response_model=schemas.Division)
-def read_division_by_id(
+async def read_division_by_id(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_read_db),
     division_id: str,
-    _: models.Admin = Depends(deps.get_current_admin_with_permission("course")),
+    selection: Optional[Selection] = Depends(deps.get_selection),
+    _: models.Admin = Depends(deps.get_current_admin_with_permission_async("course")),
 ) -> Any:
-    if division := crud.division.get(db, id=division_id):
-        return division
+    if division := await crud.division_async.with_selection(selection).get(db, id=division_id):
+        return orm_response(schemas.Division, division, selection=selection)
     raise NotFoundException(detail="The division with this ID does not exist!")
 
 
 @router.get("/{division_id}/students", response_model=list[schemas.Student])
-def read_division_students_by_id(
-    division_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_db)
+async def read_division_students_by_id(
+    division_id: str,
+    stream: bool = Depends(deps.wants_ndjson),
+    current_user: models.User = Depends(deps.get_current_user_async),
+    db: AsyncSession = Depends(deps.get_async_read_db),
 ) -> Any:
     """
-    Get all students for a specific division by ID.
+    Get all students for a specific division by ID. Streamed as newline-delimited JSON with
+    `Accept: application/x-ndjson`.
     """
     # Fetch division with the corresponding ID from DB
-    if division := crud.division.get(db, id=division_id):
+    if division := await crud.division_async.get(db, id=division_id):
         # Return the fetched object if current_user is the professor for the division
         # or admin with required perms
         if current_user.id == division.professor_id or (
-            (admin := crud.admin.get(db, id=current_user.id))
+            (admin := await crud.admin_async.get(db, id=current_user.id))
             and AdminPermissions(admin.permissions).is_allowed("course")
         ):
-            return list(division.students)
+            if stream:
+                return ndjson_response(
+                    schemas.Student,
+                    db,
+                    lambda stream_db: crud.student_async.stream(
+                        stream_db, crud.student_async.select_by_division(division_id=division_id)
+                    ),
+                )
+            return await crud.student_async.get_by_division(db, division_id=division_id)
 
         raise ForbiddenException(detail="The user doesn't have enough privileges")
 
@@ -66,28 +84,35 @@ def read_division_students_by_id(
 
 
 @router.get("/{division_id}/students/{batch_number}", response_model=list[schemas.Student])
-def read_division_batch_students_by_id(
+async def read_division_batch_students_by_id(
     division_id: str,
     batch_number: int,
-    current_user: models.User = Depends(deps.get_current_user),
-    db: Session = Depends(deps.get_db),
+    stream: bool = Depends(deps.wants_ndjson),
+    current_user: models.User = Depends(deps.get_current_user_async),
+    db: AsyncSession = Depends(deps.get_async_read_db),
 ) -> Any:
     """
-    Get all students for a specific division by ID.
+    Get all students for a specific division by ID. Streamed as newline-delimited JSON with
+    `Accept: application/x-ndjson`.
     """
     # Fetch division with the corresponding ID from DB
-    if division := crud.division.get(db, id=division_id):
+    if division := await crud.division_async.get(db, id=division_id):
         # Return the fetched object if current_user is the professor for the division
         # or admin with required perms
         if current_user.id == division.professor_id or (
-            (admin := crud.admin.get(db, id=current_user.id))
+            (admin := await crud.admin_async.get(db, id=current_user.id))
             and AdminPermissions(admin.permissions).is_allowed("course")
         ):
-            return [
-                student_division.student
-                for student_division in getattr(division, "student_division")
-                if student_division.batch_number == batch_number
-            ]
+            if stream:
+                return ndjson_response(
+                    schemas.Student,
+                    db,
+                    lambda stream_db: crud.student_async.stream(
+                        stream_db,
+                        crud.student_async.select_by_division(division_id=division_id, batch_number=batch_number),
+                    ),
+                )
+            return await crud.student_async.get_by_division(db, division_id=division_id, batch_number=batch_number)
 
         raise ForbiddenException(detail="The user doesn't have enough privileges")
 
@@ -114,6 +139,33 @@ def create_division(
     return crud.division.create(db, obj_in=division_in)
 
 
+@router.post("/bulk", response_model=list[schemas.Division])
+def create_divisions(
+    *,
+    db: Session = Depends(deps.get_db),
+    divisions_in: list[schemas.DivisionCreate],
+    current_admin: models.Admin = Depends(deps.get_current_admin_with_permission("course")),
+) -> Any:
+    """
+    Create several divisions in a single transaction, rejecting the whole batch if any of them already exists
+    """
+    details = [(division_in.course_id, division_in.division_code) for division_in in divisions_in]
+    if len(set(details)) != len(details):
+        raise ConflictException(detail="The same division was passed more than once!")
+    if existing := crud.division.get_multi_by_details(db, objs_in=divisions_in):
+        raise ConflictException(
+            detail={
+                "msg": "Divisions with these details already exist in the system!",
+                "divisions": [division.id for division in existing],
+            }
+        )
+
+    logging.info(
+        f"Admin {current_admin.user_id} ({current_admin.user.email}) is creating {len(divisions_in)} Divisions"
+    )
+    return crud.division.create_multi(db, objs_in=divisions_in)
+
+
 @router.post("/{division_id}/students", response_model=dict[str, Any], status_code=207)
 def add_division_students_by_id(
     *,
@@ -127,17 +179,25 @@ def add_division_students_by_id(
         errors = defaultdict(lambda: [])
 
         batch_number = 0
+        school_id = division.course.term.year.school_id
+        term_id = division.course.term_id
+
+        # Validate every ID with a couple of set-based queries instead of looking up each user separately
+        users = crud.user.get_student_details(db, ids=user_ids)
+        enrolled = crud.division.get_student_ids(db, division_id=division_id, student_ids=users.keys())
+        batch_numbers: dict[str, int] = {}
 
         for user_id in user_ids:
-            if user := crud.user.get(db, id=user_id):
+            if user := users.get(user_id):
                 if user.type == "student":
-                    if user.school_id == division.course.term.year.school_id:
-                        if student := crud.student.get(db, id=user_id):
-                            if student.term_id == division.course.term_id:
-                                if student not in division.students:
-                                    division.students.append({"student": student, "batch_number": batch_number + 1})
+                    if user.school_id == school_id:
+                        if user.student_id:
+                            if user.term_id == term_id:
+                                if user_id not in enrolled:
+                                    batch_numbers[user_id] = batch_number + 1
+                                    enrolled.add(user_id)
                                     batch_number = (batch_number + 1) % division.number_of_batches
-                                    response["success"].append(student.user_id)
+                                    response["success"].append(user_id)
                                 else:
                                     errors["student already in division"].append(user_id)
                             else:
@@ -151,8 +211,9 @@ def add_division_students_by_id(
             else:
                 errors["not a user"].append(user_id)
 
-        # Commit all the students added to the student
+        # Commit all the students added to the division in a single statement
         try:
+            crud.division.add_students(db, division_id=division_id, batch_numbers=batch_numbers)
             db.commit()
         except exc.IntegrityError as e:
             logging.error(e.__str__())
@@ -181,13 +242,13 @@ def remove_student_from_term(
 
     if division := crud.division.get(db, division_id):
         if student := crud.student.get(db, student_id):
-            if student in division.students:
+            if crud.division.get_student_ids(db, division_id=division_id, student_ids=[student_id]):
                 logging.info(
                     f"Admin {current_admin.user_id} ({current_admin.user.email}) "
                     f"is deleting Student {student_id} ({student.user.email}) "
                     f"from Division {division_id} ({division.course.name} {division.division_code})"
                 )
-                division.students.remove(student)
+                crud.division.remove_student(db, division_id=division_id, student_id=student_id)
                 try:
                     db.commit()
                 except exc.IntegrityError as e:
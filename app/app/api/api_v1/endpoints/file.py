@@ -1,90 +1,115 @@
 from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, Depends, File, Request, Response, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
-from app.exceptions import (
-    BadRequestException,
-    ForbiddenException,
-    NotFoundException,
-    UnsupportedMediaTypeException,
-)
-from app.utils import save_file
+from app.api.routing import TimedRoute
+from app.api.serialization import conditional_response, content_response, orm_response
+from app.exceptions import BadRequestException, ForbiddenException, NotFoundException
+from app.uploads import save_file
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.File])
-def get_all_files_user(
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_non_admin_user),
+async def get_all_files_user(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    pagination: deps.Pagination = Depends(),
+    current_user: models.User = Depends(deps.get_current_non_admin_user_async),
 ) -> Any:
     """
-    Retrieve files.
+    Retrieve files. All of them are returned unless a pagination `cursor` is passed.
     """
-    return crud.file.get_by_owner(db, owner_id=current_user.id)
+    if pagination.cursor is None:
+        return await crud.file_async.get_by_owner(db, owner_id=current_user.id)
+    return await pagination.paginate_async(db, crud.file_async, owner_id=current_user.id)
 
 
 @router.get("/course", response_model=list[schemas.File])
-def get_all_files_course(
+async def get_all_files_course(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_non_admin_user),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: models.User = Depends(deps.get_current_non_admin_user_async),
 ) -> Any:
     """
-    Retrieve files.
+    Retrieve the assignments and materials of the current user's courses. Returns 304 Not Modified when If-None-Match
+    has the ETag of the current response.
     """
-    if current_user.type == "student" and (student := crud.student.get(db, id=current_user.id)):
-        courses = (division.course_id for division in student.divisions)
-    elif current_user.type == "professor" and (professor := crud.professor.get(db, id=current_user.id)):
-        courses = (division.course_id for division in professor.divisions)
+    if current_user.type == "student" and await crud.student_async.get(db, id=current_user.id):
+        courses = await crud.division_async.get_course_ids_by_student(db, student_id=current_user.id)
+    elif current_user.type == "professor" and await crud.professor_async.get(db, id=current_user.id):
+        courses = await crud.division_async.get_course_ids_by_professor(db, professor_id=current_user.id)
     else:
         raise BadRequestException(detail=f"Could not fetch courses for user {current_user.id}")
-    response = []
-    for course_id in courses:
-        for file in crud.file.get_by_course(db, course_id=course_id):
-            if file.file_type in ("assignment", "material"):
-                response.append(file)
-    return response
+    files = [
+        file
+        for file in await crud.file_async.get_by_courses(db, course_ids=courses)
+        if file.file_type in ("assignment", "material")
+    ]
+    return conditional_response(request, orm_response(schemas.File, files))
 
 
-@router.get("/{file_id}", response_model=schemas.File)
-def get_file_by_id(
-    *,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_non_admin_user),
-    file_id: str,
-) -> Any:
+async def get_accessible_file(db: AsyncSession, current_user: models.User, file_id: str) -> models.File:
     """
-    Retrieve a file by id
+    A file its owner, or a professor of its course, can access
     """
-    if file := crud.file.get(db, id=file_id):
+    if file := await crud.file_async.get(db, id=file_id):
         if current_user.id == file.owner_id or (
             current_user.type == "professor"
-            and (
-                (professor := crud.professor.get(db, id=current_user.id))
-                and file.course_id in (division.course_id for division in professor.divisions)
-            )
+            and file.course_id
+            in await crud.division_async.get_course_ids_by_professor(db, professor_id=current_user.id)
         ):
             return file
     raise BadRequestException(detail=f"File with id {file_id} not found or you don't have access to it")
 
 
+@router.get("/{file_id}", response_model=schemas.File)
+async def get_file_by_id(
+    *,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: models.User = Depends(deps.get_current_non_admin_user_async),
+    file_id: str,
+) -> Any:
+    """
+    Retrieve a file by id
+    """
+    return await get_accessible_file(db, current_user, file_id)
+
+
+@router.get("/{file_id}/content", response_class=Response)
+async def download_file(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: models.User = Depends(deps.get_current_non_admin_user_async),
+    file_id: str,
+) -> Any:
+    """
+    Download the content of a file
+    """
+    file = await get_accessible_file(db, current_user, file_id)
+    return await content_response(request, file.filename, file.size)
+
+
 @router.get("/submission/{submission_id}", response_model=list[schemas.File])
-def get_file_by_submission(
+async def get_file_by_submission(
     *,
-    db: Session = Depends(deps.get_db),
-    current_professor: models.Professor = Depends(deps.get_current_professor),
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_professor: models.Professor = Depends(deps.get_current_professor_async),
     submission_id: str,
 ) -> Any:
     """
     Retrieve a file by id
     """
-    if file := crud.file.get(db, id=submission_id):
-        if file.course_id in {division.course_id for division in current_professor.divisions}:
-            return crud.file.get_by_submission(db, submission_id=submission_id)
+    if file := await crud.file_async.get(db, id=submission_id):
+        if file.course_id in await crud.division_async.get_course_ids_by_professor(
+            db, professor_id=current_professor.user_id
+        ):
+            return await crud.file_async.get_by_submission(db, submission_id=submission_id)
     raise NotFoundException(detail=f"Assignment with id {submission_id} not found or you don't have access to it")
 
 
@@ -103,19 +128,16 @@ def upload_file(
     Update a user's profile picture
     """
 
-    if current_user.type == "student" and (student := crud.student.get(db, id=current_user.id)):
-        courses = (division.course_id for division in student.divisions)
-    elif current_user.type == "professor" and (professor := crud.professor.get(db, id=current_user.id)):
-        courses = (division.course_id for division in professor.divisions)
+    if current_user.type == "student" and crud.student.get(db, id=current_user.id):
+        courses = crud.division.get_course_ids_by_student(db, student_id=current_user.id)
+    elif current_user.type == "professor" and crud.professor.get(db, id=current_user.id):
+        courses = crud.division.get_course_ids_by_professor(db, professor_id=current_user.id)
     else:
         raise BadRequestException(detail=f"Could not upload file for course {course_id}")
 
     if course_id not in courses:
         raise ForbiddenException(detail="You can't upload files for this course!")
 
-    if file.content_type != "application/pdf":
-        raise UnsupportedMediaTypeException(detail="Uploaded files can only be PDFs")
-
     if submission_id:
         if assignment := crud.file.get(db, id=submission_id):
             if assignment.file_type != "assignment":
@@ -125,16 +147,19 @@ def upload_file(
         if file_type != "submission":
             raise BadRequestException(detail=f"File with type {file_type} can't be submitted")
 
-    filename = save_file(file)
+    # PDFs only, whatever Content-Type the client sent
+    stored = save_file(db, file)
     return crud.file.create(
         db,
         obj_in=schemas.FileCreate(
             owner_id=current_user.id,
             course_id=course_id,
-            filename=filename,
+            filename=stored.filename,
             file_type=file_type,
             submission_id=submission_id,
             description=description,
+            size=stored.size,
+            sha256=stored.sha256,
         ),
     )
 
@@ -151,7 +176,7 @@ def update_file(
     Update the attributes of an uploaded file (basically grade an assignment)
     """
     if file := crud.file.get(db, id=file_id):
-        if file.course_id in {division.course_id for division in current_professor.divisions}:
+        if file.course_id in crud.division.get_course_ids_by_professor(db, professor_id=current_professor.user_id):
             if file.file_type == "submission":
                 return crud.file.update(db, db_obj=file, obj_in=file_in)
             raise BadRequestException(detail=f"Cannot update a file of type {file.file_type}")
@@ -1,24 +1,29 @@
 import logging
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
+from app.api.serialization import compound_document, orm_response
+from app.crud.loaders import Selection
 from app.exceptions import ConflictException, NotFoundException
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Lecture])
 def read_lectures(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
+    selection: Optional[Selection] = Depends(deps.get_selection),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("school")),
 ) -> Any:
-    return crud.lecture.get_multi(db, skip=skip, limit=limit)
+    lectures = pagination.paginate(db, crud.lecture.with_selection(selection))
+    return orm_response(schemas.Lecture, lectures, pagination.response, selection)
 
 
 @router.get("/{lecture_id}", response_model=schemas.Lecture)
@@ -26,19 +31,29 @@ def read_lecture_by_id(
     *,
     db: Session = Depends(deps.get_db),
     lecture_id: str,
+    selection: Optional[Selection] = Depends(deps.get_selection),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("school")),
 ) -> Any:
-    if lecture := crud.lecture.get(db, id=lecture_id):
-        return lecture
+    if lecture := crud.lecture.with_selection(selection).get(db, id=lecture_id):
+        return orm_response(schemas.Lecture, lecture, selection=selection)
     raise NotFoundException(detail="A lecture with this ID does not exist!")
 
 
 @router.get("/division/{division_id}", response_model=list[schemas.Lecture])
 def get_lectures_for_division(
-    *, db: Session = Depends(deps.get_db), division_id: str, _: models.User = Depends(deps.get_current_user)
+    *,
+    db: Session = Depends(deps.get_db),
+    division_id: str,
+    _: models.User = Depends(deps.get_current_user),
+    compound: bool = False,
 ) -> Any:
+    """
+    The lectures of a division. With `?compound=true`, they are returned as a compound document, `{"data": [lecture],
+    "included": {...}}`, where the objects lectures nest are referenced by ID and written once in `included`.
+    """
     if crud.division.get(db, id=division_id):
-        return crud.lecture.get_by_division(db, division_id=division_id)
+        lectures = crud.lecture.get_by_division(db, division_id=division_id)
+        return ORJSONResponse(compound_document(schemas.Lecture, lectures)) if compound else lectures
     raise NotFoundException(detail="A division with this ID does not exist!")
 
 
@@ -68,6 +83,34 @@ def create_lecture(
     return crud.lecture.create(db, obj_in=lecture_in)
 
 
+@router.post("/bulk", response_model=list[schemas.Lecture])
+def create_lectures(
+    *,
+    db: Session = Depends(deps.get_db),
+    lectures_in: list[schemas.LectureCreate],
+    current_admin: models.Admin = Depends(deps.get_current_admin_with_permission("school")),
+) -> Any:
+    """
+    Create several lectures in a single transaction, rejecting the whole batch if any of them already exists
+    """
+    details = [
+        (lecture_in.day, lecture_in.time_slot_id, lecture_in.division_id, lecture_in.type, lecture_in.room_number)
+        for lecture_in in lectures_in
+    ]
+    if len(set(details)) != len(details):
+        raise ConflictException(detail="The same lecture was passed more than once!")
+    if existing := crud.lecture.get_multi_by_details(db, objs_in=lectures_in):
+        raise ConflictException(
+            detail={
+                "msg": "Lectures with these details already exist in the system!",
+                "lectures": [lecture.id for lecture in existing],
+            }
+        )
+
+    logging.info(f"Admin {current_admin.user_id} ({current_admin.user.email}) is creating {len(lectures_in)} lectures")
+    return crud.lecture.create_multi(db, objs_in=lectures_in)
+
+
 @router.put("/{lecture_id}", response_model=schemas.Lecture)
 def update_lecture(
     *,
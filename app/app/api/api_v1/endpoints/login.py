@@ -2,11 +2,20 @@ from typing import Any
 
 from fastapi import APIRouter, Body, Depends
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
-from app.core.security import create_token, get_password_hash
+from app.api.routing import TimedRoute
+from app.core.cache import principal_cache
+from app.core.config import settings
+from app.core.security import (
+    create_token,
+    get_password_hash_async,
+    verify_password_async,
+    version_claims,
+)
 from app.exceptions import (
     BadRequestException,
     ForbiddenException,
@@ -19,17 +28,23 @@ from app.utils import (
     verify_password_reset_token,
 )
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/login/access-token", response_model=schemas.Token)
-def login_access_token(db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
+async def login_access_token(
+    db: AsyncSession = Depends(deps.get_async_db), form_data: OAuth2PasswordRequestForm = Depends()
+) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-
-    if user := crud.user.authenticate(db, email=form_data.username, password=form_data.password):
+    user = await crud.user_async.get_by_email(db, email=form_data.username)
+    # Hand the connection back to the pool before spending ~250ms on bcrypt
+    await db.close()
+    if user and await verify_password_async(form_data.password, user.hashed_password):
         if crud.user.is_active(user):
+            if settings.ACCESS_TOKEN_CLAIMS and (principal := await crud.user_async.get_principal(db, id=user.id)):
+                return create_token(user.id, claims=version_claims(principal))
             return create_token(user.id)
         raise ForbiddenException(detail="Inactive user")
     raise UnauthorizedException(detail="Incorrect email or password")
@@ -44,6 +59,8 @@ def login_refresh_token(
     """
     if user := crud.user.get(db, current_user.id):
         if crud.user.is_active(user):
+            if settings.ACCESS_TOKEN_CLAIMS and (principal := crud.user.get_principal(db, id=user.id)):
+                return create_token(user.id, claims=version_claims(principal))
             return create_token(user.id)
         raise ForbiddenException(detail="Inactive user")
 
@@ -71,21 +88,23 @@ def recover_password(email: str, db: Session = Depends(deps.get_db)) -> Any:
 
 
 @router.post("/reset-password/", response_model=schemas.Msg)
-def reset_password(
+async def reset_password(
     token: str = Body(...),
     new_password: str = Body(...),
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
 ) -> Any:
     """
     Reset password
     """
     if email := verify_password_reset_token(token):
-        if user := crud.user.get_by_email(db, email=email):
+        if user := await crud.user_async.get_by_email(db, email=email):
             if crud.user.is_active(user):
-                hashed_password = get_password_hash(new_password)
-                user.hashed_password = hashed_password
+                await db.close()
+                user.hashed_password = await get_password_hash_async(new_password)
                 db.add(user)
-                db.commit()
+                await db.execute(crud.user.update_token_versions(ids=[user.id]))
+                await db.commit()
+                principal_cache.invalidate([user.id])
                 return {"msg": "Password updated successfully"}
             raise BadRequestException(detail="Inactive user")
         raise NotFoundException(
@@ -6,23 +6,23 @@ from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
 from app.exceptions import ForbiddenException, NotFoundException
 from app.schemas import AdminPermissions
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Professor])
 def read_professors(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("professor")),
 ) -> Any:
     """
     Retrieve professors
     """
-    return crud.professor.get_multi(db, skip=skip, limit=limit)
+    return pagination.paginate(db, crud.professor)
 
 
 @router.get("/me", response_model=schemas.Professor)
@@ -37,17 +37,20 @@ def get_professor_me(
 
 @router.get("/me/divisions", response_model=list[schemas.Division])
 def get_professor_divisions(
+    db: Session = Depends(deps.get_read_db),
     current_professor: models.Professor = Depends(deps.get_current_professor),
 ) -> Any:
     """
     Get all divisions for current professor
     """
-    return current_professor.divisions
+    return crud.division.get_by_professor(db, professor_id=current_professor.user_id)
 
 
 @router.get("/{professor_id}", response_model=schemas.Professor)
 def read_professor_by_id(
-    professor_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_db)
+    professor_id: str,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_read_db),
 ) -> Any:
     """
     Get a specific professor by ID.
@@ -74,23 +77,25 @@ def read_professor_by_id(
 
 @router.get("/{professor_id}/divisions", response_model=list[schemas.Division])
 def read_professor_divisions_by_id(
-    professor_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_db)
+    professor_id: str,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_read_db),
 ) -> Any:
     """
     Get all divisions for a specific professor by ID.
     """
 
     # Fetch professor with the corresponding ID from DB
-    if professor := crud.professor.get(db, id=professor_id):
+    if crud.professor.get(db, id=professor_id):
         # Return the fetched object without checking perms if current_professor is trying to fetch itself
         if current_user.id == professor_id:
-            return professor.divisions
+            return crud.division.get_by_professor(db, professor_id=professor_id)
 
         # check perms and return if professor exists, else 404
         if (admin := crud.admin.get(db, id=current_user.id)) and AdminPermissions(admin.permissions).is_allowed(
             "professor"
         ):
-            return professor.divisions
+            return crud.division.get_by_professor(db, professor_id=professor_id)
 
         raise ForbiddenException(detail="The user doesn't have enough privileges")
 
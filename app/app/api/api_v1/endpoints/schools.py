@@ -6,22 +6,22 @@ from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
 from app.exceptions import ConflictException, ForbiddenException, NotFoundException
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.School])
 def read_schools(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("school")),
 ) -> Any:
     """
     Retrieve schools.
     """
-    schools = crud.school.get_multi(db, skip=skip, limit=limit)
+    schools = pagination.paginate(db, crud.school)
     return schools
 
 
@@ -1,28 +1,37 @@
 import logging
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
+from app.api.serialization import conditional_response, ndjson_response, orm_response
+from app.crud.loaders import Selection
 from app.exceptions import ForbiddenException, NotFoundException
 from app.schemas import AdminPermissions
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Student])
 def read_students(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
+    selection: Optional[Selection] = Depends(deps.get_selection),
+    stream: bool = Depends(deps.wants_ndjson),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("student")),
 ) -> Any:
     """
-    Retrieve students
+    Retrieve students. Streamed as newline-delimited JSON with `Accept: application/x-ndjson`.
     """
-    return crud.student.get_multi(db, skip=skip, limit=limit)
+    if stream:
+        return ndjson_response(
+            schemas.Student, db, pagination.stream(crud.student.with_selection(selection)), selection
+        )
+    students = pagination.paginate(db, crud.student.with_selection(selection))
+    return orm_response(schemas.Student, students, pagination.response, selection)
 
 
 @router.get("/me", response_model=schemas.Student)
@@ -37,17 +46,20 @@ def get_student_me(
 
 @router.get("/me/divisions", response_model=list[schemas.Division])
 def get_student_divisions_me(
+    request: Request,
+    db: Session = Depends(deps.get_read_db),
     current_student: models.Student = Depends(deps.get_current_student),
 ) -> Any:
     """
-    Get current student divisions
+    Get current student divisions. Returns 304 Not Modified when If-None-Match has the ETag of the current response.
     """
-    return list(current_student.divisions)
+    divisions = crud.division.get_by_student(db, student_id=current_student.user_id)
+    return conditional_response(request, orm_response(schemas.Division, divisions))
 
 
 @router.get("/{student_id}", response_model=schemas.Student)
 def read_student_by_id(
-    student_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_db)
+    student_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_read_db)
 ) -> Any:
     """
     Get a specific student by ID.
@@ -73,20 +85,20 @@ def read_student_by_id(
 
 @router.get("/{student_id}/divisions", response_model=list[schemas.Division])
 def read_student_divisions_by_id(
-    student_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_db)
+    student_id: str, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(deps.get_read_db)
 ) -> Any:
     """
     Get a specific student's divisions by ID.
     """
     # Fetch student with the corresponding ID from DB
-    if student := crud.student.get(db, id=student_id):
+    if crud.student.get(db, id=student_id):
         # Return the fetched divisions if current_user is trying to fetch itself
         # or is an admin with the required perms
         if current_user.id == student_id or (
             (admin := crud.admin.get(db, id=current_user.id))
             and AdminPermissions(admin.permissions).is_allowed("student")
         ):
-            return list(student.divisions)
+            return crud.division.get_by_student(db, student_id=student_id)
 
         raise ForbiddenException(detail="The user doesn't have enough privileges")
 
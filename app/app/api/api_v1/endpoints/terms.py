@@ -3,24 +3,26 @@ from collections import defaultdict
 from typing import Any
 
 from fastapi import APIRouter, Depends
+from sqlalchemy import exc
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
-from app.exceptions import ConflictException, NotFoundException
+from app.api.routing import TimedRoute
+from app.api.serialization import ndjson_response
+from app.exceptions import BadRequestException, ConflictException, NotFoundException
 from app.schemas import StudentUpdate
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Term])
 def read_terms(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("term")),
 ) -> Any:
-    terms = crud.term.get_multi(db, skip=skip, limit=limit)
+    terms = pagination.paginate(db, crud.term)
     return terms
 
 
@@ -41,10 +43,20 @@ def read_term_students_by_id(
     *,
     db: Session = Depends(deps.get_db),
     term_id: str,
+    stream: bool = Depends(deps.wants_ndjson),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("term")),
 ) -> Any:
-    if term := crud.term.get(db, term_id):
-        return term.students
+    """
+    Get the students of a term. Streamed as newline-delimited JSON with `Accept: application/x-ndjson`.
+    """
+    if crud.term.get(db, term_id):
+        if stream:
+            return ndjson_response(
+                schemas.Student,
+                db,
+                lambda stream_db: crud.student.stream(stream_db, crud.student.select_by_term(term_id=term_id)),
+            )
+        return crud.student.get_by_term(db, term_id=term_id)
     raise NotFoundException(detail="The term with this ID does not exist!")
 
 
@@ -60,14 +72,19 @@ def add_term_students_by_id(
         response: dict[str, Any] = defaultdict(lambda: [])
         errors = defaultdict(lambda: [])
 
+        # Validate every ID with a single query instead of looking up each user separately
+        users = crud.user.get_student_details(db, ids=user_ids)
+        school_id = term.year.school_id
+        added: set[str] = set()
+
         for user_id in user_ids:
-            if user := crud.user.get(db, id=user_id):
+            if user := users.get(user_id):
                 if user.type == "student":
-                    if user.school_id == term.year.school_id:
-                        if student := crud.student.get(db, id=user_id):
-                            if student.term_id != term_id:
-                                crud.student.update(db, db_obj=student, obj_in=StudentUpdate(term_id=term_id))
-                                response["success"].append(student.user_id)
+                    if user.school_id == school_id:
+                        if user.student_id:
+                            if user.term_id != term_id and user_id not in added:
+                                added.add(user_id)
+                                response["success"].append(user_id)
                             else:
                                 errors["student already in term"].append(user_id)
                         else:
@@ -79,6 +96,19 @@ def add_term_students_by_id(
             else:
                 errors["not a user"].append(user_id)
 
+        # Move all the valid students into the term in a single statement
+        try:
+            crud.student.set_term(db, ids=added, term_id=term_id)
+            db.commit()
+        except exc.IntegrityError as e:
+            logging.error(e.__str__())
+            db.rollback()
+            raise ConflictException(detail=e.__str__())
+        except Exception as e:
+            logging.error(e.__str__())
+            db.rollback()
+            raise BadRequestException(detail=e.__str__())
+
         if errors.keys():
             response["errors"] = errors
         return response
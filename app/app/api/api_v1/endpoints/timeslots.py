@@ -6,19 +6,19 @@ from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
 from app.exceptions import ConflictException, NotFoundException
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.TimeSlot])
 def read_timeslots(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("school")),
 ) -> Any:
-    return crud.timeslot.get_multi(db, skip=skip, limit=limit)
+    return pagination.paginate(db, crud.timeslot)
 
 
 @router.get("/{timeslot_id}", response_model=schemas.TimeSlot)
@@ -54,6 +54,33 @@ def create_timeslot(
     return crud.timeslot.create(db, obj_in=timeslot_in)
 
 
+@router.post("/bulk", response_model=list[schemas.TimeSlot])
+def create_timeslots(
+    *,
+    db: Session = Depends(deps.get_db),
+    timeslots_in: list[schemas.TimeSlotCreate],
+    current_admin: models.Admin = Depends(deps.get_current_admin_with_permission("school")),
+) -> Any:
+    """
+    Create several timeslots in a single transaction, rejecting the whole batch if any of them already exists
+    """
+    details = [(timeslot_in.start_time, timeslot_in.end_time, timeslot_in.school_id) for timeslot_in in timeslots_in]
+    if len(set(details)) != len(details):
+        raise ConflictException(detail="The same timeslot was passed more than once!")
+    if existing := crud.timeslot.get_multi_by_details(db, objs_in=timeslots_in):
+        raise ConflictException(
+            detail={
+                "msg": "Timeslots with these details already exist in the system!",
+                "timeslots": [timeslot.id for timeslot in existing],
+            }
+        )
+
+    logging.info(
+        f"Admin {current_admin.user_id} ({current_admin.user.email}) is creating {len(timeslots_in)} timeslots"
+    )
+    return crud.timeslot.create_multi(db, objs_in=timeslots_in)
+
+
 @router.put("/{timeslot_id}", response_model=schemas.TimeSlot)
 def update_timeslot(
     *,
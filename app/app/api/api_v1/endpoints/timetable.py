@@ -1,50 +1,116 @@
-import calendar
-from collections import defaultdict
-from typing import Any, Dict
+import logging
+from typing import Any, Collection, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app import crud, models
+from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
+from app.api.serialization import compound_document, encoded_response, get_serializer
+from app.core.cache import timetable_cache
+from app.core.compression import EncodedBody
 from app.exceptions import BadRequestException, NotFoundException
-from app.models import Division
 from app.schemas import Lecture
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=dict[str, list[Lecture]])
-def get_timetable(
+async def get_timetable(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: models.User = Depends(deps.get_current_user_async),
+    compound: bool = False,
+) -> Any:
+    """
+    The timetable of the current student or professor, as lectures grouped by day. With `?compound=true`, it is
+    returned as a compound document (see `get_timetable_division`).
+
+    Returns 304 Not Modified when If-None-Match has the ETag of the current timetable, which for a cached timetable
+    is answered without reading its lectures.
+    """
+    if current_user.type == "student" and await crud.student_async.get(db, id=current_user.id):
+        return await generate_timetable(
+            db, await crud.division_async.get_ids_by_student(db, student_id=current_user.id), request, compound
+        )
+    elif current_user.type == "professor" and await crud.professor_async.get(db, id=current_user.id):
+        return await generate_timetable(
+            db, await crud.division_async.get_ids_by_professor(db, professor_id=current_user.id), request, compound
+        )
+    raise BadRequestException(detail=f"No timetable can be generated for user type {current_user.type}")
+
+
+@router.post("/warm/{term_id}", response_model=schemas.Msg)
+def warm_term_timetables(
+    *,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_user),
+    current_admin: models.Admin = Depends(deps.get_current_admin_with_permission("term")),
+    term_id: str,
 ) -> Any:
-    if user := crud.user.get(db, id=current_user.id):
-        if user.type == "student" and (student := crud.student.get(db, id=user.id)):
-            return generate_timetable(db, student.divisions)
-        elif user.type == "professor" and (professor := crud.professor.get(db, id=user.id)):
-            return generate_timetable(db, professor.divisions)
-        else:
-            raise BadRequestException(detail=f"No timetable can be generated for user type {user.type}")
-    raise BadRequestException(detail="User object not found!")
+    """
+    Precompute the timetable of every distinct set of divisions that students of a term are enrolled in
+    """
+    if crud.term.get(db, id=term_id):
+        logging.info(f"Admin {current_admin.user_id} ({current_admin.user.email}) is warming timetables for {term_id}")
+        return {"msg": f"Cached {warm_timetable_cache(db, term_id=term_id)} timetables"}
+    raise NotFoundException(detail=f"Term with id {term_id} not found")
 
 
 @router.get("/{division_id}", response_model=dict[str, list[Lecture]])
-def get_timetable_division(
+async def get_timetable_division(
     *,
-    db: Session = Depends(deps.get_db),
-    _: models.User = Depends(deps.get_current_admin_with_permission("course")),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    _: models.User = Depends(deps.get_current_admin_with_permission_async("course")),
     division_id: str,
+    compound: bool = False,
 ) -> Any:
-    if division := crud.division.get(db, id=division_id):
-        return generate_timetable(db, [division])
+    """
+    The timetable of a division, as lectures grouped by day.
+
+    With `?compound=true`, it is returned as `{"data": {day: [lecture]}, "included": {...}}` instead: lectures
+    reference their division and time slot by ID, and each division, course, term, time slot, etc. they nest is
+    written once in `included[schema name][id]`, rather than again for every lecture.
+    """
+    if division := await crud.division_async.get(db, id=division_id):
+        return await generate_timetable(db, [division.id], request, compound)
     raise NotFoundException(detail=f"Division with id {division_id} not found")
 
 
-def generate_timetable(db: Session, divisions: list[Division]) -> Dict:
-    response: Dict = defaultdict(lambda: [])
-    for day in calendar.day_name:
-        for division in divisions:
-            if lectures := crud.lecture.get_by_day_division(db, day=day, division_id=division.id):
-                response[day] += lectures
-    return response
+def render_timetable(timetable: dict[str, list[models.Lecture]], compound: bool = False) -> EncodedBody:
+    if compound:
+        return EncodedBody(ORJSONResponse(compound_document(Lecture, timetable)).body)
+    serialize = get_serializer(Lecture)
+    return EncodedBody(
+        ORJSONResponse({day: [serialize(lecture) for lecture in lectures] for day, lectures in timetable.items()}).body
+    )
+
+
+async def generate_timetable(
+    db: AsyncSession, division_ids: Collection[str], request: Request, compound: bool = False
+) -> Response:
+    variant = "compound" if compound else "json"
+    if (payload := timetable_cache.get(division_ids, variant)) is None:
+        generation = timetable_cache.generation
+        timetable = await crud.lecture_async.get_timetable(db, division_ids=division_ids)
+        payload = render_timetable(timetable, compound)
+        timetable_cache.set(division_ids, payload, generation=generation, variant=variant)
+    return encoded_response(payload, request)
+
+
+def warm_timetable_cache(db: Session, term_id: Optional[str] = None) -> int:
+    """
+    Cache the timetables for every distinct division set in the given term (or in all currently running terms),
+    fetching the lectures for all of them in a single query. Timetables are precompressed in every supported encoding,
+    so even the first request for one doesn't compress it.
+    """
+    generation = timetable_cache.generation
+    division_sets = crud.term.get_student_division_sets(db, term_id=term_id)
+    lectures = crud.lecture.get_by_divisions(db, division_ids=set().union(*division_sets))
+    for division_ids in division_sets:
+        timetable = crud.lecture.group_by_day([lecture for lecture in lectures if lecture.division_id in division_ids])
+        timetable_cache.set(division_ids, render_timetable(timetable).precompress(), generation=generation)
+    return len(division_sets)
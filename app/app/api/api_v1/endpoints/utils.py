@@ -1,13 +1,18 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends
+from anyio import to_thread
+from fastapi import APIRouter, Depends, Response
 from pydantic.networks import EmailStr
 
 from app import models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
+from app.core.metrics import request_metrics
+from app.db.pool import pool_usage
+from app.db.session import async_engine, async_replica_engine, engine, replica_engine
 from app.utils import send_test_email
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/test-email/", response_model=schemas.Msg, status_code=201)
@@ -20,3 +25,36 @@ def test_email(
     """
     send_test_email(email_to=email_to)
     return {"msg": "Test email sent"}
+
+
+@router.get("/db-pool", response_model=dict[str, schemas.PoolStatus])
+def read_db_pool_status(
+    _: models.User = Depends(deps.get_current_superuser),
+) -> Any:
+    """
+    Connection pool usage of this worker, for the sync and async engines (and those of the replica, if configured)
+    """
+    pools = {"sync": pool_usage(engine.pool), "async": pool_usage(async_engine.pool)}
+    if replica_engine is not engine:
+        pools["replica"] = pool_usage(replica_engine.pool)
+    if async_replica_engine is not async_engine:
+        pools["async_replica"] = pool_usage(async_replica_engine.pool)
+    return pools
+
+
+@router.get("/metrics", response_class=Response)
+async def read_metrics(_: None = Depends(deps.check_metrics_access)) -> Any:
+    """
+    Request metrics of this worker in the Prometheus text format, for scrapers authenticated with METRICS_TOKEN (or
+    superusers)
+    """
+    threadpool = to_thread.current_default_thread_limiter().statistics()
+    gauges = {
+        "threadpool_busy_threads": ("Threads running sync endpoints and dependencies", threadpool.borrowed_tokens),
+        "threadpool_max_threads": (
+            "Size of the threadpool sync endpoints and dependencies run on",
+            threadpool.total_tokens,
+        ),
+        "threadpool_queued_tasks": ("Sync endpoints and dependencies waiting for a thread", threadpool.tasks_waiting),
+    }
+    return Response(content=request_metrics.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -6,22 +6,22 @@ from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.routing import TimedRoute
 from app.exceptions import ConflictException, NotFoundException
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Year])
 def read_years(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    pagination: deps.Pagination = Depends(),
     _: models.Admin = Depends(deps.get_current_admin_with_permission("year")),
 ) -> Any:
     """
     Retrieve years
     """
-    years = crud.year.get_multi(db, skip=skip, limit=limit)
+    years = pagination.paginate(db, crud.year)
     return years
 
 
@@ -1,16 +1,37 @@
 import logging
-from typing import Callable, Generator
+import secrets
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Generator,
+    Iterator,
+    Optional,
+    Sequence,
+)
 
-from fastapi import Depends
+from fastapi import Depends, Query, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from jose import ExpiredSignatureError, jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
+from app.api.serialization import NDJSON_MEDIA_TYPE
 from app.core import security
+from app.core.cache import Principal
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.timing import timed
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.loaders import Selection
+from app.db.session import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    primary_pins,
+)
 from app.exceptions import (
     BadRequestException,
     ConflictException,
@@ -18,6 +39,8 @@ from app.exceptions import (
     NotFoundException,
 )
 
+DEFAULT_PAGE_SIZE = 100
+
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
 
 
@@ -29,7 +52,105 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_user_from_token(token: str, token_type: str, db: Session) -> models.User:
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request) -> Generator:
+    """
+    Session for read-only endpoints: the replica when one is configured, except for users that wrote within the last
+    `READ_YOUR_WRITES_SECONDS`, who are kept on the primary
+    """
+    session_local = ReadSessionLocal
+    if primary_pins.is_pinned(security.get_token_subject(request.headers.get("Authorization"))):
+        session_local = SessionLocal
+    try:
+        db = session_local()
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator:
+    session_local = AsyncReadSessionLocal
+    if primary_pins.is_pinned(security.get_token_subject(request.headers.get("Authorization"))):
+        session_local = AsyncSessionLocal
+    async with session_local() as db:
+        yield db
+
+
+class Pagination:
+    """
+    Query parameters shared by list endpoints.
+
+    Without a `cursor`, `skip`/`limit` page through results with OFFSET as before. Passing `cursor` (empty for the
+    first page) switches to keyset pagination ordered by primary key, which stays fast on deep pages; the cursor for
+    the next page is returned in the `X-Next-Cursor` header, which is absent on the last page.
+
+    Endpoints that can stream their results (see `wants_ndjson`) return every object from `skip` on unless a `limit`
+    is given.
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        skip: int = 0,
+        limit: Optional[int] = Query(None, description="100 by default, unlimited when streaming"),
+        cursor: Optional[str] = None,
+    ):
+        self.response = response
+        self.skip = skip
+        self.limit = limit
+        self.cursor = cursor
+
+    @property
+    def page_size(self) -> int:
+        return self.limit if self.limit is not None else DEFAULT_PAGE_SIZE
+
+    def paginate(self, db: Session, crud_obj: CRUDBase, **filters: Any) -> Sequence:
+        if self.cursor is None:
+            return crud_obj.get_multi(db, skip=self.skip, limit=self.page_size, **filters)
+        db_objs, next_cursor = crud_obj.get_page(db, cursor=self.cursor, limit=self.page_size, **filters)
+        if next_cursor:
+            self.response.headers["X-Next-Cursor"] = next_cursor
+        return db_objs
+
+    async def paginate_async(self, db: AsyncSession, crud_obj: AsyncCRUDBase, **filters: Any) -> Sequence:
+        if self.cursor is None:
+            return await crud_obj.get_multi(db, skip=self.skip, limit=self.page_size, **filters)
+        db_objs, next_cursor = await crud_obj.get_page(db, cursor=self.cursor, limit=self.page_size, **filters)
+        if next_cursor:
+            self.response.headers["X-Next-Cursor"] = next_cursor
+        return db_objs
+
+    def stream(self, crud_obj: CRUDBase, **filters: Any) -> Callable[[Session], Iterator]:
+        """
+        What `ndjson_response` streams for this page: every object from `skip` on, up to `limit` if one was given
+        """
+        if self.cursor is not None:
+            raise BadRequestException(detail="Pagination cursors can't be used when streaming")
+        return lambda db: crud_obj.stream_multi(db, skip=self.skip, limit=self.limit, **filters)
+
+
+def wants_ndjson(request: Request) -> bool:
+    """
+    Whether a list endpoint should stream its results as newline-delimited JSON, which clients ask for with
+    `Accept: application/x-ndjson`
+    """
+    return NDJSON_MEDIA_TYPE in request.headers.get("Accept", "")
+
+
+def get_selection(
+    fields: Optional[str] = Query(None, description="Comma separated (dotted) paths of the fields to return"),
+    expand: Optional[str] = Query(
+        None, description="Comma separated (dotted) paths of the nested objects to return; all of them if not given"
+    ),
+) -> Optional[Selection]:
+    return Selection.parse(fields, expand)
+
+
+def decode_token(token: str, token_type: str) -> schemas.TokenPayload:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
         token_data = schemas.TokenPayload(**payload)
@@ -44,25 +165,55 @@ def get_user_from_token(token: str, token_type: str, db: Session) -> models.User
         raise ForbiddenException(
             detail="Could not validate credentials",
         )
-    if user := crud.user.get(db, id=token_data.sub):
+    return token_data
+
+
+def check_token_version(token_data: schemas.TokenPayload, principal: Optional[Principal]) -> Optional[Principal]:
+    """
+    Reject tokens stamped with an older version than their subject's, which were revoked after being issued
+    """
+    if principal and token_data.ver is not None and token_data.ver < principal.user["token_version"]:
+        raise ForbiddenException(detail="Token has been revoked")
+    return principal
+
+
+def check_user_active(user: Optional[models.User]) -> models.User:
+    if user:
         if user.is_active:
             return user
         raise ConflictException("User account is disabled")
     raise NotFoundException(detail="User not found")
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)) -> models.User:
-    return get_user_from_token(token, "access", db)
+def get_principal_from_token(token: str, token_type: str, db: Session) -> Optional[Principal]:
+    with timed("auth"):
+        token_data = decode_token(token, token_type)
+        return check_token_version(token_data, crud.user.get_principal(db, id=token_data.sub))
+
+
+def get_current_principal(db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)) -> Optional[Principal]:
+    return get_principal_from_token(token, "access", db)
+
+
+def get_current_user(
+    db: Session = Depends(get_db), principal: Optional[Principal] = Depends(get_current_principal)
+) -> models.User:
+    return check_user_active(crud.user.merge_cached(db, principal.user) if principal else None)
 
 
 def get_current_user_refresh(db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)) -> models.User:
-    return get_user_from_token(token, "refresh", db)
+    principal = get_principal_from_token(token, "refresh", db)
+    return check_user_active(crud.user.merge_cached(db, principal.user) if principal else None)
 
 
-def get_current_admin(db: Session = Depends(get_db), user: models.User = Depends(get_current_user)) -> models.Admin:
+def get_current_admin(
+    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_current_principal),
+    user: models.User = Depends(get_current_user),
+) -> models.Admin:
     if user.is_admin:
-        if admin := crud.admin.get(db, id=user.id):
-            return admin
+        if principal and principal.admin_permissions is not None:
+            return crud.admin.merge_cached(db, {"user_id": user.id, "permissions": principal.admin_permissions})
         raise NotFoundException(detail="Admin object not found")
     raise ForbiddenException(detail="User is not an administrator")
 
@@ -106,7 +257,69 @@ def get_current_superuser(
     raise ForbiddenException(detail="The user doesn't have enough privileges")
 
 
+def check_metrics_access(db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)) -> None:
+    if settings.METRICS_TOKEN and secrets.compare_digest(token, settings.METRICS_TOKEN):
+        return
+    get_current_superuser(get_current_user(db, get_principal_from_token(token, "access", db)))
+
+
 def get_current_non_admin_user(user: models.User = Depends(get_current_user)) -> models.User:
     if user.type not in ("student", "professor"):
         raise ForbiddenException(detail=f"{user.type} can't upload files here!")
     return user
+
+
+# Async counterparts of the dependencies above, for read-only `async def` endpoints using `get_async_read_db`
+
+
+async def get_current_principal_async(
+    db: AsyncSession = Depends(get_async_read_db), token: str = Depends(reusable_oauth2)
+) -> Optional[Principal]:
+    with timed("auth"):
+        token_data = decode_token(token, "access")
+        return check_token_version(token_data, await crud.user_async.get_principal(db, id=token_data.sub))
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_read_db), principal: Optional[Principal] = Depends(get_current_principal_async)
+) -> models.User:
+    return check_user_active(await crud.user_async.merge_cached(db, principal.user) if principal else None)
+
+
+async def get_current_admin_async(
+    db: AsyncSession = Depends(get_async_read_db),
+    principal: Optional[Principal] = Depends(get_current_principal_async),
+    user: models.User = Depends(get_current_user_async),
+) -> models.Admin:
+    if user.is_admin:
+        if principal and principal.admin_permissions is not None:
+            return await crud.admin_async.merge_cached(
+                db, {"user_id": user.id, "permissions": principal.admin_permissions}
+            )
+        raise NotFoundException(detail="Admin object not found")
+    raise ForbiddenException(detail="User is not an administrator")
+
+
+async def get_current_professor_async(
+    db: AsyncSession = Depends(get_async_read_db), user: models.User = Depends(get_current_user_async)
+) -> models.Professor:
+    if user.type == "professor":
+        if professor := await crud.professor_async.get(db, id=user.id):
+            return professor
+        raise NotFoundException(detail="Professor object not found")
+    raise ForbiddenException(detail="User is not a professor")
+
+
+def get_current_admin_with_permission_async(permission: str) -> Callable:
+    async def inner(current_admin: models.Admin = Depends(get_current_admin_async)) -> models.Admin:
+        if schemas.AdminPermissions(current_admin.permissions).is_allowed(permission):
+            return current_admin
+        raise ForbiddenException(detail="This admin doesn't have enough privileges")
+
+    return inner
+
+
+async def get_current_non_admin_user_async(user: models.User = Depends(get_current_user_async)) -> models.User:
+    if user.type not in ("student", "professor"):
+        raise ForbiddenException(detail=f"{user.type} can't upload files here!")
+    return user
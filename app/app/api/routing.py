@@ -0,0 +1,60 @@
+import asyncio
+import functools
+import time
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from app.core.timing import request_timings, timed
+
+
+def timed_endpoint(endpoint: Callable) -> Callable:
+    """
+    Wrap an endpoint function so the time it takes is added to the "handler" phase of the request, and the moment it
+    returns is noted as the start of serialization
+    """
+
+    def finished() -> None:
+        if timings := request_timings.get():
+            timings.endpoint_finished_at = time.perf_counter()
+
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timed("handler"):
+                result = await endpoint(*args, **kwargs)
+            finished()
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with timed("handler"):
+            result = endpoint(*args, **kwargs)
+        finished()
+        return result
+
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that records how long its endpoint function runs ("handler") and how long validating the returned value
+    against `response_model` and encoding it takes ("serialization"), for the `Server-Timing` header
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        if self.dependant.call is not None:
+            self.dependant.call = timed_endpoint(self.dependant.call)
+        route_handler = super().get_route_handler()
+
+        async def timed_route_handler(request: Request) -> Response:
+            response = await route_handler(request)
+            if (timings := request_timings.get()) and timings.endpoint_finished_at is not None:
+                timings.add("serialization", time.perf_counter() - timings.endpoint_finished_at)
+            return response
+
+        return timed_route_handler
@@ -0,0 +1,288 @@
+import functools
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Type,
+)
+
+import orjson
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import SHAPE_LIST, SHAPE_SEQUENCE, SHAPE_SINGLETON, ModelField
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.blobs import blob_media_type, open_content
+from app.core.compression import EncodedBody, content_etag, negotiate_encoding
+from app.crud.loaders import Selection, nested_schema
+from app.exceptions import NotFoundException
+
+Serializer = Callable[[Any], dict[str, Any]]
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Lines are sent in chunks of about this many bytes rather than one by one
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+
+def field_serializer(field: ModelField, selection: Optional[Selection]) -> Optional[Callable[[Any], Any]]:
+    """
+    Converter for the values of a field that nests a schema, None for fields whose values are returned as is
+    """
+    if (schema := nested_schema(field)) is None:
+        return None
+    nested = get_serializer(schema, selection.nested(field.name) if selection else None)
+    if field.shape == SHAPE_SINGLETON:
+        return lambda value: None if value is None else nested(value)
+    if field.shape in (SHAPE_LIST, SHAPE_SEQUENCE):
+        return lambda values: None if values is None else [nested(value) for value in values]
+    return functools.partial(validated_value, field, schema)
+
+
+def validated_value(field: ModelField, schema: Type[BaseModel], value: Any) -> Any:
+    """
+    Fallback for the shapes the compiled converters don't cover (dicts, sets, tuples...): the value goes through
+    pydantic the way FastAPI serializes responses, validated against the field and then `jsonable_encoder`-ed
+    """
+    validated, errors = field.validate(value, {}, loc=field.alias)
+    if errors:
+        raise ValidationError([errors], schema)
+    return jsonable_encoder(validated)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_serializer(schema: Type[BaseModel], selection: Optional[Selection] = None) -> Serializer:
+    """
+    Compile a function turning an ORM object into the dict `schema.from_orm(obj).dict()` would give, without
+    validating it: values are read straight off the object, and nested schemas are compiled the same way.
+
+    Only use it for objects loaded from the database, whose values already have the types the schema declares; values
+    are left as is for `orjson` to encode (dates and times included). With a `selection`, only the fields it keeps
+    are written out.
+    """
+    fields = [
+        (field.alias, field.get_default(), field_serializer(field, selection))
+        for name, field in schema.__fields__.items()
+        if selection is None or selection.includes(name, field)
+    ]
+
+    def serialize(obj: Any) -> dict[str, Any]:
+        data = {}
+        for name, default, convert in fields:
+            value = getattr(obj, name, default)
+            data[name] = value if convert is None else convert(value)
+        return data
+
+    return serialize
+
+
+def orm_response(
+    schema: Type[BaseModel],
+    content: Any,
+    response: Optional[Response] = None,
+    selection: Optional[Selection] = None,
+) -> ORJSONResponse:
+    """
+    Respond with an ORM object, or a list of them, serialized through `schema`'s compiled serializer (restricted to
+    `selection`, if any) and encoded with `orjson`. Being a `Response`, it bypasses FastAPI's `response_model`
+    validation, which the route should still declare for the OpenAPI schema.
+
+    Headers set on the `response` injected into the endpoint (eg. `X-Next-Cursor` by `Pagination`) are carried over,
+    as FastAPI only applies them to responses it builds itself.
+    """
+    serialize = get_serializer(schema, selection)
+    return ORJSONResponse(
+        [serialize(obj) for obj in content] if isinstance(content, Sequence) else serialize(content),
+        headers=dict(response.headers) if response else None,
+    )
+
+
+def ndjson_chunks(serialize: Serializer, objs: Iterable[Any]) -> Iterator[bytes]:
+    chunk = bytearray()
+    for obj in objs:
+        chunk += orjson.dumps(serialize(obj), option=orjson.OPT_APPEND_NEWLINE)
+        if len(chunk) >= NDJSON_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+async def ndjson_chunks_async(serialize: Serializer, objs: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    chunk = bytearray()
+    async for obj in objs:
+        chunk += orjson.dumps(serialize(obj), option=orjson.OPT_APPEND_NEWLINE)
+        if len(chunk) >= NDJSON_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def ndjson_response(
+    schema: Type[BaseModel],
+    db: Session | AsyncSession,
+    stream: Callable[[Any], Iterable[Any] | AsyncIterable[Any]],
+    selection: Optional[Selection] = None,
+) -> StreamingResponse:
+    """
+    Stream the objects `stream` yields (eg. through `crud_obj.stream_multi`) as newline-delimited JSON, one object per
+    line serialized through `schema`'s compiled serializer, so memory use stays flat however many rows there are.
+
+    The request's session is closed once the endpoint returns, before the body is sent, so `stream` is called with a
+    session of its own, bound to the same database (the primary or a replica) and closed once the body is sent.
+    """
+    serialize = get_serializer(schema, selection)
+    if isinstance(db, AsyncSession):
+        async_bind = db.bind
+
+        async def async_chunks() -> AsyncIterator[bytes]:
+            async with AsyncSession(async_bind, autoflush=False, expire_on_commit=False) as stream_db:
+                async for chunk in ndjson_chunks_async(serialize, stream(stream_db)):  # type: ignore
+                    yield chunk
+
+        return StreamingResponse(async_chunks(), media_type=NDJSON_MEDIA_TYPE)
+
+    bind = db.get_bind()
+
+    def chunks() -> Iterator[bytes]:
+        with Session(bind, autoflush=False) as stream_db:
+            yield from ndjson_chunks(serialize, stream(stream_db))  # type: ignore
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header lists `etag` (or is `*`), comparing tags weakly as RFC 9110 requires for it
+    """
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified(etag: str, headers: Optional[dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={**(headers or {}), "ETag": etag})
+
+
+def conditional_response(request: Request, response: Response) -> Response:
+    """
+    Tag a response with the ETag of its body, or answer 304 Not Modified (without a body) if the request's
+    If-None-Match already has it
+    """
+    etag = content_etag(response.body)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return response
+
+
+def encoded_response(body: EncodedBody, request: Request, media_type: str = "application/json") -> Response:
+    """
+    Respond with a (cached) body in the compressed form the client accepts, compressing it only the first time that
+    form is needed. `CompressionMiddleware` leaves responses that already have a Content-Encoding alone.
+
+    The body's ETag is sent along, and a request whose If-None-Match has it gets a 304 without the body.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("If-None-Match"), body.etag):
+        return not_modified(body.etag, headers)
+    content, encoding = body.encode(negotiate_encoding(request.headers.get("Accept-Encoding")))
+    headers["ETag"] = body.etag
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+async def content_response(request: Request, filename: str, size: Optional[int] = None) -> Response:
+    """
+    Stream the content of an upload from storage, whichever backend it is in.
+
+    Blobs never change once stored, so their name (their SHA-256) is a strong ETag, and a request whose If-None-Match
+    has it gets a 304 without the content being read at all.
+    """
+    if (media_type := blob_media_type(filename)) is None:
+        raise NotFoundException(detail=f"Content of {filename} not found")
+    etag = f'"{filename.rsplit(".", 1)[0]}"'
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+    try:
+        chunks = await run_in_threadpool(open_content, filename)
+    except FileNotFoundError:
+        raise NotFoundException(detail=f"Content of {filename} not found")
+    headers = {"ETag": etag}
+    if size is not None:
+        headers["Content-Length"] = str(size)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+Included = dict[str, dict[str, Any]]
+
+
+def identity_key(obj: Any) -> str:
+    return ",".join(str(value) for value in inspect(obj).identity)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_reference_serializer(schema: Type[BaseModel]) -> Callable[[Any, Included], dict[str, Any]]:
+    """
+    Like `get_serializer`, but every nested object is replaced by its primary key and written once into `included`,
+    under the name of its schema
+    """
+    fields = [
+        (field.alias, field.get_default(), nested_schema(field), field.shape) for field in schema.__fields__.values()
+    ]
+
+    def serialize(obj: Any, included: Included) -> dict[str, Any]:
+        data = {}
+        for name, default, nested, shape in fields:
+            value = getattr(obj, name, default)
+            if nested is None or value is None:
+                data[name] = value
+            elif shape == SHAPE_SINGLETON:
+                data[name] = include(nested, value, included)
+            else:
+                data[name] = [include(nested, item, included) for item in value]
+        return data
+
+    return serialize
+
+
+def include(schema: Type[BaseModel], obj: Any, included: Included) -> str:
+    key = identity_key(obj)
+    objs = included.setdefault(schema.__name__, {})
+    if key not in objs:
+        # Claim the key before serializing, so objects referencing each other don't recurse forever
+        objs[key] = None
+        objs[key] = get_reference_serializer(schema)(obj, included)
+    return key
+
+
+def compound_document(schema: Type[BaseModel], content: Any) -> dict[str, Any]:
+    """
+    Serialize an ORM object, a list of them or a mapping of such lists (eg. a timetable) as `{"data": ...,
+    "included": {...}}`: objects in `data` reference the objects they nest by primary key, and `included` holds each of
+    those once, keyed by schema name and primary key (and referencing their own nested objects the same way).
+    """
+    serialize = get_reference_serializer(schema)
+    included: Included = {}
+
+    def data(value: Any) -> Any:
+        if isinstance(value, Mapping):
+            return {key: data(item) for key, item in value.items()}
+        if isinstance(value, Sequence):
+            return [data(item) for item in value]
+        return serialize(value, included)
+
+    return {"data": data(content), "included": included}
@@ -0,0 +1,46 @@
+from typing import BinaryIO, Iterator, Optional
+
+from app.core.storage import get_storage
+
+# Leading bytes identifying each type of upload accepted, and the extension it is stored with
+MAGIC_BYTES = {"application/pdf": b"%PDF-", "image/png": b"\x89PNG\r\n\x1a\n", "image/jpeg": b"\xff\xd8\xff"}
+EXTENSIONS = {"application/pdf": "pdf", "image/png": "png", "image/jpeg": "jpeg"}
+MEDIA_TYPES = {extension: media_type for media_type, extension in EXTENSIONS.items()}
+
+# Where the content of blobs is kept in storage, by extension: course files and profile pictures are never of the same
+# type
+DIRECTORIES = {"pdf": "files", "png": "profile_pictures", "jpeg": "profile_pictures"}
+
+
+def blob_filename(sha256: str, media_type: str) -> str:
+    """
+    Content-addressed name of a blob: the same content is always stored (once) under the same name
+    """
+    return f"{sha256}.{EXTENSIONS[media_type]}"
+
+
+def blob_key(filename: str) -> str:
+    return f"{DIRECTORIES[filename.rsplit('.', 1)[-1]]}/{filename}"
+
+
+def blob_media_type(filename: str) -> Optional[str]:
+    """
+    Type of an upload from its extension, None for the types uploads couldn't have before they were sniffed
+    """
+    return MEDIA_TYPES.get(filename.rsplit(".", 1)[-1])
+
+
+def has_content(filename: str) -> bool:
+    return get_storage().exists(blob_key(filename))
+
+
+def save_content(filename: str, file: BinaryIO) -> None:
+    get_storage().save(blob_key(filename), file)
+
+
+def open_content(filename: str) -> Iterator[bytes]:
+    return get_storage().open(blob_key(filename))
+
+
+def delete_content(filename: str) -> None:
+    get_storage().delete(blob_key(filename))
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Collection, Optional
+
+from app.core.compression import EncodedBody
+from app.core.config import settings
+
+
+def division_set_key(division_ids: Collection[str]) -> str:
+    """
+    Stable fingerprint for a set of divisions, independent of the order (or duplicates) of the IDs passed in
+    """
+    return hashlib.sha256("\n".join(sorted(set(division_ids))).encode()).hexdigest()
+
+
+class TimetableCache:
+    """
+    In-process LRU cache of serialized timetables, keyed by the fingerprint of the divisions they were built from and
+    the variant of the payload (eg. `compound` for compound documents). Payloads keep their compressed forms, so hits
+    aren't compressed again.
+
+    Entries expire after `ttl` seconds, and are dropped as soon as a lecture, timeslot or division they depend on is
+    written through `crud`.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[frozenset[str], float, EncodedBody]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a timetable computed from data that changed mid-build is never stored
+        self._generation = 0
+
+    def get(self, division_ids: Collection[str], variant: str = "json") -> Optional[EncodedBody]:
+        key = f"{variant}:{division_set_key(division_ids)}"
+        with self._lock:
+            if entry := self._entries.get(key):
+                _, expires_at, payload = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return payload
+                del self._entries[key]
+        return None
+
+    def set(
+        self,
+        division_ids: Collection[str],
+        payload: EncodedBody,
+        generation: Optional[int] = None,
+        variant: str = "json",
+    ) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            key = f"{variant}:{division_set_key(division_ids)}"
+            self._entries[key] = (frozenset(division_ids), time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def invalidate_divisions(self, division_ids: Collection[str]) -> None:
+        """
+        Drop every cached timetable that contains any of the given divisions
+        """
+        division_ids = set(division_ids)
+        with self._lock:
+            self._generation += 1
+            for key in [
+                key for key, (divisions, _, _) in self._entries.items() if not divisions.isdisjoint(division_ids)
+            ]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+timetable_cache = TimetableCache(
+    max_entries=settings.TIMETABLE_CACHE_MAX_ENTRIES, ttl=settings.TIMETABLE_CACHE_TTL_SECONDS
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    What the auth dependencies need to know about a user: the column values of its row (without the password hash)
+    and, for administrators, their permission bits
+    """
+
+    user: dict[str, Any]
+    admin_permissions: Optional[int] = None
+
+
+class PrincipalCache:
+    """
+    In-process LRU cache of principals keyed by user ID, so authenticating a request doesn't need a query.
+
+    Entries expire after `ttl` seconds, which bounds how long a write made by another process (or outside `crud`)
+    can go unnoticed; writes to a user or its admin object through `crud` drop the entry immediately.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a principal read before a concurrent write is never stored
+        self._generation = 0
+
+    def get(self, user_id: str) -> Optional[Principal]:
+        with self._lock:
+            if entry := self._entries.get(user_id):
+                expires_at, principal = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    return principal
+                del self._entries[user_id]
+        return None
+
+    def set(self, user_id: str, principal: Principal, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, user_ids: Collection[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
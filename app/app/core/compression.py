@@ -0,0 +1,208 @@
+import hashlib
+import zlib
+from typing import Callable, Optional, Protocol
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Supported content codings, in order of preference when the client weighs several the same
+ENCODINGS = ("br", "gzip")
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/javascript", "application/xml"}
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor:
+    def __init__(self) -> None:
+        # wbits=31 writes the gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(settings.GZIP_COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+COMPRESSORS: dict[str, Callable[[], Compressor]] = {"br": BrotliCompressor, "gzip": GzipCompressor}
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(content) + compressor.finish()
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    The encoding to compress a response with for a request's Accept-Encoding header: the supported one with the
+    highest q-value (brotli over gzip on ties), None if the client accepts neither or compression is turned off
+    """
+    if not accept_encoding or settings.COMPRESSION_MINIMUM_SIZE <= 0:
+        return None
+    weights: dict[str, float] = {}
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        if (weight := weights.get(encoding, weights.get("*", 0.0))) > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """
+    Whether a media type is worth compressing: text and JSON-like types are, images, PDFs or archives (which already
+    are compressed) aren't
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith(("+json", "+xml"))
+
+
+def content_etag(content: bytes) -> str:
+    """
+    Weak ETag for a response body: weak, because the same tag is sent whatever encoding the body is compressed with
+    """
+    return f'W/"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+class EncodedBody:
+    """
+    A response body kept together with the compressed forms it has been sent in, so a cached body is compressed once
+    per encoding instead of on every hit, and with its ETag
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.etag = content_etag(content)
+        self._encoded: dict[str, bytes] = {}
+
+    def encode(self, encoding: Optional[str]) -> tuple[bytes, Optional[str]]:
+        """
+        The body compressed with `encoding` (as returned by `negotiate_encoding`) and the encoding actually used, which
+        is None for bodies below COMPRESSION_MINIMUM_SIZE
+        """
+        if encoding is None or len(self.content) < settings.COMPRESSION_MINIMUM_SIZE:
+            return self.content, None
+        if (encoded := self._encoded.get(encoding)) is None:
+            encoded = self._encoded[encoding] = compress(self.content, encoding)
+        return encoded, encoding
+
+    def precompress(self) -> "EncodedBody":
+        for encoding in ENCODINGS:
+            self.encode(encoding)
+        return self
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the encoding the client prefers, like Starlette's `GZipMiddleware` but negotiating brotli
+    too.
+
+    Responses smaller than `minimum_size`, of types that don't compress well or already encoded (eg. precompressed cache
+    entries, see `EncodedBody`) are sent as is. Streamed bodies are compressed chunk by chunk, flushing after each so
+    clients still receive them as they are produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and (encoding := negotiate_encoding(Headers(scope=scope).get("Accept-Encoding"))):
+            await CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.content_length: Optional[int] = None
+        self.compressor = COMPRESSORS[encoding]()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether the response gets compressed
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or not is_compressible(headers.get("content-type", ""))
+            if (content_length := headers.get("content-length", "")).isdigit():
+                self.content_length = int(content_length)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            # Bodies coming through the app's `http` middlewares arrive in several chunks: the declared length tells
+            # their size up front
+            known_size = len(body) if not more_body else self.content_length
+            if self.passthrough or (known_size is not None and known_size < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compress(body, more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.initial_message)
+            await self.send({**message, "body": body})
+        elif self.passthrough:
+            await self.send(message)
+        else:
+            await self.send({**message, "body": self.compress(body, more_body)})
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        return self.compressor.compress(body) + (self.compressor.flush() if more_body else self.compressor.finish())
@@ -1,6 +1,7 @@
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, HttpUrl, PostgresDsn, validator
+from pydantic.fields import ModelField
 
 
 class Settings(BaseSettings):
@@ -12,6 +13,12 @@ class Settings(BaseSettings):
     # 60 minutes * 24 hours * 30 days = 30 days
     REFRESH_TOKEN_EXPIRES_MINUTES: int = 60 * 24 * 30
 
+    # Stamp access tokens with the user's token version, making them revocable: bumping `users.token_version` (on
+    # password changes and (de)activation) rejects tokens carrying an older version, everywhere once the principal cache
+    # entries expire. Requests are authorized from the principal either way
+    ACCESS_TOKEN_CLAIMS: bool = False
+    ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES: int = 15
+
     SERVER_NAME: str
     SERVER_HOST: AnyHttpUrl
 
@@ -44,6 +51,37 @@ class Settings(BaseSettings):
             port=str(values.get("DB_PORT") or 5432),
         )
 
+    # Applied to the sync and async engines separately, so a worker holds at most twice
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a connection before giving up
+    DB_POOL_TIMEOUT: int = 30
+    # Replace connections older than this many seconds (-1 never does), eg. to stay under a proxy's idle timeout
+    DB_POOL_RECYCLE: int = -1
+    # Test every connection with a round trip when it's checked out. When disabled, stale connections are only
+    # detected by the statement that fails on them (which invalidates the whole pool), so set DB_POOL_RECYCLE instead
+    DB_POOL_PRE_PING: bool = True
+
+    # Optional read replica, used by read-only endpoints through `deps.get_read_db`
+    REPLICA_DATABASE_URI: Optional[PostgresDsn] = None
+    # After a write, reads of the same user stay on the primary for this many seconds so they see their own changes
+    # despite replication lag
+    READ_YOUR_WRITES_SECONDS: int = 5
+
+    # Same databases as SQLALCHEMY_DATABASE_URI and REPLICA_DATABASE_URI through the asyncpg driver, used by
+    # `async def` endpoints
+    ASYNC_SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    ASYNC_REPLICA_DATABASE_URI: Optional[str] = None
+
+    @validator("ASYNC_SQLALCHEMY_DATABASE_URI", "ASYNC_REPLICA_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(cls, v: Optional[str], values: dict[str, Any], field: ModelField) -> Any:
+        if isinstance(v, str):
+            return v
+        if uri := values.get(field.name.removeprefix("ASYNC_")):
+            return f"postgresql+asyncpg://{uri.split('://', 1)[1]}"
+        return None
+
     SMTP_TLS: bool = True
     SMTP_PORT: Optional[int] = None
     SMTP_HOST: Optional[str] = None
@@ -71,6 +109,63 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
 
+    # Processes bcrypt hashing and verification run on (0 runs them in the calling thread)
+    PASSWORD_HASHING_WORKERS: int = 2
+
+    # Adds the number of SQL statements and time spent in the database to every response (X-DB-Query-Count,
+    # X-DB-Time in milliseconds), and logs statements repeated at least N_PLUS_ONE_THRESHOLD times in a request
+    DEBUG: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 10
+
+    # Adds a Server-Timing header splitting each response's time into auth, db, handler and serialization
+    SERVER_TIMING: bool = False
+
+    # Responses of at least COMPRESSION_MINIMUM_SIZE bytes are compressed with brotli or gzip, whichever the client
+    # prefers (0 turns compression off)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESSION_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+
+    # Rows fetched per round trip (through a server-side cursor) by list endpoints streaming newline-delimited JSON
+    STREAM_BATCH_SIZE: int = 1000
+
+    # Largest uploads accepted, by the type sniffed from their first bytes
+    MAX_PDF_UPLOAD_SIZE: int = 25 * 1024 * 1024
+    MAX_IMAGE_UPLOAD_SIZE: int = 5 * 1024 * 1024
+
+    # Where uploads are stored: "local" keeps them on this node under STORAGE_ROOT, "s3" in S3_BUCKET on S3 or any
+    # S3-compatible service (S3_ENDPOINT_URL for one other than AWS, eg. MinIO), which every node can serve them from.
+    # S3 credentials are read from the usual AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    STORAGE_ROOT: str = "."
+    S3_BUCKET: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+
+    @validator("S3_BUCKET", always=True)
+    def check_s3_bucket(cls, v: Optional[str], values: dict[str, Any]) -> Optional[str]:
+        if not v and values.get("STORAGE_BACKEND") == "s3":
+            raise ValueError("S3_BUCKET is required to store uploads in S3")
+        return v
+
+    # Bearer token Prometheus scrapes /utils/metrics with; superusers can read metrics either way
+    METRICS_TOKEN: Optional[str] = None
+
+    # Make relationships that aren't eagerly loaded by a CRUD method raise instead of lazily loading, to catch N+1
+    # query patterns during development
+    RAISE_ON_LAZY_LOAD: bool = False
+
+    TIMETABLE_CACHE_MAX_ENTRIES: int = 1024
+    # Upper bound on how stale a cached timetable can get through writes that don't invalidate it (eg. renaming a
+    # course or a professor)
+    TIMETABLE_CACHE_TTL_SECONDS: int = 60 * 60
+    TIMETABLE_CACHE_WARM_ON_STARTUP: bool = True
+
+    # Authenticated users (and their admin permissions) are cached by ID; writes through `crud` invalidate entries in
+    # the process that made them, so with several workers the TTL bounds how long eg. a deactivated user stays signed in
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
     class Config:
         case_sensitive = True
         env_file = "../.env"
@@ -0,0 +1,107 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Optional, Sequence
+
+
+class Histogram:
+    """
+    Thread-safe histogram over fixed bucket upper bounds, reported cumulatively (like Prometheus histograms)
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, buckets = 0, {}
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": total}
+
+
+# Upper bounds, in seconds, of the buckets request latencies and database times are counted in
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_labels(labels: dict[str, Any]) -> str:
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class RequestMetrics:
+    """
+    Request counters and per-route latency histograms of this worker, rendered in the Prometheus text exposition
+    format. Routes are labelled by their path template (eg. `/api/v1/users/{user_id}`) to keep the number of series
+    bounded.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self._requests: dict[tuple[str, str, int], int] = {}
+        self._latency: dict[tuple[str, str], Histogram] = {}
+        self._db_time: dict[tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status_code: int, duration: float, db_time: float) -> None:
+        with self._lock:
+            self._requests[method, route, status_code] = self._requests.get((method, route, status_code), 0) + 1
+            if (method, route) not in self._latency:
+                self._latency[method, route] = Histogram(self.buckets)
+                self._db_time[method, route] = Histogram(self.buckets)
+            latency, db = self._latency[method, route], self._db_time[method, route]
+        latency.observe(duration)
+        db.observe(db_time)
+
+    def render(self, gauges: Optional[dict[str, tuple[str, float]]] = None) -> str:
+        """
+        :param gauges: Extra gauges sampled at scrape time, as name -> (help text, value)
+        :return: Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            requests = dict(self._requests)
+            histograms = {
+                "http_request_duration_seconds": ("Time spent handling requests", dict(self._latency)),
+                "http_request_db_seconds": ("Time spent executing SQL statements per request", dict(self._db_time)),
+            }
+        lines = [
+            "# HELP http_requests_total Requests handled, by route and status code",
+            "# TYPE http_requests_total counter",
+            *(
+                f"http_requests_total{format_labels({'method': method, 'route': route, 'status': status})} {count}"
+                for (method, route, status), count in sorted(requests.items())
+            ),
+        ]
+        for name, (help_text, series) in histograms.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (method, route), histogram in sorted(series.items()):
+                snapshot = histogram.snapshot()
+                labels = {"method": method, "route": route}
+                lines += [
+                    f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}"
+                    for bound, count in snapshot["buckets"].items()
+                ]
+                lines += [
+                    f"{name}_sum{format_labels(labels)} {snapshot['sum']}",
+                    f"{name}_count{format_labels(labels)} {snapshot['count']}",
+                ]
+        gauges = {"http_requests_in_flight": ("Requests being handled", self.in_flight), **(gauges or {})}
+        for name, (help_text, value) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
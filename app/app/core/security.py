@@ -1,26 +1,40 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Optional
 
-from jose import jwt
+from jose import JWTError, jwt
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 
+from app.core.cache import Principal
 from app.core.config import settings
 from app.schemas.token import Token
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hashing_pool: Optional[ProcessPoolExecutor] = None
+_hashing_pool_lock = threading.Lock()
+
 ALGORITHM = "HS512"
 
 
-def create_token(subject: Any | str) -> Token:
+def create_token(subject: Any | str, claims: Optional[dict[str, Any]] = None) -> Token:
     """
     :param subject: Subject for JWT, in this case user id
+    :param claims: Extra claims for the access token (see `version_claims`), which then expires after
+        ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES
     :return: Token object, containing access and refresh tokens, and the timestamp for the access token's expiry
     """
-    access_delta = get_timedelta_for_type("access")
+    if claims:
+        access_delta = timedelta(minutes=settings.ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES)
+    else:
+        access_delta = get_timedelta_for_type("access")
     expire = datetime.utcnow() + access_delta
     response_expire = datetime.now() + access_delta
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "access"}
     access_token = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     refresh_expiry = datetime.utcnow() + get_timedelta_for_type("refresh")
     to_encode = {"exp": refresh_expiry, "sub": str(subject), "type": "refresh"}
@@ -29,6 +43,28 @@ def create_token(subject: Any | str) -> Token:
     return token
 
 
+def version_claims(principal: Principal) -> dict[str, Any]:
+    """
+    :param principal: Principal of the user the token is issued to
+    :return: Claims stamping the token with the user's current token version, so it can be revoked
+    """
+    return {"ver": principal.user["token_version"]}
+
+
+def get_token_subject(authorization: Optional[str]) -> Optional[str]:
+    """
+    :param authorization: Value of an `Authorization: Bearer <token>` header
+    :return: Subject of the token, WITHOUT verifying it; only fit for routing decisions, never for authentication
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
 def get_timedelta_for_type(type_: str) -> timedelta:
     """
     :param type_: Type of access token
@@ -41,9 +77,57 @@ def get_timedelta_for_type(type_: str) -> timedelta:
     return timedelta(minutes=5)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
+def _hash_password(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def get_hashing_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Process pool bcrypt runs on, so a burst of logins is capped at PASSWORD_HASHING_WORKERS cores instead of taking
+    every request thread (and the GIL) with it. Created on first use; None when hashing is configured to run inline.
+    """
+    global _hashing_pool
+    if _hashing_pool is None and settings.PASSWORD_HASHING_WORKERS > 0:
+        with _hashing_pool_lock:
+            if _hashing_pool is None:
+                # Forking a process that's running request threads can deadlock on locks they hold
+                _hashing_pool = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _hashing_pool
+
+
+def shutdown_hashing_pool() -> None:
+    global _hashing_pool
+    with _hashing_pool_lock:
+        if _hashing_pool is not None:
+            _hashing_pool.shutdown()
+            _hashing_pool = None
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if pool := get_hashing_pool():
+        return pool.submit(_verify_password, plain_password, hashed_password).result()
+    return _verify_password(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    if pool := get_hashing_pool():
+        return pool.submit(_hash_password, password).result()
+    return _hash_password(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    if pool := get_hashing_pool():
+        return await asyncio.wrap_future(pool.submit(_verify_password, plain_password, hashed_password))
+    return await run_in_threadpool(_verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    if pool := get_hashing_pool():
+        return await asyncio.wrap_future(pool.submit(_hash_password, password))
+    return await run_in_threadpool(_hash_password, password)
@@ -0,0 +1,159 @@
+import functools
+import os
+from tempfile import NamedTemporaryFile
+from typing import Any, BinaryIO, Iterator, Protocol
+
+import boto3
+from botocore.exceptions import ClientError
+
+from app.core.config import settings
+
+# Stored objects are written and read this many bytes at a time
+STORAGE_CHUNK_SIZE = 1024 * 1024
+
+
+class Storage(Protocol):
+    """
+    Where the content of uploads is kept, by key (eg. `files/<sha256>.pdf`). Writes are atomic: an object is either
+    fully written or not there at all.
+    """
+
+    def exists(self, key: str) -> bool: ...
+
+    def save(self, key: str, file: BinaryIO) -> None: ...
+
+    def open(self, key: str) -> Iterator[bytes]:
+        """
+        The content of an object in chunks, raising FileNotFoundError right away (not on iteration) if there is none
+        """
+        ...
+
+    def delete(self, key: str) -> None:
+        """
+        Delete an object, if there is one
+        """
+        ...
+
+
+class LocalStorage:
+    """
+    Objects kept as files under `root`, two directory levels down named after the first characters of their name (eg.
+    `files/3f/a2/3fa2....pdf`), so no single directory ends up with more than a few thousand entries.
+
+    Objects stored before they were sharded are still found at their flat path (eg. `files/3fa2....pdf`) until `shard`
+    moves them.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        directory, _, name = key.rpartition("/")
+        return os.path.join(self.root, directory, name[:2], name[2:4], name)
+
+    def flat_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key)) or os.path.exists(self.flat_path(key))
+
+    def save(self, key: str, file: BinaryIO) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name and renamed once complete
+        with NamedTemporaryFile(dir=os.path.dirname(path), prefix=".upload-", delete=False) as buffer:
+            try:
+                while chunk := file.read(STORAGE_CHUNK_SIZE):
+                    buffer.write(chunk)
+            except Exception:
+                buffer.close()
+                os.unlink(buffer.name)
+                raise
+        os.replace(buffer.name, path)
+
+    def open(self, key: str) -> Iterator[bytes]:
+        try:
+            f = open(self.path(key), "rb")
+        except FileNotFoundError:
+            f = open(self.flat_path(key), "rb")
+
+        def chunks() -> Iterator[bytes]:
+            with f:
+                while chunk := f.read(STORAGE_CHUNK_SIZE):
+                    yield chunk
+
+        return chunks()
+
+    def delete(self, key: str) -> None:
+        for path in (self.path(key), self.flat_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def shard(self, directory: str) -> int:
+        """
+        Move the objects kept directly in `directory`, as they were before being sharded, to their sharded path
+
+        :return: How many objects were moved
+        """
+        moved = 0
+        if not os.path.isdir(flat_directory := os.path.join(self.root, directory)):
+            return moved
+        with os.scandir(flat_directory) as entries:
+            for entry in entries:
+                # Leaves the shard directories and the temporary files of uploads being written alone
+                if entry.is_file() and not entry.name.startswith("."):
+                    path = self.path(f"{directory}/{entry.name}")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(entry.path, path)
+                    moved += 1
+        return moved
+
+
+class S3Storage:
+    """
+    Objects kept in a bucket of S3 or any S3-compatible service (eg. MinIO), under their key as is. Large objects are
+    uploaded in parts.
+    """
+
+    def __init__(self, bucket: str, client: Any):
+        self.bucket = bucket
+        self.client = client
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def save(self, key: str, file: BinaryIO) -> None:
+        self.client.upload_fileobj(file, self.bucket, key)
+
+    def open(self, key: str) -> Iterator[bytes]:
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                raise FileNotFoundError(key) from e
+            raise
+        return body.iter_chunks(STORAGE_CHUNK_SIZE)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+@functools.lru_cache(maxsize=None)
+def get_storage() -> Storage:
+    """
+    The backend configured by STORAGE_BACKEND, built on first use
+    """
+    if settings.STORAGE_BACKEND == "s3":
+        client = boto3.client("s3", endpoint_url=settings.S3_ENDPOINT_URL, region_name=settings.S3_REGION)
+        # Set whenever the backend is S3, as checked by the settings
+        assert settings.S3_BUCKET
+        return S3Storage(settings.S3_BUCKET, client)
+    return LocalStorage(settings.STORAGE_ROOT)
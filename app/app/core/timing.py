@@ -0,0 +1,52 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Generator, Optional
+
+
+class RequestTimings:
+    """
+    Time spent in each phase of a request (auth, handler, serialization, ...), reported in the `Server-Timing` header
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+        # When the endpoint function returned, which is where serialization of its return value starts
+        self.endpoint_finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, duration: float) -> None:
+        with self._lock:
+            self.durations[phase] = self.durations.get(phase, 0.0) + duration
+
+    def header(self) -> str:
+        return ", ".join(f"{phase};dur={duration * 1000:.2f}" for phase, duration in self.durations.items())
+
+
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def track_timings() -> Generator[RequestTimings, None, None]:
+    timings = RequestTimings()
+    token = request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        request_timings.reset(token)
+
+
+@contextmanager
+def timed(phase: str) -> Generator[None, None, None]:
+    """
+    Add the time spent in the block to `phase` of the current request, if its timings are being tracked
+    """
+    if (timings := request_timings.get()) is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
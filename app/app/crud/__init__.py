@@ -1,14 +1,15 @@
-from .crud_admin import admin
+from .crud_admin import admin, admin_async
+from .crud_blob import blob
 from .crud_course import course
-from .crud_division import division
-from .crud_file import file
-from .crud_lecture import lecture
-from .crud_professor import professor
+from .crud_division import division, division_async
+from .crud_file import file, file_async
+from .crud_lecture import lecture, lecture_async
+from .crud_professor import professor, professor_async
 from .crud_school import school
-from .crud_student import student
+from .crud_student import student, student_async
 from .crud_term import term
 from .crud_timeslot import timeslot
-from .crud_user import user
+from .crud_user import user, user_async
 from .crud_year import year
 
 # For a new basic set of CRUD operations you could just do
@@ -1,36 +1,152 @@
+import base64
+import binascii
+import copy
+import json
 import logging
-from typing import Any, Generic, Optional, Sequence, Type, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Collection,
+    Generic,
+    Iterator,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, delete, exc, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    InstrumentedAttribute,
+    Session,
+    class_mapper,
+    make_transient_to_detached,
+)
+from sqlalchemy.orm.attributes import instance_state
 
+from app.core.config import settings
+from app.crud.loaders import Selection, schema_loader_options
 from app.db.base_class import Base
-from app.exceptions import BadRequestException
+from app.exceptions import BadRequestException, ConflictException
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+QueriesType = TypeVar("QueriesType", bound="ModelQueries")
 
 
-class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+class ModelQueries(Generic[ModelType]):
+    def __init__(self, model: Type[ModelType], schema: Optional[Type[BaseModel]] = None):
         """
-        CRUD object with default methods to Create, Read, Update, Delete (CRUD).
+        Statements shared by the sync and async CRUD objects of a model.
 
         **Parameters**
 
         * `model`: A SQLAlchemy model class
-        * `schema`: A Pydantic model (schema) class
+        * `schema`: The Pydantic model (schema) class objects are returned through; every relationship it nests is
+          eagerly loaded by the read methods
         """
         self.model = model
+        self.schema = schema
+        self.options = schema_loader_options(model, schema) if schema else []
+
+    def with_selection(self: QueriesType, selection: Optional[Selection]) -> QueriesType:
+        """
+        Copy of this CRUD object whose reads only load what `selection` (from `?fields=`/`?expand=`) keeps of the
+        schema; without a selection, the object itself
+        """
+        if selection is None or self.schema is None:
+            return self
+        selection.check(self.schema)
+        crud_obj = copy.copy(self)
+        crud_obj.options = schema_loader_options(self.model, self.schema, selection)
+        return crud_obj
+
+    @property
+    def primary_key(self) -> InstrumentedAttribute:
+        return getattr(self.model, class_mapper(self.model).primary_key[0].key)
+
+    def select_multi(self, *, skip: int = 0, limit: Optional[int] = 100, **filters: Any) -> Select:
+        return select(self.model).options(*self.options).filter_by(**filters).offset(skip).limit(limit)
+
+    def select_page(self, *, cursor: Optional[str] = None, limit: int = 100, **filters: Any) -> Select:
+        query = (
+            select(self.model).options(*self.options).filter_by(**filters).order_by(self.primary_key).limit(limit + 1)
+        )
+        if cursor:
+            query = query.where(self.primary_key > self.decode_cursor(cursor))
+        return query
+
+    def split_page(self, db_objs: Sequence[ModelType], limit: int) -> tuple[Sequence[ModelType], Optional[str]]:
+        if len(db_objs) > limit:
+            return db_objs[:limit], self.encode_cursor(getattr(db_objs[limit - 1], self.primary_key.key))
+        return db_objs, None
+
+    def detached_from_values(self, values: dict[str, Any]) -> ModelType:
+        """
+        Rebuild an object from cached column values (including its primary key) as if it had been loaded from the
+        database and its session closed, ready to be merged into a session without a query
+        """
+        db_obj = self.model(**values)
+        make_transient_to_detached(db_obj)
+        return db_obj
+
+    @staticmethod
+    def encode_cursor(key: str) -> str:
+        return base64.urlsafe_b64encode(json.dumps([key]).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> str:
+        try:
+            (key,) = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return str(key)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise BadRequestException(detail="Invalid pagination cursor")
+
+
+class CRUDBase(ModelQueries[ModelType], Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    CRUD object with default methods to Create, Read, Update, Delete (CRUD).
+    """
 
     def get(self, db: Session, id: str) -> Optional[ModelType]:
-        return db.get(self.model, id)
+        return db.get(self.model, id, options=self.options)
 
-    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> Sequence[ModelType]:
-        return db.scalars(select(self.model).offset(skip).limit(limit)).all()
+    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100, **filters: Any) -> Sequence[ModelType]:
+        return db.scalars(self.select_multi(skip=skip, limit=limit, **filters)).all()
+
+    def stream(self, db: Session, query: Select) -> Iterator[ModelType]:
+        """
+        Iterate over the objects a query returns as they are fetched, `STREAM_BATCH_SIZE` rows at a time through a
+        server-side cursor, instead of loading the whole result at once. Relationships the schema nests are loaded
+        batch by batch.
+        """
+        yield from db.scalars(query.execution_options(yield_per=settings.STREAM_BATCH_SIZE))
+
+    def stream_multi(
+        self, db: Session, *, skip: int = 0, limit: Optional[int] = None, **filters: Any
+    ) -> Iterator[ModelType]:
+        return self.stream(db, self.select_multi(skip=skip, limit=limit, **filters))
+
+    def get_page(
+        self, db: Session, *, cursor: Optional[str] = None, limit: int = 100, **filters: Any
+    ) -> tuple[Sequence[ModelType], Optional[str]]:
+        """
+        Keyset pagination ordered by primary key: return up to `limit` objects after the one the cursor points to,
+        along with the opaque cursor for the next page (None on the last page). An empty cursor starts from the
+        beginning.
+        """
+        return self.split_page(db.scalars(self.select_page(cursor=cursor, limit=limit, **filters)).all(), limit)
+
+    def merge_cached(self, db: Session, values: dict[str, Any]) -> ModelType:
+        """
+        Attach an object built from cached column values to the session without querying the database. Columns left
+        out of `values` are loaded on first access.
+        """
+        return db.merge(self.detached_from_values(values), load=False)
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
@@ -45,12 +161,12 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return db_obj
 
     def update(self, db: Session, *, db_obj: ModelType, obj_in: UpdateSchemaType | dict[str, Any]) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
+        # Every mapped attribute, not only the ones loaded on `db_obj` (which may come from the principal cache)
+        for field in class_mapper(self.model).attrs.keys():
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
@@ -72,3 +188,124 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 db.rollback()
             return obj
         raise BadRequestException(detail=f"Could not delete object with id {id}")
+
+    def create_multi(self, db: Session, *, objs_in: Sequence[CreateSchemaType]) -> Sequence[ModelType]:
+        """
+        Create all the given objects with a single multi-row INSERT ... RETURNING, committed in one transaction
+        """
+        if not objs_in:
+            return []
+        try:
+            ids = [
+                getattr(db_obj, self.primary_key.key)
+                for db_obj in db.scalars(
+                    insert(self.model).returning(self.model), [jsonable_encoder(obj_in) for obj_in in objs_in]
+                )
+            ]
+            db.commit()
+        except exc.IntegrityError as e:
+            logging.error(f"{e.__class__} - {e.__str__}")
+            db.rollback()
+            raise ConflictException(detail="Some of these objects already exist in the system!")
+        return self._get_ordered(db, ids=ids)
+
+    def update_multi(
+        self, db: Session, *, objs_in: dict[str, UpdateSchemaType | dict[str, Any]]
+    ) -> Sequence[ModelType]:
+        """
+        Update several objects, given as a mapping of primary key to changes, with an executemany UPDATE committed in
+        one transaction
+        """
+        if not objs_in:
+            return []
+        columns = set(class_mapper(self.model).columns.keys())
+        rows = []
+        for id, obj_in in objs_in.items():
+            update_data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+            rows.append({**{k: v for k, v in update_data.items() if k in columns}, self.primary_key.key: id})
+        try:
+            db.execute(update(self.model), rows)
+            db.commit()
+        except exc.IntegrityError as e:
+            logging.error(f"{e.__class__} - {e.__str__}")
+            db.rollback()
+            raise ConflictException(detail="These changes conflict with objects that exist in the system!")
+        return self._get_ordered(db, ids=list(objs_in))
+
+    def remove_multi(self, db: Session, *, ids: Collection[str]) -> Sequence[str]:
+        """
+        Delete all the given objects with a single DELETE ... RETURNING, returning the IDs of the ones that existed
+        """
+        if not ids:
+            return []
+        try:
+            removed_ids = db.scalars(
+                delete(self.model).where(self.primary_key.in_(set(ids))).returning(self.primary_key),
+                execution_options={"synchronize_session": False},
+            ).all()
+            db.commit()
+        except Exception as e:
+            logging.error(f"{e.__class__} - {e.__str__}")
+            db.rollback()
+            raise BadRequestException(detail=f"Could not delete objects with ids {list(ids)}")
+        return removed_ids
+
+    def _get_ordered(self, db: Session, *, ids: Sequence[str]) -> Sequence[ModelType]:
+        """
+        Load the given objects in a single query, in the order of `ids`
+        """
+        db_objs = {
+            getattr(db_obj, self.primary_key.key): db_obj
+            for db_obj in db.scalars(
+                select(self.model).options(*self.options).where(self.primary_key.in_(ids))
+            ).unique()
+        }
+        return [db_objs[id] for id in ids if id in db_objs]
+
+
+class AsyncCRUDBase(ModelQueries[ModelType]):
+    """
+    Read methods of `CRUDBase` on an `AsyncSession`, for endpoints on hot read paths that shouldn't hold a threadpool
+    worker while waiting on the database. Writes stay on `CRUDBase`, whose subclasses keep the caches in sync.
+    """
+
+    async def get(self, db: AsyncSession, id: str) -> Optional[ModelType]:
+        return await db.get(self.model, id, options=self.options)
+
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, **filters: Any
+    ) -> Sequence[ModelType]:
+        return (await db.scalars(self.select_multi(skip=skip, limit=limit, **filters))).all()
+
+    async def stream(self, db: AsyncSession, query: Select) -> AsyncIterator[ModelType]:
+        async for db_obj in await db.stream_scalars(query.execution_options(yield_per=settings.STREAM_BATCH_SIZE)):
+            yield db_obj
+
+    def stream_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: Optional[int] = None, **filters: Any
+    ) -> AsyncIterator[ModelType]:
+        return self.stream(db, self.select_multi(skip=skip, limit=limit, **filters))
+
+    async def get_page(
+        self, db: AsyncSession, *, cursor: Optional[str] = None, limit: int = 100, **filters: Any
+    ) -> tuple[Sequence[ModelType], Optional[str]]:
+        return self.split_page((await db.scalars(self.select_page(cursor=cursor, limit=limit, **filters))).all(), limit)
+
+    async def merge_cached(self, db: AsyncSession, values: dict[str, Any]) -> ModelType:
+        return await db.merge(self.detached_from_values(values), load=False)
+
+    async def load(self, db: AsyncSession, db_obj: ModelType) -> ModelType:
+        """
+        Load whatever an object attached by `merge_cached` is missing, relationships included, since an `AsyncSession`
+        can't load them lazily. Objects that are fully loaded are returned as is.
+        """
+        if not instance_state(db_obj).unloaded:
+            return db_obj
+        return (
+            await db.scalars(
+                select(self.model)
+                .options(*self.options)
+                .where(self.primary_key == getattr(db_obj, self.primary_key.key))
+                .execution_options(populate_existing=True)
+            )
+        ).one()
@@ -4,14 +4,16 @@ from typing import Any, Optional
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.crud.base import CRUDBase
+from app import schemas
+from app.core.cache import principal_cache
+from app.crud.base import AsyncCRUDBase, CRUDBase
 from app.models import Admin
 from app.schemas import AdminCreate, AdminUpdate
 
 
 class CRUDAdmin(CRUDBase[Admin, AdminCreate, AdminUpdate]):
     def get(self, db: Session, id: str) -> Optional[Admin]:
-        return db.scalars(select(Admin).filter_by(user_id=id).limit(1)).first()
+        return db.scalars(select(Admin).options(*self.options).filter_by(user_id=id).limit(1)).first()
 
     def create(self, db: Session, *, obj_in: AdminCreate) -> Admin:
         db_obj = Admin(user_id=obj_in.user_id, permissions=obj_in.permissions)
@@ -22,6 +24,7 @@ class CRUDAdmin(CRUDBase[Admin, AdminCreate, AdminUpdate]):
             logging.error(f"{e.__class__} - {e.__str__}")
             db.rollback()
         db.refresh(db_obj)
+        principal_cache.invalidate([db_obj.user_id])
         return db_obj
 
     def update(self, db: Session, *, db_obj: Admin, obj_in: AdminUpdate | dict[str, Any]) -> Admin:
@@ -29,7 +32,15 @@ class CRUDAdmin(CRUDBase[Admin, AdminCreate, AdminUpdate]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        admin = super().update(db, db_obj=db_obj, obj_in=update_data)
+        principal_cache.invalidate([admin.user_id])
+        return admin
 
+    def remove(self, db: Session, *, id: str) -> Admin:
+        admin = super().remove(db, id=id)
+        principal_cache.invalidate([id])
+        return admin
 
-admin = CRUDAdmin(Admin)
+
+admin = CRUDAdmin(Admin, schemas.Admin)
+admin_async = AsyncCRUDBase(Admin, schemas.Admin)
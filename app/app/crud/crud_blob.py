@@ -0,0 +1,81 @@
+from collections import Counter
+from typing import Collection, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.blobs import delete_content
+from app.crud.base import ModelQueries
+from app.models import Blob
+
+
+class CRUDBlob(ModelQueries[Blob]):
+    """
+    Reference counting of the blobs uploads are stored in.
+
+    Taking a reference and deleting content that lost its last one both hold a transaction-level advisory lock on the
+    blob's hash, so content released for the last time by one request can't be deleted under another that is taking a
+    new reference to it (and found it already stored).
+    """
+
+    def get_by_filename(self, db: Session, *, filename: str) -> Optional[Blob]:
+        return db.scalars(select(Blob).filter_by(filename=filename).limit(1)).first()
+
+    def acquire(self, db: Session, *, sha256: str, filename: str, media_type: str, size: int) -> None:
+        """
+        Take a reference to the blob with this content, creating its row if there is none. Not committed: the
+        reference is meant to be committed along with the row that holds it (eg. the new `File`), and the caller
+        stores the content first if it isn't already (see `app.uploads.save_upload`).
+        """
+        self.lock_content(db, sha256s=[sha256])
+        db.execute(
+            insert(Blob)
+            .values(sha256=sha256, filename=filename, media_type=media_type, size=size, ref_count=1)
+            .on_conflict_do_update(index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + 1})
+        )
+
+    @staticmethod
+    def lock_content(db: Session, *, sha256s: Collection[str]) -> None:
+        """
+        Take the advisory locks guarding the content of these blobs, held until the transaction ends
+        """
+        for sha256 in sorted(set(sha256s)):
+            db.execute(select(func.pg_advisory_xact_lock(func.hashtext(sha256))))
+
+    def release(self, db: Session, *, filenames: Collection[str]) -> None:
+        """
+        Drop a reference to the blobs stored under `filenames`, one for each time they are listed, deleting the ones
+        that aren't referenced anymore. Filenames that aren't blobs (files uploaded before blobs were introduced) are
+        ignored.
+
+        Content is deleted once the deletion of the rows is committed, and only for blobs that no request has taken a
+        new reference to since.
+        """
+        references = Counter(filenames)
+        blobs = db.scalars(
+            select(Blob).where(Blob.filename.in_(references)).order_by(Blob.sha256).with_for_update()
+        ).all()
+        released: dict[str, str] = {}
+        for blob in blobs:
+            blob.ref_count -= references[blob.filename]
+            if blob.ref_count <= 0:
+                db.delete(blob)
+                released[blob.sha256] = blob.filename
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if not released:
+            return
+
+        self.lock_content(db, sha256s=released)
+        referenced = set(db.scalars(select(Blob.sha256).where(Blob.sha256.in_(released))))
+        for sha256, filename in released.items():
+            if sha256 not in referenced:
+                delete_content(filename)
+        db.commit()
+
+
+blob = CRUDBlob(Blob)
@@ -1,8 +1,9 @@
-from typing import Optional
+from typing import Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 
+from app import schemas
 from app.crud.base import CRUDBase
 from app.models import Course
 from app.schemas import CourseCreate, CourseUpdate
@@ -14,5 +15,19 @@ class CRUDCourse(CRUDBase[Course, CourseCreate, CourseUpdate]):
             select(Course).filter_by(name=name, course_code=course_code, term_id=term_id).limit(1)
         ).first()
 
+    def get_multi_by_details(self, db: Session, *, objs_in: Sequence[CourseCreate]) -> Sequence[Course]:
+        """
+        Fetch every existing course that matches the details of any of the given ones, in a single query
+        """
+        if not objs_in:
+            return []
+        return db.scalars(
+            select(Course).where(
+                tuple_(Course.name, Course.course_code, Course.term_id).in_(
+                    [(obj_in.name, obj_in.course_code, obj_in.term_id) for obj_in in objs_in]
+                )
+            )
+        ).all()
+
 
-course = CRUDCourse(Course)
+course = CRUDCourse(Course, schemas.Course)
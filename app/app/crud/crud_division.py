@@ -1,16 +1,147 @@
-from typing import Optional
+from typing import Any, Collection, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Select, delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.crud.base import CRUDBase
-from app.models import Division
+from app import schemas
+from app.core.cache import timetable_cache
+from app.crud.base import AsyncCRUDBase, CRUDBase, ModelQueries
+from app.models import Division, StudentDivision
 from app.schemas import DivisionCreate, DivisionUpdate
 
 
-class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
+class DivisionQueries(ModelQueries[Division]):
+    def select_ids_by_student(self, *, student_id: str) -> Select:
+        return select(StudentDivision.division_id).filter_by(student_id=student_id)
+
+    def select_ids_by_professor(self, *, professor_id: str) -> Select:
+        return select(Division.id).filter_by(professor_id=professor_id)
+
+    def select_course_ids_by_student(self, *, student_id: str) -> Select:
+        return (
+            select(Division.course_id)
+            .join(StudentDivision, StudentDivision.division_id == Division.id)
+            .where(StudentDivision.student_id == student_id)
+        )
+
+    def select_course_ids_by_professor(self, *, professor_id: str) -> Select:
+        return select(Division.course_id).filter_by(professor_id=professor_id)
+
+
+class CRUDDivision(DivisionQueries, CRUDBase[Division, DivisionCreate, DivisionUpdate]):
     def get_by_details(self, db: Session, *, course_id: str, division_code: int) -> Optional[Division]:
         return db.scalars(select(Division).filter_by(course_id=course_id, division_code=division_code).limit(1)).first()
 
+    def get_multi_by_details(self, db: Session, *, objs_in: Sequence[DivisionCreate]) -> Sequence[Division]:
+        """
+        Fetch every existing division that matches the details of any of the given ones, in a single query
+        """
+        if not objs_in:
+            return []
+        return db.scalars(
+            select(Division).where(
+                tuple_(Division.course_id, Division.division_code).in_(
+                    [(obj_in.course_id, obj_in.division_code) for obj_in in objs_in]
+                )
+            )
+        ).all()
+
+    def get_by_student(self, db: Session, *, student_id: str) -> Sequence[Division]:
+        return db.scalars(
+            select(Division)
+            .options(*self.options)
+            .join(StudentDivision, StudentDivision.division_id == Division.id)
+            .where(StudentDivision.student_id == student_id)
+        ).all()
+
+    def get_by_professor(self, db: Session, *, professor_id: str) -> Sequence[Division]:
+        return db.scalars(select(Division).options(*self.options).filter_by(professor_id=professor_id)).all()
+
+    def get_ids_by_student(self, db: Session, *, student_id: str) -> list[str]:
+        return list(db.scalars(self.select_ids_by_student(student_id=student_id)))
+
+    def get_ids_by_professor(self, db: Session, *, professor_id: str) -> list[str]:
+        return list(db.scalars(self.select_ids_by_professor(professor_id=professor_id)))
+
+    def get_course_ids_by_student(self, db: Session, *, student_id: str) -> set[str]:
+        return set(db.scalars(self.select_course_ids_by_student(student_id=student_id)))
+
+    def get_course_ids_by_professor(self, db: Session, *, professor_id: str) -> set[str]:
+        return set(db.scalars(self.select_course_ids_by_professor(professor_id=professor_id)))
+
+    def get_student_ids(self, db: Session, *, division_id: str, student_ids: Collection[str]) -> set[str]:
+        """
+        Return the subset of the given students that are already enrolled in the division
+        """
+        if not student_ids:
+            return set()
+        return set(
+            db.scalars(
+                select(StudentDivision.student_id).where(
+                    StudentDivision.division_id == division_id, StudentDivision.student_id.in_(set(student_ids))
+                )
+            )
+        )
+
+    def add_students(self, db: Session, *, division_id: str, batch_numbers: dict[str, int]) -> None:
+        """
+        Enroll students (mapped to their batch numbers) into a division with a single multi-row INSERT.
+
+        The caller is responsible for committing the transaction.
+        """
+        if batch_numbers:
+            db.execute(
+                insert(StudentDivision).values(
+                    [
+                        {"student_id": student_id, "division_id": division_id, "batch_number": batch_number}
+                        for student_id, batch_number in batch_numbers.items()
+                    ]
+                )
+            )
+
+    def remove_student(self, db: Session, *, division_id: str, student_id: str) -> None:
+        """
+        Unenroll a student from a division. The caller is responsible for committing the transaction.
+        """
+        db.execute(delete(StudentDivision).filter_by(division_id=division_id, student_id=student_id))
+
+    def update(self, db: Session, *, db_obj: Division, obj_in: DivisionUpdate | dict[str, Any]) -> Division:
+        division = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        timetable_cache.invalidate_divisions([division.id])
+        return division
+
+    def remove(self, db: Session, *, id: str) -> Division:
+        division = super().remove(db, id=id)
+        timetable_cache.invalidate_divisions([id])
+        return division
+
+    def update_multi(self, db: Session, *, objs_in: dict[str, DivisionUpdate | dict[str, Any]]) -> Sequence[Division]:
+        divisions = super().update_multi(db, objs_in=objs_in)
+        timetable_cache.invalidate_divisions(objs_in.keys())
+        return divisions
+
+    def remove_multi(self, db: Session, *, ids: Collection[str]) -> Sequence[str]:
+        removed_ids = super().remove_multi(db, ids=ids)
+        timetable_cache.invalidate_divisions(removed_ids)
+        return removed_ids
+
+
+division = CRUDDivision(Division, schemas.Division)
+
+
+class AsyncCRUDDivision(DivisionQueries, AsyncCRUDBase[Division]):
+    async def get_ids_by_student(self, db: AsyncSession, *, student_id: str) -> list[str]:
+        return list(await db.scalars(self.select_ids_by_student(student_id=student_id)))
+
+    async def get_ids_by_professor(self, db: AsyncSession, *, professor_id: str) -> list[str]:
+        return list(await db.scalars(self.select_ids_by_professor(professor_id=professor_id)))
+
+    async def get_course_ids_by_student(self, db: AsyncSession, *, student_id: str) -> set[str]:
+        return set(await db.scalars(self.select_course_ids_by_student(student_id=student_id)))
+
+    async def get_course_ids_by_professor(self, db: AsyncSession, *, professor_id: str) -> set[str]:
+        return set(await db.scalars(self.select_course_ids_by_professor(professor_id=professor_id)))
+
 
-division = CRUDDivision(Division)
+division_async = AsyncCRUDDivision(Division, schemas.Division)
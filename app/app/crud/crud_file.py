@@ -1,25 +1,61 @@
-from typing import Sequence
+from typing import Collection, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.crud.base import CRUDBase
+from app import schemas
+from app.crud.base import AsyncCRUDBase, CRUDBase, ModelQueries
+from app.crud.crud_blob import blob
 from app.models import File
 from app.schemas import FileCreate, FileUpdate
 
 
-class CRUDFile(CRUDBase[File, FileCreate, FileUpdate]):
+class FileQueries(ModelQueries[File]):
+    def select_by_courses(self, *, course_ids: Collection[str]) -> Select:
+        return select(File).options(*self.options).where(File.course_id.in_(set(course_ids)))
+
+
+class CRUDFile(FileQueries, CRUDBase[File, FileCreate, FileUpdate]):
     def get_by_owner_course(self, db: Session, *, course_id: str, owner_id: str) -> Sequence[File]:
-        return db.scalars(select(File).filter_by(course_id=course_id, owner_id=owner_id)).all()
+        return db.scalars(select(File).options(*self.options).filter_by(course_id=course_id, owner_id=owner_id)).all()
 
     def get_by_owner(self, db: Session, *, owner_id: str) -> Sequence[File]:
-        return db.scalars(select(File).filter_by(owner_id=owner_id)).all()
+        return db.scalars(select(File).options(*self.options).filter_by(owner_id=owner_id)).all()
 
     def get_by_course(self, db: Session, *, course_id: str) -> Sequence[File]:
-        return db.scalars(select(File).filter_by(course_id=course_id)).all()
+        return db.scalars(select(File).options(*self.options).filter_by(course_id=course_id)).all()
+
+    def get_by_courses(self, db: Session, *, course_ids: Collection[str]) -> Sequence[File]:
+        if not course_ids:
+            return []
+        return db.scalars(self.select_by_courses(course_ids=course_ids)).all()
 
     def get_by_submission(self, db: Session, *, submission_id: str) -> Sequence[File]:
-        return db.scalars(select(File).filter_by(submission_id=submission_id)).all()
+        return db.scalars(select(File).options(*self.options).filter_by(submission_id=submission_id)).all()
+
+    def remove(self, db: Session, *, id: str) -> File:
+        # Submissions to an assignment are deleted along with it
+        filenames = db.scalars(select(File.filename).where((File.id == id) | (File.submission_id == id))).all()
+        file = super().remove(db, id=id)
+        blob.release(db, filenames=filenames)
+        return file
+
+
+file = CRUDFile(File, schemas.File)
+
+
+class AsyncCRUDFile(FileQueries, AsyncCRUDBase[File]):
+    async def get_by_owner(self, db: AsyncSession, *, owner_id: str) -> Sequence[File]:
+        return (await db.scalars(select(File).options(*self.options).filter_by(owner_id=owner_id))).all()
+
+    async def get_by_courses(self, db: AsyncSession, *, course_ids: Collection[str]) -> Sequence[File]:
+        if not course_ids:
+            return []
+        return (await db.scalars(self.select_by_courses(course_ids=course_ids))).all()
+
+    async def get_by_submission(self, db: AsyncSession, *, submission_id: str) -> Sequence[File]:
+        return (await db.scalars(select(File).options(*self.options).filter_by(submission_id=submission_id))).all()
 
 
-file = CRUDFile(File)
+file_async = AsyncCRUDFile(File, schemas.File)
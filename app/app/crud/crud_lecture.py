@@ -1,14 +1,45 @@
-from typing import Optional, Sequence
+import calendar
+from collections import defaultdict
+from typing import Any, Collection, Optional, Sequence
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager, joinedload
 
-from app.crud.base import CRUDBase
-from app.models import Lecture
+from app import schemas
+from app.core.cache import timetable_cache
+from app.crud.base import AsyncCRUDBase, CRUDBase, ModelQueries
+from app.models import Course, Division, Lecture, Professor, Term, TimeSlot, User, Year
 from app.schemas import LectureCreate, LectureUpdate
 
 
-class CRUDLecture(CRUDBase[Lecture, LectureCreate, LectureUpdate]):
+class LectureQueries(ModelQueries[Lecture]):
+    def select_by_divisions(self, *, division_ids: Collection[str]) -> Select:
+        division = joinedload(Lecture.division)
+        return (
+            select(Lecture)
+            .where(Lecture.division_id.in_(division_ids))
+            .join(Lecture.time_slot)
+            .order_by(TimeSlot.start_time, Lecture.id)
+            .options(
+                contains_eager(Lecture.time_slot).joinedload(TimeSlot.school),
+                division.joinedload(Division.course)
+                .joinedload(Course.term)
+                .joinedload(Term.year)
+                .joinedload(Year.school),
+                division.joinedload(Division.professor).joinedload(Professor.user).joinedload(User.school),
+            )
+        )
+
+    @staticmethod
+    def group_by_day(lectures: Sequence[Lecture]) -> dict[str, list[Lecture]]:
+        lectures_by_day: dict[str, list[Lecture]] = defaultdict(list)
+        for lecture in lectures:
+            lectures_by_day[lecture.day].append(lecture)
+        return {day: lectures_by_day[day] for day in calendar.day_name if day in lectures_by_day}
+
+
+class CRUDLecture(LectureQueries, CRUDBase[Lecture, LectureCreate, LectureUpdate]):
     def get_by_details(
         self, db: Session, *, day: str, time_slot_id: str, division_id: str, type: str, room_number: str
     ) -> Optional[Lecture]:
@@ -24,11 +55,90 @@ class CRUDLecture(CRUDBase[Lecture, LectureCreate, LectureUpdate]):
             .limit(1)
         ).first()
 
+    def get_multi_by_details(self, db: Session, *, objs_in: Sequence[LectureCreate]) -> Sequence[Lecture]:
+        """
+        Fetch every existing lecture that matches the details of any of the given ones, in a single query
+        """
+        if not objs_in:
+            return []
+        return db.scalars(
+            select(Lecture).where(
+                tuple_(Lecture.day, Lecture.time_slot_id, Lecture.division_id, Lecture.type, Lecture.room_number).in_(
+                    [
+                        (obj_in.day, obj_in.time_slot_id, obj_in.division_id, obj_in.type, obj_in.room_number)
+                        for obj_in in objs_in
+                    ]
+                )
+            )
+        ).all()
+
     def get_by_division(self, db: Session, *, division_id: str) -> Sequence[Lecture]:
-        return db.scalars(select(Lecture).filter_by(division_id=division_id)).all()
+        return db.scalars(select(Lecture).options(*self.options).filter_by(division_id=division_id)).all()
 
     def get_by_day_division(self, db: Session, *, day: str, division_id: str) -> Sequence[Lecture]:
-        return db.scalars(select(Lecture).filter_by(day=day, division_id=division_id)).all()
+        return db.scalars(select(Lecture).options(*self.options).filter_by(day=day, division_id=division_id)).all()
+
+    def get_by_divisions(self, db: Session, *, division_ids: Collection[str]) -> Sequence[Lecture]:
+        """
+        Fetch all lectures for the given divisions in a single query, with everything the `Lecture` schema nests
+        (time slot, division, course tree and professor) loaded in the same round trip
+        """
+        if not division_ids:
+            return []
+        return db.scalars(self.select_by_divisions(division_ids=division_ids)).unique().all()
+
+    def get_timetable(self, db: Session, *, division_ids: Collection[str]) -> dict[str, list[Lecture]]:
+        """
+        Group the lectures of the given divisions by day (in calendar order), sorted by their start time
+        """
+        return self.group_by_day(self.get_by_divisions(db, division_ids=division_ids))
+
+    def create(self, db: Session, *, obj_in: LectureCreate) -> Lecture:
+        lecture = super().create(db, obj_in=obj_in)
+        timetable_cache.invalidate_divisions([lecture.division_id])
+        return lecture
+
+    def update(self, db: Session, *, db_obj: Lecture, obj_in: LectureUpdate | dict[str, Any]) -> Lecture:
+        # The lecture might be moved to another division, so both the old and new ones need to be invalidated
+        division_id = db_obj.division_id
+        lecture = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        timetable_cache.invalidate_divisions([division_id, lecture.division_id])
+        return lecture
+
+    def remove(self, db: Session, *, id: str) -> Lecture:
+        lecture = super().remove(db, id=id)
+        timetable_cache.invalidate_divisions([lecture.division_id])
+        return lecture
+
+    def create_multi(self, db: Session, *, objs_in: Sequence[LectureCreate]) -> Sequence[Lecture]:
+        lectures = super().create_multi(db, objs_in=objs_in)
+        timetable_cache.invalidate_divisions({lecture.division_id for lecture in lectures})
+        return lectures
+
+    def update_multi(self, db: Session, *, objs_in: dict[str, LectureUpdate | dict[str, Any]]) -> Sequence[Lecture]:
+        division_ids = set(db.scalars(select(Lecture.division_id).where(Lecture.id.in_(objs_in))))
+        lectures = super().update_multi(db, objs_in=objs_in)
+        timetable_cache.invalidate_divisions(division_ids | {lecture.division_id for lecture in lectures})
+        return lectures
+
+    def remove_multi(self, db: Session, *, ids: Collection[str]) -> Sequence[str]:
+        division_ids = set(db.scalars(select(Lecture.division_id).where(Lecture.id.in_(ids))))
+        removed_ids = super().remove_multi(db, ids=ids)
+        timetable_cache.invalidate_divisions(division_ids)
+        return removed_ids
+
+
+lecture = CRUDLecture(Lecture, schemas.Lecture)
+
+
+class AsyncCRUDLecture(LectureQueries, AsyncCRUDBase[Lecture]):
+    async def get_by_divisions(self, db: AsyncSession, *, division_ids: Collection[str]) -> Sequence[Lecture]:
+        if not division_ids:
+            return []
+        return (await db.scalars(self.select_by_divisions(division_ids=division_ids))).unique().all()
+
+    async def get_timetable(self, db: AsyncSession, *, division_ids: Collection[str]) -> dict[str, list[Lecture]]:
+        return self.group_by_day(await self.get_by_divisions(db, division_ids=division_ids))
 
 
-lecture = CRUDLecture(Lecture)
+lecture_async = AsyncCRUDLecture(Lecture, schemas.Lecture)
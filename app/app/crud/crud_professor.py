@@ -4,14 +4,15 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.crud.base import CRUDBase
+from app import schemas
+from app.crud.base import AsyncCRUDBase, CRUDBase
 from app.models import Professor
 from app.schemas import ProfessorCreate, ProfessorUpdate
 
 
 class CRUDProfessor(CRUDBase[Professor, ProfessorCreate, ProfessorUpdate]):
     def get(self, db: Session, id: str) -> Optional[Professor]:
-        return db.scalars(select(Professor).filter_by(user_id=id).limit(1)).first()
+        return db.scalars(select(Professor).options(*self.options).filter_by(user_id=id).limit(1)).first()
 
     def create(self, db: Session, *, obj_in: ProfessorCreate) -> Professor:
         db_obj = Professor(user_id=obj_in.user_id)
@@ -25,4 +26,5 @@ class CRUDProfessor(CRUDBase[Professor, ProfessorCreate, ProfessorUpdate]):
         return db_obj
 
 
-professor = CRUDProfessor(Professor)
+professor = CRUDProfessor(Professor, schemas.Professor)
+professor_async = AsyncCRUDBase(Professor, schemas.Professor)
@@ -3,6 +3,7 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app import schemas
 from app.crud.base import CRUDBase
 from app.models import School
 from app.schemas import SchoolCreate, SchoolUpdate
@@ -16,4 +17,4 @@ class CRUDSchool(CRUDBase[School, SchoolCreate, SchoolUpdate]):
         return db.scalars(select(School).filter_by(head=head).limit(1)).first()
 
 
-school = CRUDSchool(School)
+school = CRUDSchool(School, schemas.School)
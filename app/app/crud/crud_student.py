@@ -1,18 +1,36 @@
 import logging
-from typing import Any, Optional
+from typing import Any, Collection, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Select, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.crud.base import CRUDBase
+from app import schemas
+from app.crud.base import AsyncCRUDBase, CRUDBase, ModelQueries
 from app.exceptions import BadRequestException
-from app.models import Student
+from app.models import Student, StudentDivision
 from app.schemas import StudentCreate, StudentUpdate
 
 
-class CRUDStudent(CRUDBase[Student, StudentCreate, StudentUpdate]):
+class StudentQueries(ModelQueries[Student]):
+    def select_by_term(self, *, term_id: str) -> Select:
+        return select(Student).options(*self.options).filter_by(term_id=term_id)
+
+    def select_by_division(self, *, division_id: str, batch_number: Optional[int] = None) -> Select:
+        query = (
+            select(Student)
+            .options(*self.options)
+            .join(StudentDivision, StudentDivision.student_id == Student.user_id)
+            .where(StudentDivision.division_id == division_id)
+        )
+        if batch_number is not None:
+            query = query.where(StudentDivision.batch_number == batch_number)
+        return query
+
+
+class CRUDStudent(StudentQueries, CRUDBase[Student, StudentCreate, StudentUpdate]):
     def get(self, db: Session, id: str) -> Optional[Student]:
-        return db.scalars(select(Student).filter_by(user_id=id).limit(1)).first()
+        return db.scalars(select(Student).options(*self.options).filter_by(user_id=id).limit(1)).first()
 
     def create(self, db: Session, *, obj_in: StudentCreate) -> Student:
         db_obj = Student(user_id=obj_in.user_id, term_id=obj_in.term_id)
@@ -32,6 +50,26 @@ class CRUDStudent(CRUDBase[Student, StudentCreate, StudentUpdate]):
             update_data = obj_in.dict(exclude_unset=True)
         return super().update(db, db_obj=db_obj, obj_in=update_data)
 
+    def get_by_term(self, db: Session, *, term_id: str) -> Sequence[Student]:
+        return db.scalars(self.select_by_term(term_id=term_id)).all()
+
+    def get_by_division(
+        self, db: Session, *, division_id: str, batch_number: Optional[int] = None
+    ) -> Sequence[Student]:
+        return db.scalars(self.select_by_division(division_id=division_id, batch_number=batch_number)).all()
+
+    def set_term(self, db: Session, *, ids: Collection[str], term_id: Optional[str]) -> None:
+        """
+        Move all the given students into a term with a single UPDATE statement.
+
+        The caller is responsible for committing the transaction.
+        """
+        if ids:
+            db.execute(
+                update(Student).where(Student.user_id.in_(set(ids))).values(term_id=term_id),
+                execution_options={"synchronize_session": False},
+            )
+
     def remove(self, db: Session, *, id: str) -> Student:
         if obj := db.scalars(select(Student).filter_by(user_id=id).limit(1)).first():
             db.delete(obj)
@@ -44,4 +82,14 @@ class CRUDStudent(CRUDBase[Student, StudentCreate, StudentUpdate]):
         raise BadRequestException(detail=f"Could not delete object with id {id}")
 
 
-student = CRUDStudent(Student)
+student = CRUDStudent(Student, schemas.Student)
+
+
+class AsyncCRUDStudent(StudentQueries, AsyncCRUDBase[Student]):
+    async def get_by_division(
+        self, db: AsyncSession, *, division_id: str, batch_number: Optional[int] = None
+    ) -> Sequence[Student]:
+        return (await db.scalars(self.select_by_division(division_id=division_id, batch_number=batch_number))).all()
+
+
+student_async = AsyncCRUDStudent(Student, schemas.Student)
@@ -1,11 +1,13 @@
+from collections import defaultdict
 from datetime import date
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 
+from app import schemas
 from app.crud.base import CRUDBase
-from app.models import Term
+from app.models import Student, StudentDivision, Term
 from app.schemas import TermCreate, TermUpdate
 
 
@@ -32,5 +34,29 @@ class CRUDTerm(CRUDBase[Term, TermCreate, TermUpdate]):
             .limit(1)
         ).first()
 
+    def get_student_division_sets(
+        self, db: Session, *, term_id: Optional[str] = None, on: Optional[date] = None
+    ) -> set[frozenset[str]]:
+        """
+        Distinct sets of divisions that students are enrolled in, either for the given term or for every active term
+        running on the given date (defaults to today)
+        """
+        query = (
+            select(StudentDivision.student_id, StudentDivision.division_id)
+            .join(Student, Student.user_id == StudentDivision.student_id)
+            .join(Term, Term.id == Student.term_id)
+        )
+        if term_id:
+            query = query.where(Term.id == term_id)
+        else:
+            on = on or date.today()
+            query = query.where(
+                Term.is_active.is_(True), Term.start_date <= on, or_(Term.end_date.is_(None), Term.end_date >= on)
+            )
+        divisions: dict[str, set[str]] = defaultdict(set)
+        for student_id, division_id in db.execute(query):
+            divisions[student_id].add(division_id)
+        return {frozenset(division_ids) for division_ids in divisions.values()}
+
 
-term = CRUDTerm(Term)
+term = CRUDTerm(Term, schemas.Term)
@@ -1,9 +1,11 @@
 from datetime import time
-from typing import Optional, Sequence
+from typing import Any, Collection, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 
+from app import schemas
+from app.core.cache import timetable_cache
 from app.crud.base import CRUDBase
 from app.models import TimeSlot
 from app.schemas import TimeSlotCreate, TimeSlotUpdate
@@ -15,8 +17,43 @@ class CRUDTimeSlot(CRUDBase[TimeSlot, TimeSlotCreate, TimeSlotUpdate]):
             select(TimeSlot).filter_by(start_time=start_time, end_time=end_time, school_id=school_id).limit(1)
         ).first()
 
+    def get_multi_by_details(self, db: Session, *, objs_in: Sequence[TimeSlotCreate]) -> Sequence[TimeSlot]:
+        """
+        Fetch every existing timeslot that matches the details of any of the given ones, in a single query
+        """
+        if not objs_in:
+            return []
+        return db.scalars(
+            select(TimeSlot).where(
+                tuple_(TimeSlot.start_time, TimeSlot.end_time, TimeSlot.school_id).in_(
+                    [(obj_in.start_time, obj_in.end_time, obj_in.school_id) for obj_in in objs_in]
+                )
+            )
+        ).all()
+
     def get_by_school(self, db: Session, *, school_id: str) -> Sequence[TimeSlot]:
-        return db.scalars(select(TimeSlot).filter_by(school_id=school_id)).all()
+        return db.scalars(select(TimeSlot).options(*self.options).filter_by(school_id=school_id)).all()
+
+    # Timeslots are shared by every division in a school, so any change to one drops the whole timetable cache
+    def update(self, db: Session, *, db_obj: TimeSlot, obj_in: TimeSlotUpdate | dict[str, Any]) -> TimeSlot:
+        timeslot = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        timetable_cache.clear()
+        return timeslot
+
+    def remove(self, db: Session, *, id: str) -> TimeSlot:
+        timeslot = super().remove(db, id=id)
+        timetable_cache.clear()
+        return timeslot
+
+    def update_multi(self, db: Session, *, objs_in: dict[str, TimeSlotUpdate | dict[str, Any]]) -> Sequence[TimeSlot]:
+        timeslots = super().update_multi(db, objs_in=objs_in)
+        timetable_cache.clear()
+        return timeslots
+
+    def remove_multi(self, db: Session, *, ids: Collection[str]) -> Sequence[str]:
+        removed_ids = super().remove_multi(db, ids=ids)
+        timetable_cache.clear()
+        return removed_ids
 
 
-timeslot = CRUDTimeSlot(TimeSlot)
+timeslot = CRUDTimeSlot(TimeSlot, schemas.TimeSlot)
@@ -1,13 +1,16 @@
 import logging
-from typing import Any, Optional, Sequence
+from typing import Any, Collection, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Row, Select, Update, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app import schemas
+from app.core.cache import Principal, principal_cache
 from app.core.security import get_password_hash, verify_password
-from app.crud import admin, professor, student
-from app.crud.base import CRUDBase
-from app.models import User
+from app.crud import admin, blob, professor, student
+from app.crud.base import AsyncCRUDBase, CRUDBase, ModelQueries
+from app.models import Admin, File, Student, User
 from app.schemas import (
     AdminCreate,
     ProfessorCreate,
@@ -16,15 +19,68 @@ from app.schemas import (
     UserUpdate,
 )
 
+# Changing any of these revokes the user's claims-carrying access tokens
+TOKEN_REVOKING_FIELDS = {"hashed_password", "is_active"}
+
+
+class UserQueries(ModelQueries[User]):
+    def select_by_email(self, *, email: str) -> Select:
+        return select(User).options(*self.options).filter_by(email=email).limit(1)
+
+    @staticmethod
+    def select_principal(*, id: str) -> Select:
+        return select(User, Admin.permissions).outerjoin(Admin, Admin.user_id == User.id).where(User.id == id)
+
+    @staticmethod
+    def update_token_versions(*, ids: Collection[str]) -> Update:
+        """
+        Bump the users' token versions, revoking their claims-carrying access tokens; execute it in the transaction of
+        the write that revokes them
+        """
+        return (
+            update(User)
+            .where(User.id.in_(set(ids)))
+            .values(token_version=User.token_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def to_principal(row: Optional[Row]) -> Optional[Principal]:
+        if row is None:
+            return None
+        user, permissions = row
+        return Principal(
+            user={
+                column.key: getattr(user, column.key)
+                for column in User.__mapper__.column_attrs
+                if column.key != "hashed_password"
+            },
+            admin_permissions=permissions,
+        )
 
-class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+
+class CRUDUser(UserQueries, CRUDBase[User, UserCreate, UserUpdate]):
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.scalars(select(User).filter_by(email=email).limit(1)).first()
+        return db.scalars(self.select_by_email(email=email)).first()
+
+    def get_principal(self, db: Session, *, id: str) -> Optional[Principal]:
+        """
+        The user's row and admin permissions in a single query, cached across requests until the user or its admin
+        object is written through `crud` (or the entry expires)
+        """
+        if (principal := principal_cache.get(id)) is None:
+            generation = principal_cache.generation
+            if principal := self.to_principal(db.execute(self.select_principal(id=id)).first()):
+                principal_cache.set(id, principal, generation=generation)
+        return principal
 
     def create(self, db: Session, *, obj_in: UserCreate) -> User:
+        # Hashed before this method uses the session, so callers that closed it first (see the create_user endpoint)
+        # don't hold a connection while bcrypt runs
+        hashed_password = get_password_hash(obj_in.password)
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashed_password,
             full_name=obj_in.full_name,
             type=obj_in.type,
             is_admin=obj_in.is_admin or obj_in.type in ("admin", "superuser"),
@@ -66,7 +122,37 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             else:
                 admin.remove(db, id=db_obj.id)
 
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        if update_data.keys() & TOKEN_REVOKING_FIELDS:
+            db.execute(self.update_token_versions(ids=[db_obj.id]))
+        user = super().update(db, db_obj=db_obj, obj_in=update_data)
+        principal_cache.invalidate([user.id])
+        return user
+
+    @staticmethod
+    def get_blob_filenames(db: Session, *, ids: Collection[str]) -> list[str]:
+        """
+        Filenames of the blobs the users' rows hold, or that are deleted along with them: their profile pictures, the
+        files they own and the submissions to their assignments
+        """
+        owned = select(File.id).where(File.owner_id.in_(set(ids)))
+        return [
+            *db.scalars(select(User.profile_picture).where(User.id.in_(set(ids)), User.profile_picture.is_not(None))),
+            *db.scalars(select(File.filename).where(File.id.in_(owned) | File.submission_id.in_(owned))),
+        ]
+
+    def remove(self, db: Session, *, id: str) -> User:
+        filenames = self.get_blob_filenames(db, ids=[id])
+        user = super().remove(db, id=id)
+        blob.release(db, filenames=filenames)
+        principal_cache.invalidate([id])
+        return user
+
+    def remove_multi(self, db: Session, *, ids: Collection[str]) -> Sequence[str]:
+        filenames = self.get_blob_filenames(db, ids=ids)
+        removed_ids = super().remove_multi(db, ids=ids)
+        blob.release(db, filenames=filenames)
+        principal_cache.invalidate(removed_ids)
+        return removed_ids
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         user = self.get_by_email(db, email=email)
@@ -83,10 +169,44 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return user.type == "superuser"
 
     def get_all_students_for_school(self, db: Session, *, school_id: str) -> Sequence[User]:
-        return db.scalars(select(User).filter_by(type="student").filter_by(school_id=school_id)).all()
+        return db.scalars(
+            select(User).options(*self.options).filter_by(type="student").filter_by(school_id=school_id)
+        ).all()
 
     def get_all_professors_for_school(self, db: Session, *, school_id: str) -> Sequence[User]:
-        return db.scalars(select(User).filter_by(type="professor").filter_by(school_id=school_id)).all()
+        return db.scalars(
+            select(User).options(*self.options).filter_by(type="professor").filter_by(school_id=school_id)
+        ).all()
+
+    def get_student_details(self, db: Session, *, ids: Collection[str]) -> dict[str, Row]:
+        """
+        Fetch the type, school and student record (`student_id`, `term_id`) of every given user in a single query,
+        keyed by user ID. Users without a student object have `student_id` set to None, and IDs that don't belong to
+        any user are left out.
+        """
+        if not ids:
+            return {}
+        rows = db.execute(
+            select(User.id, User.type, User.school_id, Student.user_id.label("student_id"), Student.term_id)
+            .outerjoin(Student, Student.user_id == User.id)
+            .where(User.id.in_(set(ids)))
+        )
+        return {row.id: row for row in rows}
+
+
+user = CRUDUser(User, schemas.User)
+
+
+class AsyncCRUDUser(UserQueries, AsyncCRUDBase[User]):
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        return (await db.scalars(self.select_by_email(email=email))).first()
+
+    async def get_principal(self, db: AsyncSession, *, id: str) -> Optional[Principal]:
+        if (principal := principal_cache.get(id)) is None:
+            generation = principal_cache.generation
+            if principal := self.to_principal((await db.execute(self.select_principal(id=id))).first()):
+                principal_cache.set(id, principal, generation=generation)
+        return principal
 
 
-user = CRUDUser(User)
+user_async = AsyncCRUDUser(User, schemas.User)
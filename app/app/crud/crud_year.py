@@ -3,6 +3,7 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app import schemas
 from app.crud.base import CRUDBase
 from app.models import Year
 from app.schemas import YearCreate, YearUpdate
@@ -17,4 +18,4 @@ class CRUDYear(CRUDBase[Year, YearCreate, YearUpdate]):
         ).first()
 
 
-year = CRUDYear(Year)
+year = CRUDYear(Year, schemas.Year)
@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import Optional, Type
+
+from pydantic import BaseModel
+from pydantic.fields import ModelField
+from sqlalchemy.orm import class_mapper, joinedload, raiseload, selectinload
+from sqlalchemy.orm.interfaces import ORMOption
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.exceptions import BadRequestException
+
+
+def nested_schema(field: ModelField) -> Optional[Type[BaseModel]]:
+    """
+    The schema a field nests (directly or in a list), None for plain fields
+    """
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        return field.type_
+    return None
+
+
+@dataclass(frozen=True)
+class Selection:
+    """
+    Which fields of a response schema to load and return, from the `?fields=` and `?expand=` query parameters.
+
+    * `fields` lists dotted field paths (eg. `id,division_code,course.name`); at every level some path ends, only the
+      fields named there are kept, other levels keep all their plain fields
+    * `expand` lists dotted paths of nested schemas (eg. `course,professor.user`); when given, nested schemas that
+      aren't expanded (or named by `fields`) are left out, otherwise every one of them is included as before
+
+    Nested schemas that are left out aren't loaded either.
+    """
+
+    fields: Optional[frozenset[str]] = None
+    expand: tuple[tuple[str, "Selection"], ...] = ()
+    expand_all: bool = True
+
+    @classmethod
+    def parse(cls, fields: Optional[str], expand: Optional[str]) -> Optional["Selection"]:
+        if fields is None and expand is None:
+            return None
+        return cls.build(
+            [path.split(".") for path in (fields or "").split(",") if path],
+            [path.split(".") for path in (expand or "").split(",") if path],
+            expand_all=expand is None,
+        )
+
+    @classmethod
+    def build(cls, fields: list[list[str]], expand: list[list[str]], expand_all: bool) -> "Selection":
+        own_fields = frozenset(path[0] for path in fields if len(path) == 1)
+        nested = {path[0] for path in expand} | {path[0] for path in fields if len(path) > 1}
+        return cls(
+            fields=own_fields or None,
+            expand=tuple(
+                (
+                    name,
+                    cls.build(
+                        [path[1:] for path in fields if len(path) > 1 and path[0] == name],
+                        [path[1:] for path in expand if len(path) > 1 and path[0] == name],
+                        expand_all,
+                    ),
+                )
+                for name in sorted(nested)
+            ),
+            expand_all=expand_all,
+        )
+
+    def includes(self, name: str, field: ModelField) -> bool:
+        if nested_schema(field) is None:
+            return self.fields is None or name in self.fields
+        if name in dict(self.expand):
+            return True
+        return name in self.fields if self.fields is not None else self.expand_all
+
+    def nested(self, name: str) -> "Selection":
+        return dict(self.expand).get(name) or Selection(expand_all=self.expand_all)
+
+    def check(self, schema: Type[BaseModel]) -> None:
+        """
+        Raise a 400 for fields that `schema` doesn't have, or that are expanded without nesting a schema
+        """
+        for name in self.fields or ():
+            if name not in schema.__fields__:
+                raise BadRequestException(detail=f"Unknown field {name} of {schema.__name__}")
+        for name, selection in self.expand:
+            if name not in schema.__fields__ or not (nested := nested_schema(schema.__fields__[name])):
+                raise BadRequestException(detail=f"{schema.__name__} has no nested object {name} to expand")
+            selection.check(nested)
+
+
+def schema_loader_options(
+    model: Type[Base], schema: Type[BaseModel], selection: Optional[Selection] = None
+) -> list[ORMOption]:
+    """
+    Build the loader options that eagerly load everything a response schema nests, so serializing a list of objects
+    doesn't trigger a lazy load per object and relationship.
+
+    Every field of the schema that is itself a schema and shares its name with a relationship of the model is loaded
+    (joinedload for many-to-one, selectinload for collections), recursing into the nested schema. With a `selection`,
+    only the nested schemas it includes are. With `RAISE_ON_LAZY_LOAD` set, every other relationship raises when it is
+    lazily loaded, which surfaces new N+1 query patterns during development.
+    """
+    relationships = class_mapper(model).relationships
+    options: list[ORMOption] = []
+    for name, field in schema.__fields__.items():
+        if name not in relationships or not (nested := nested_schema(field)):
+            continue
+        if selection and not selection.includes(name, field):
+            continue
+        relationship = relationships[name]
+        loader = selectinload if relationship.uselist else joinedload
+        options.append(
+            loader(getattr(model, name)).options(
+                *schema_loader_options(  # type: ignore
+                    relationship.mapper.class_, nested, selection.nested(name) if selection else None
+                )
+            )
+        )
+    if settings.RAISE_ON_LAZY_LOAD:
+        options.append(raiseload("*", sql_only=True))
+    return options
@@ -0,0 +1,76 @@
+import time
+from typing import Any, Type
+
+from sqlalchemy import event
+from sqlalchemy.pool import ConnectionPoolEntry, Pool, PoolProxiedConnection, QueuePool
+
+from app.core.metrics import Histogram
+
+# Seconds
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+CHECKOUT_DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self.wait_time = Histogram(WAIT_TIME_BUCKETS)
+        self.checkout_duration = Histogram(CHECKOUT_DURATION_BUCKETS)
+
+
+class MeteredPool:
+    """
+    Mixin for queue pools recording how long callers wait to get a connection (including pre-ping and connecting) and
+    how long they hold on to it. Metrics are class attributes so they survive the engine recreating its pool on dispose.
+    """
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        event.listen(self, "checkout", self._start_checkout)
+        event.listen(self, "checkin", self._end_checkout)
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()  # type: ignore
+        finally:
+            self.metrics.wait_time.observe(time.perf_counter() - start)
+
+    @staticmethod
+    def _start_checkout(dbapi_connection: Any, connection_record: ConnectionPoolEntry, connection_proxy: Any) -> None:
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    def _end_checkout(self, dbapi_connection: Any, connection_record: ConnectionPoolEntry) -> None:
+        if (checked_out_at := connection_record.info.pop("checked_out_at", None)) is not None:
+            self.metrics.checkout_duration.observe(time.perf_counter() - checked_out_at)
+
+    def usage(self) -> dict[str, Any]:
+        """
+        Connection counts and wait/checkout histograms, as reported by `/utils/db-pool`. Not named `status`, which
+        SQLAlchemy pools already have (returning a one-line summary)
+        """
+        return {
+            "size": self.size(),  # type: ignore
+            "checked_out": self.checkedout(),  # type: ignore
+            "checked_in": self.checkedin(),  # type: ignore
+            # QueuePool counts overflow from -pool_size
+            "overflow": max(self.overflow(), 0),  # type: ignore
+            "wait_time": self.metrics.wait_time.snapshot(),
+            "checkout_duration": self.metrics.checkout_duration.snapshot(),
+        }
+
+
+def metered_pool_class(pool_class: Type[QueuePool]) -> Type[QueuePool]:
+    """
+    Subclass of the given pool class with its own set of metrics, to be used by a single engine
+    """
+    return type(f"Metered{pool_class.__name__}", (MeteredPool, pool_class), {"metrics": PoolMetrics()})
+
+
+def pool_usage(pool: Pool) -> dict[str, Any]:
+    """
+    Usage of an engine's pool, which is a `MeteredPool` for every engine of `app.db.session`
+    """
+    assert isinstance(pool, MeteredPool)
+    return pool.usage()
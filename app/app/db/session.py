@@ -1,7 +1,140 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Generator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
+from app.db.pool import metered_pool_class
+
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+
+def create_sync_engine(uri: str) -> Engine:
+    return create_engine(uri, poolclass=metered_pool_class(QueuePool), **pool_options)
+
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI.__str__(), pool_pre_ping=True)
+def create_asyncpg_engine(uri: str) -> AsyncEngine:
+    return create_async_engine(uri, poolclass=metered_pool_class(AsyncAdaptedQueuePool), **pool_options)
+
+
+engine = create_sync_engine(settings.SQLALCHEMY_DATABASE_URI.__str__())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_asyncpg_engine(settings.ASYNC_SQLALCHEMY_DATABASE_URI.__str__())
+# Objects are not expired on commit, since refreshing them lazily isn't possible outside of an `await`
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+# Without a replica configured, reads go to the primary
+replica_engine = create_sync_engine(str(settings.REPLICA_DATABASE_URI)) if settings.REPLICA_DATABASE_URI else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+async_replica_engine = (
+    create_asyncpg_engine(settings.ASYNC_REPLICA_DATABASE_URI) if settings.ASYNC_REPLICA_DATABASE_URI else async_engine
+)
+AsyncReadSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_replica_engine)
+
+
+class PrimaryPins:
+    """
+    Users that wrote recently, whose reads go to the primary until the replicas have caught up. Pins are kept per
+    worker process.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._expiry: dict[str, float] = {}
+        self._prune_at = 1024
+        self._lock = threading.Lock()
+
+    def pin(self, user_id: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expiry[user_id] = now + self.ttl
+            # Drop expired pins every now and then, so the table only holds recent writers
+            if len(self._expiry) > self._prune_at:
+                self._expiry = {user_id: expiry for user_id, expiry in self._expiry.items() if expiry > now}
+                self._prune_at = max(1024, 2 * len(self._expiry))
+
+    def is_pinned(self, user_id: Optional[str]) -> bool:
+        with self._lock:
+            return user_id is not None and self._expiry.get(user_id, 0) > time.monotonic()
+
+
+primary_pins = PrimaryPins(settings.READ_YOUR_WRITES_SECONDS)
+
+
+class QueryStats:
+    """
+    Number of SQL statements and total time spent executing them, collected over the lifetime of a request
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Statements executed at least `threshold` times, which usually means a query is being run per row (N+1)
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Generator[QueryStats, None, None]:
+    """
+    Record every statement executed within the current context (and the threads it dispatches work to)
+    """
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats.reset(token)
+
+
+def start_query_timer(
+    conn: Connection, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def record_query(
+    conn: Connection, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    if stats := query_stats.get():
+        stats.record(statement, duration)
+
+
+def discard_query_timer(context: ExceptionContext) -> None:
+    if context.connection is not None and (start_times := context.connection.info.get("query_start_time")):
+        start_times.pop()
+
+
+for _engine in {engine, async_engine.sync_engine, replica_engine, async_replica_engine.sync_engine}:
+    event.listen(_engine, "before_cursor_execute", start_query_timer)
+    event.listen(_engine, "after_cursor_execute", record_query)
+    event.listen(_engine, "handle_error", discard_query_timer)
@@ -28,6 +28,11 @@ class ConflictException(HTTPException):
         super().__init__(detail=detail, status_code=status.HTTP_409_CONFLICT)
 
 
+class RequestEntityTooLargeException(HTTPException):
+    def __init__(self, detail: Any):
+        super().__init__(detail=detail, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
 class UnsupportedMediaTypeException(HTTPException):
     def __init__(self, detail: Any):
         super().__init__(detail=detail, status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
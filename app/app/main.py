@@ -1,13 +1,29 @@
 import logging
 import sys
+import time
+from typing import Awaitable, Callable
 
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api_v1.api import api_router
+from app.api.api_v1.endpoints.timetable import warm_timetable_cache
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.metrics import request_metrics
+from app.core.security import get_token_subject, shutdown_hashing_pool
+from app.core.timing import track_timings
+from app.db.session import (
+    SessionLocal,
+    async_engine,
+    async_replica_engine,
+    primary_pins,
+    track_queries,
+)
+from app.uploads import max_upload_request_size
 
 logging.basicConfig(
     format="[%(levelname)s] (%(asctime)s) %(module)s:%(pathname)s:%(funcName)s:%(lineno)s:: %(message)s",
@@ -18,6 +34,95 @@ logging.basicConfig(
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
 
+app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+@app.middleware("http")
+async def track_db_queries(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    with track_queries() as stats:
+        request.state.query_stats = stats
+        response = await call_next(request)
+    if settings.DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time"] = f"{stats.duration * 1000:.2f}"
+        for statement, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+            logging.warning(
+                f"Possible N+1 query in {request.method} {request.url.path}, executed {count} times: "
+                f"{' '.join(statement.split())}"
+            )
+    return response
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    # Wraps `track_db_queries`, whose stats for the request are left on `request.state`. Latency runs until the
+    # response starts, so it doesn't include streaming the body to the client
+    request_metrics.in_flight += 1
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        request_metrics.in_flight -= 1
+        route = request.scope.get("route")
+        stats = getattr(request.state, "query_stats", None)
+        request_metrics.observe(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            status_code,
+            time.perf_counter() - start,
+            stats.duration if stats else 0.0,
+        )
+
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    if not settings.SERVER_TIMING:
+        return await call_next(request)
+    start = time.perf_counter()
+    with track_timings() as timings:
+        response = await call_next(request)
+    if stats := getattr(request.state, "query_stats", None):
+        # Statements run during auth and the handler, so this overlaps with both
+        timings.add("db", stats.duration)
+    timings.add("total", time.perf_counter() - start)
+    response.headers["Server-Timing"] = timings.header()
+    return response
+
+
+@app.middleware("http")
+async def pin_writers_to_primary(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        if user_id := get_token_subject(request.headers.get("Authorization")):
+            primary_pins.pin(user_id)
+    return response
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    # Parsing a form buffers the whole body before any dependency or endpoint runs, so uploads too large for any type
+    # are turned down on their declared length first; the limit for the type of the upload is enforced as it's read
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_upload_request_size():
+            return ORJSONResponse(
+                {"detail": f"Request body is larger than {max_upload_request_size()} bytes"}, status_code=413
+            )
+    return await call_next(request)
+
+
+# Added after the `http` middlewares so they wrap them: responses those return early (eg. the 413 for an oversized
+# upload) are still compressed, reported to Sentry and given CORS headers. The last one added is outermost
+if settings.COMPRESSION_MINIMUM_SIZE > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+if settings.SENTRY_DSN:
+    sentry_sdk.init(dsn=settings.SENTRY_DSN)
+    app.add_middleware(SentryAsgiMiddleware)
+
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -25,12 +130,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Query-Count", "X-DB-Time", "Server-Timing"],
 )
 
-if settings.SENTRY_DSN:
-    sentry_sdk.init(dsn=settings.SENTRY_DSN)
-    app.add_middleware(SentryAsgiMiddleware)
 
-app.include_router(api_router, prefix=settings.API_V1_STR)
+@app.on_event("startup")
+def warm_timetables() -> None:
+    if settings.TIMETABLE_CACHE_WARM_ON_STARTUP:
+        db = SessionLocal()
+        try:
+            logging.info(f"Cached {warm_timetable_cache(db)} timetables for running terms")
+        except Exception as e:
+            logging.error(f"Could not warm timetable cache: {e.__class__} - {e.__str__()}")
+        finally:
+            db.close()
+
+
+@app.on_event("shutdown")
+async def close_async_connections() -> None:
+    # asyncpg connections are bound to the event loop they were opened on
+    await async_engine.dispose()
+    await async_replica_engine.dispose()
+    shutdown_hashing_pool()
+
 
 logging.info("Starting application")
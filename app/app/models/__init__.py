@@ -1,3 +1,4 @@
+from .blob import Blob
 from .course import Course
 from .division import Division
 from .file import File
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+from sqlalchemy.orm import Mapped
+
+from app.db.base_class import Base
+
+
+class Blob(Base):
+    """
+    Content of an upload, stored once under its SHA-256 however many files and profile pictures have the same content
+    (`File.filename` and `User.profile_picture` hold the blob's filename); `ref_count` counts them
+    """
+
+    sha256: Mapped[str] = Column(String(64), primary_key=True)
+    filename: Mapped[str] = Column(String(69), unique=True, nullable=False)
+    media_type: Mapped[str] = Column(String(32), nullable=False)
+    size: Mapped[int] = Column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = Column(Integer, nullable=False, default=0)
@@ -11,6 +11,6 @@ class Course(Base, IDMixin):
     elective_code: Mapped[str] | None = Column(String(20), index=True, nullable=True)
     term_id: Mapped[str] = Column(String(36), ForeignKey("terms.id", ondelete="CASCADE"), index=True, nullable=False)
 
-    term: Term = relationship("Term")
+    term: Mapped[Term] = relationship("Term")
 
     __table_args__ = (UniqueConstraint("name", "course_code", "term_id", name="_unique_by_name_code_term"),)
@@ -18,8 +18,8 @@ class Division(Base, IDMixin):
     )
     number_of_batches: Mapped[int] = Column(Integer, index=True, nullable=False)
 
-    course: Course = relationship("Course")
-    professor: Professor = relationship("Professor", back_populates="divisions")
+    course: Mapped[Course] = relationship("Course")
+    professor: Mapped[Professor] = relationship("Professor", back_populates="divisions")
     students: list["Student"] = association_proxy(
         "student_division",
         "student",
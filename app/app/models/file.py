@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, relationship
 
 from app.db.base_class import Base, IDMixin
@@ -11,10 +11,14 @@ class File(Base, IDMixin):
         String(36), ForeignKey("courses.id", ondelete="CASCADE"), index=True, nullable=False
     )
     owner_id: Mapped[str] = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
-    filename: Mapped[str] = Column(String(41), unique=True, nullable=False)
+    # Blobs are shared, so several files can have the same filename
+    filename: Mapped[str] = Column(String(69), index=True, nullable=False)
     file_type: Mapped[str] = Column(String(10), nullable=False)
-    submission_id: Mapped[str] | None = Column(String(36), ForeignKey("files.id", ondelete="CASCADE"), nullable=True)
-    marks: Mapped[int] | None = Column(Integer, nullable=True)
+    submission_id: Mapped[str | None] = Column(String(36), ForeignKey("files.id", ondelete="CASCADE"), nullable=True)
+    marks: Mapped[int | None] = Column(Integer, nullable=True)
     description: Mapped[str] = Column(Text, nullable=False)
-    owner: User = relationship("User")
-    course: Course = relationship("Course")
+    # Recorded when the file is uploaded (files uploaded before they were introduced have neither)
+    size: Mapped[int | None] = Column(BigInteger, nullable=True)
+    sha256: Mapped[str | None] = Column(String(64), index=True, nullable=True)
+    owner: Mapped[User] = relationship("User")
+    course: Mapped[Course] = relationship("Course")
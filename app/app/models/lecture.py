@@ -17,5 +17,5 @@ class Lecture(Base, IDMixin):
     type: Mapped[str] = Column(String(9), nullable=False)
     room_number: Mapped[str] = Column(String(5))
 
-    time_slot: TimeSlot = relationship("TimeSlot")
-    division: Division = relationship("Division")
+    time_slot: Mapped[TimeSlot] = relationship("TimeSlot")
+    division: Mapped[Division] = relationship("Division")
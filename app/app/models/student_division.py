@@ -14,7 +14,7 @@ class StudentDivision(Base, IDMixin):
     )
     batch_number: Mapped[int] = Column("batch_number", Integer, index=True)
 
-    student: Student = relationship(Student, backref=backref("student_division", cascade="all, delete-orphan"))
-    division: "Division" = relationship(
+    student: Mapped[Student] = relationship(Student, backref=backref("student_division", cascade="all, delete-orphan"))
+    division: Mapped["Division"] = relationship(
         "Division", backref=backref("student_division", cascade="all, delete-orphan")
     )  # type: ignore
@@ -13,5 +13,5 @@ class Professor(Base):
         primary_key=True,
     )
 
-    user: User = relationship("User")
+    user: Mapped[User] = relationship("User")
     divisions: list["Division"] = relationship("Division", back_populates="professor")  # type: ignore
@@ -14,10 +14,10 @@ class Student(Base):
         index=True,
         primary_key=True,
     )
-    user: User = relationship("User")
-    term_id: Mapped[str] | None = Column(
+    user: Mapped[User] = relationship("User")
+    term_id: Mapped[str | None] = Column(
         String(36), ForeignKey("terms.id", ondelete="CASCADE"), index=True, nullable=True
     )
 
-    term: Term | None = relationship("Term", back_populates="students")
+    term: Mapped[Term | None] = relationship("Term", back_populates="students")
     divisions: list["Division"] = association_proxy("student_division", "division")
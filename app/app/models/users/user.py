@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, String
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlalchemy.orm import Mapped, relationship
 
@@ -9,10 +9,12 @@ from app.models.school import School
 class User(Base, IDMixin):
     full_name: Mapped[str] = Column(String, index=True)
     email: Mapped[str] = Column(String, unique=True, index=True, nullable=False)
-    profile_picture: Mapped[str] | None = Column(String, default=None, nullable=True)
+    profile_picture: Mapped[str | None] = Column(String, default=None, nullable=True)
     hashed_password: Mapped[str] = Column(String, nullable=False)
     is_active: Mapped[bool] = Column(Boolean, default=True)
     is_admin: Mapped[bool] = Column(Boolean, default=False)
     type: Mapped[str] = Column(ENUM("superuser", "student", "professor", "admin", name="user_type"), nullable=False)
-    school_id: Mapped[str] | None = Column(ForeignKey("schools.id", ondelete="CASCADE"), index=True, nullable=True)
-    school: School | None = relationship("School")
+    school_id: Mapped[str | None] = Column(ForeignKey("schools.id", ondelete="CASCADE"), index=True, nullable=True)
+    school: Mapped[School | None] = relationship("School")
+    # Bumped to revoke the user's claims-carrying access tokens, which are stamped with the version they were issued at
+    token_version: Mapped[int] = Column(Integer, nullable=False, default=0, server_default="0")
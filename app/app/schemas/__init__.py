@@ -3,6 +3,7 @@ from .division import Division, DivisionCreate, DivisionUpdate
 from .file import File, FileCreate, FileUpdate
 from .lecture import Lecture, LectureCreate, LectureUpdate
 from .msg import Msg
+from .pool import PoolStatus
 from .school import School, SchoolCreate, SchoolUpdate
 from .term import Term, TermCreate, TermUpdate
 from .timeslot import TimeSlot, TimeSlotCreate, TimeSlotUpdate
@@ -14,6 +14,8 @@ class FileBase(BaseModel):
     submission_id: Optional[str]
     marks: Optional[int]
     description: Optional[str]
+    size: Optional[int]
+    sha256: Optional[str]
 
 
 class FileCreate(FileBase):
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+
+class Histogram(BaseModel):
+    # Cumulative number of observations under each upper bound (in seconds)
+    buckets: dict[str, int]
+    count: int
+    sum: float
+
+
+class PoolStatus(BaseModel):
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    wait_time: Histogram
+    checkout_duration: Histogram
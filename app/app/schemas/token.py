@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -10,3 +12,5 @@ class Token(BaseModel):
 class TokenPayload(BaseModel):
     sub: str = ""
     type: str = ""
+    # Token version of access tokens issued with ACCESS_TOKEN_CLAIMS, absent otherwise
+    ver: Optional[int] = None
@@ -0,0 +1,23 @@
+import logging
+
+from app.core.blobs import DIRECTORIES
+from app.core.config import settings
+from app.core.storage import LocalStorage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Move uploads stored before local storage was sharded (directly in `files/` and `profile_pictures/`) to their
+    sharded path. Until then they are read from where they are, so this can run while the app is serving requests.
+    """
+    storage = LocalStorage(settings.STORAGE_ROOT)
+    for directory in sorted(set(DIRECTORIES.values())):
+        logger.info(f"Moving uploads in {directory}/ to their sharded path")
+        logger.info(f"Moved {storage.shard(directory)} uploads")
+
+
+if __name__ == "__main__":
+    main()
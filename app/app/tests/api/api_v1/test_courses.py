@@ -126,3 +126,23 @@ def test_get_course_weakadmin(client: TestClient, db: Session) -> None:
     )
     r = client.get(f"{settings.API_V1_STR}/courses/", headers=admin_user_token_headers)
     assert r.status_code == 403
+
+
+def test_create_courses_bulk(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    term_id = create_random_term(db).id
+    data = [
+        {"name": random_lower_string(), "course_code": random_lower_string()[:20], "term_id": term_id} for _ in range(3)
+    ]
+    r = client.post(f"{settings.API_V1_STR}/courses/bulk", headers=superuser_token_headers, json=data)
+    assert r.status_code == 200
+    created_courses = r.json()
+    assert [course["name"] for course in created_courses] == [course["name"] for course in data]
+    for course in data:
+        assert crud.course.get_by_details(db, name=course["name"], course_code=course["course_code"], term_id=term_id)
+
+    r = client.post(f"{settings.API_V1_STR}/courses/bulk", headers=superuser_token_headers, json=data)
+    assert r.status_code == 409
+    assert set(r.json()["detail"]["courses"]) == {course["id"] for course in created_courses}
+    duplicate = {"name": random_lower_string(), "course_code": random_lower_string()[:20], "term_id": term_id}
+    r = client.post(f"{settings.API_V1_STR}/courses/bulk", headers=superuser_token_headers, json=[duplicate, duplicate])
+    assert r.status_code == 409
@@ -1,6 +1,9 @@
+import json
 import logging
 from random import randint
+from typing import Callable
 
+import pytest
 from sqlalchemy import exc
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
@@ -312,6 +315,29 @@ def test_get_division_students(client: TestClient, superuser_token_headers: dict
         assert student.user_id in fetched_students
 
 
+def test_get_division_students_stream(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    course = create_random_course(db)
+    division = create_random_division(db, course_id=course.id)
+    students = [
+        create_random_student(db, school_id=course.term.year.school_id, term_id=course.term_id) for _ in range(3)
+    ]
+    for student in students:
+        division.students.append({"student": student, "batch_number": 1})
+    db.commit()
+    monkeypatch.setattr(settings, "STREAM_BATCH_SIZE", 2)
+    r = client.get(
+        f"{settings.API_V1_STR}/divisions/{division.id}/students",
+        headers={**superuser_token_headers, "Accept": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    assert r.headers["Content-Type"] == "application/x-ndjson"
+    streamed = [json.loads(line) for line in r.text.splitlines()]
+    assert {student["user_id"] for student in streamed} == {student.user_id for student in students}
+    assert all(student["user"]["id"] == student["user_id"] for student in streamed)
+
+
 def test_get_division_students_professor(client: TestClient, db: Session) -> None:
     course = create_random_course(db)
     professor = create_random_user(db, type="professor", school_id=course.term.year.school_id)
@@ -576,3 +602,61 @@ def test_remove_division_student_not_in_division(
         f"{settings.API_V1_STR}/divisions/{division.id}/students/{student.user_id}", headers=superuser_token_headers
     )
     assert r.status_code == 404
+
+
+def test_get_division_batch_students_query_budget(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session, query_budget: Callable
+) -> None:
+    course = create_random_course(db)
+    division = create_random_division(db, course_id=course.id)
+    students = [
+        create_random_student(db, school_id=course.term.year.school_id, term_id=course.term_id) for _ in range(15)
+    ]
+    crud.division.add_students(db, division_id=division.id, batch_numbers={student.user_id: 1 for student in students})
+    db.commit()
+    with query_budget(5):
+        r = client.get(f"{settings.API_V1_STR}/divisions/{division.id}/students/1", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert {student["user_id"] for student in r.json()} == {student.user_id for student in students}
+
+
+def test_query_stats_headers(
+    client: TestClient, superuser_token_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/divisions/", headers=superuser_token_headers)
+    assert "X-DB-Query-Count" not in r.headers
+    monkeypatch.setattr(settings, "DEBUG", True)
+    r = client.get(f"{settings.API_V1_STR}/divisions/", headers=superuser_token_headers)
+    assert int(r.headers["X-DB-Query-Count"]) > 0
+    assert float(r.headers["X-DB-Time"]) > 0
+
+
+def test_get_division_sparse_fields(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session, query_budget: Callable
+) -> None:
+    division = create_random_division(db)
+    url = f"{settings.API_V1_STR}/divisions/{division.id}"
+    with query_budget(2) as stats:
+        r = client.get(url, headers=superuser_token_headers, params={"fields": "id,division_code"})
+    assert r.status_code == 200
+    (statement,) = [statement for statement in stats.statements if "FROM divisions" in statement]
+    assert "JOIN" not in statement
+    assert r.json() == {"id": division.id, "division_code": division.division_code}
+
+    r = client.get(url, headers=superuser_token_headers, params={"expand": "course", "fields": "id,course.name"})
+    assert r.status_code == 200
+    result = r.json()
+    assert result["course"] == {"name": division.course.name}
+    assert set(result) == {"id", "course"}
+
+    r = client.get(url, headers=superuser_token_headers, params={"expand": "course.term"})
+    assert r.status_code == 200
+    assert r.json()["course"]["term"]["id"] == division.course.term_id
+    assert "year" not in r.json()["course"]["term"]
+
+
+def test_get_divisions_sparse_fields_unknown(client: TestClient, superuser_token_headers: dict[str, str]) -> None:
+    r = client.get(f"{settings.API_V1_STR}/divisions/", headers=superuser_token_headers, params={"fields": "nope"})
+    assert r.status_code == 400
+    r = client.get(f"{settings.API_V1_STR}/divisions/", headers=superuser_token_headers, params={"expand": "id"})
+    assert r.status_code == 400
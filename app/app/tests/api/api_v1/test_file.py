@@ -0,0 +1,204 @@
+import hashlib
+import os
+import pathlib
+from typing import Iterator
+
+import boto3
+import pytest
+from moto import mock_aws
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from app import crud
+from app.core.blobs import blob_filename, has_content
+from app.core.config import settings
+from app.core.storage import LocalStorage, S3Storage, get_storage
+from app.tests.utils.course import create_random_course
+from app.tests.utils.division import create_random_division
+from app.tests.utils.student import create_random_student
+from app.tests.utils.user import authentication_token_from_email
+from app.tests.utils.utils import random_pdf, random_png
+
+
+@pytest.fixture
+def s3_storage(monkeypatch: pytest.MonkeyPatch) -> Iterator[S3Storage]:
+    """
+    Store uploads in a bucket of moto's in-process stand-in for S3
+    """
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "s3")
+    monkeypatch.setattr(settings, "S3_BUCKET", "uploads")
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="uploads")
+        get_storage.cache_clear()
+        storage = get_storage()
+        assert isinstance(storage, S3Storage)
+        yield storage
+    get_storage.cache_clear()
+
+
+def enrolled_student_headers(client: TestClient, db: Session) -> tuple[str, dict[str, str]]:
+    course = create_random_course(db)
+    division = create_random_division(db, course_id=course.id)
+    student = create_random_student(db, school_id=course.term.year.school_id, term_id=course.term_id)
+    division.students.append({"student": student, "batch_number": 1})
+    db.commit()
+    return course.id, authentication_token_from_email(client=client, email=student.user.email, db=db)
+
+
+def upload(client: TestClient, course_id: str, headers: dict[str, str], content: bytes) -> dict:
+    r = client.post(
+        f"{settings.API_V1_STR}/files/{course_id}",
+        headers=headers,
+        params={"file_type": "material", "description": "Syllabus"},
+        files={"file": ("syllabus.pdf", content, "application/octet-stream")},
+    )
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_upload_file(client: TestClient, db: Session) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    content = random_pdf()
+    uploaded = upload(client, course_id, headers, content)
+    assert uploaded["size"] == len(content)
+    assert uploaded["sha256"] == hashlib.sha256(content).hexdigest()
+    assert uploaded["filename"] == f"{uploaded['sha256']}.pdf"
+    # Sharded by the first characters of the hash
+    sha256 = uploaded["sha256"]
+    with open(f"files/{sha256[:2]}/{sha256[2:4]}/{uploaded['filename']}", "rb") as f:
+        assert f.read() == content
+    crud.file.remove(db, id=uploaded["id"])
+    assert not has_content(uploaded["filename"])
+
+
+def test_download_file(client: TestClient, db: Session) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    content = random_pdf()
+    uploaded = upload(client, course_id, headers, content)
+    r = client.get(f"{settings.API_V1_STR}/files/{uploaded['id']}/content", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/pdf"
+    assert r.headers["content-length"] == str(len(content))
+    assert r.content == content
+    r = client.get(
+        f"{settings.API_V1_STR}/files/{uploaded['id']}/content",
+        headers={**headers, "If-None-Match": r.headers["etag"]},
+    )
+    assert r.status_code == 304
+    crud.file.remove(db, id=uploaded["id"])
+
+
+def test_download_file_flat(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    monkeypatch.setattr(settings, "STORAGE_ROOT", str(tmp_path))
+    get_storage.cache_clear()
+    try:
+        course_id, headers = enrolled_student_headers(client, db)
+        content = random_pdf()
+        uploaded = upload(client, course_id, headers, content)
+        # As stored before the storage was sharded
+        storage = LocalStorage(str(tmp_path))
+        os.replace(storage.path(f"files/{uploaded['filename']}"), tmp_path / "files" / uploaded["filename"])
+        r = client.get(f"{settings.API_V1_STR}/files/{uploaded['id']}/content", headers=headers)
+        assert r.status_code == 200
+        assert r.content == content
+
+        assert storage.shard("files") == 1
+        assert os.path.exists(storage.path(f"files/{uploaded['filename']}"))
+        r = client.get(f"{settings.API_V1_STR}/files/{uploaded['id']}/content", headers=headers)
+        assert r.status_code == 200
+        assert r.content == content
+        crud.file.remove(db, id=uploaded["id"])
+    finally:
+        get_storage.cache_clear()
+
+
+def test_download_file_unknown_type(client: TestClient, db: Session) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    uploaded = upload(client, course_id, headers, random_pdf())
+    file = crud.file.get(db, id=uploaded["id"])
+    assert file
+    # Uploaded before types were sniffed, with the extension of the client's Content-Type
+    crud.file.update(db, db_obj=file, obj_in={"filename": "syllabus.msword"})
+    r = client.get(f"{settings.API_V1_STR}/files/{uploaded['id']}/content", headers=headers)
+    assert r.status_code == 404
+    crud.blob.release(db, filenames=[uploaded["filename"]])
+    crud.file.remove(db, id=uploaded["id"])
+
+
+def test_upload_file_s3(client: TestClient, db: Session, s3_storage: S3Storage) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    content = random_pdf()
+    uploaded = upload(client, course_id, headers, content)
+    key = f"files/{uploaded['filename']}"
+    assert s3_storage.client.get_object(Bucket="uploads", Key=key)["Body"].read() == content
+    r = client.get(f"{settings.API_V1_STR}/files/{uploaded['id']}/content", headers=headers)
+    assert r.status_code == 200
+    assert r.content == content
+    crud.file.remove(db, id=uploaded["id"])
+    assert not s3_storage.exists(key)
+
+
+def test_upload_file_deduplicated(client: TestClient, db: Session) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    content = random_pdf()
+    first, second = upload(client, course_id, headers, content), upload(client, course_id, headers, content)
+    assert first["id"] != second["id"]
+    assert first["filename"] == second["filename"]
+    blob = crud.blob.get_by_filename(db, filename=first["filename"])
+    assert blob and blob.ref_count == 2 and blob.size == len(content)
+
+    crud.file.remove(db, id=first["id"])
+    db.refresh(blob)
+    assert blob.ref_count == 1
+    assert has_content(first["filename"])
+    crud.file.remove(db, id=second["id"])
+    assert crud.blob.get_by_filename(db, filename=first["filename"]) is None
+    assert not has_content(first["filename"])
+
+
+def test_upload_file_not_pdf(client: TestClient, db: Session) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    r = client.post(
+        f"{settings.API_V1_STR}/files/{course_id}",
+        headers=headers,
+        params={"file_type": "material", "description": "Syllabus"},
+        files={"file": ("syllabus.pdf", random_png(), "application/pdf")},
+    )
+    assert r.status_code == 415
+
+
+def test_upload_file_too_large(client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    course_id, headers = enrolled_student_headers(client, db)
+    monkeypatch.setattr(settings, "MAX_PDF_UPLOAD_SIZE", 512)
+    content = random_pdf()
+    r = client.post(
+        f"{settings.API_V1_STR}/files/{course_id}",
+        headers=headers,
+        params={"file_type": "material", "description": "Syllabus"},
+        files={"file": ("syllabus.pdf", content, "application/pdf")},
+    )
+    assert r.status_code == 413
+    assert not has_content(blob_filename(hashlib.sha256(content).hexdigest(), "application/pdf"))
+
+
+def test_upload_rejected_on_content_length(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "MAX_PDF_UPLOAD_SIZE", 512)
+    monkeypatch.setattr(settings, "MAX_IMAGE_UPLOAD_SIZE", 512)
+    # Turned down before the body is read: neither authentication nor the endpoint runs
+    r = client.post(
+        f"{settings.API_V1_STR}/files/course",
+        params={"file_type": "material", "description": "Syllabus"},
+        headers={"Origin": "https://example.com"},
+        files={"file": ("syllabus.pdf", b"%PDF-" + b"0" * 128 * 1024, "application/pdf")},
+    )
+    assert r.status_code == 413
+    # CORS wraps the check, so browsers can read why the upload failed
+    assert r.headers["access-control-allow-origin"]
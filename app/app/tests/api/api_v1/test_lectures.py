@@ -1,7 +1,8 @@
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
 
-from app import crud
+from app import crud, schemas
 from app.core.config import settings
 from app.schemas import AdminPermissions
 from app.tests.utils.lecture import (
@@ -127,6 +128,27 @@ def test_get_lecture_division_student(client: TestClient, db: Session) -> None:
     compare_api_and_db_query_results(api_result=fetched_lecture[0], db_dict=to_json(lecture))
 
 
+def test_get_lecture_division_compound(
+    client: TestClient, db: Session, superuser_token_headers: dict[str, str]
+) -> None:
+    division = create_random_division(db)
+    lectures = [create_random_lecture(db, division_id=division.id) for _ in range(3)]
+    r = client.get(
+        f"{settings.API_V1_STR}/lectures/division/{division.id}",
+        headers=superuser_token_headers,
+        params={"compound": True},
+    )
+    assert r.status_code == 200
+    document = r.json()
+    assert {lecture["id"] for lecture in document["data"]} == {lecture.id for lecture in lectures}
+    assert {lecture["division"] for lecture in document["data"]} == {division.id}
+    included = document["included"]
+    assert list(included["Division"]) == [division.id]
+    assert included["Division"][division.id]["course"] == division.course_id
+    assert included["Course"][division.course_id]["term"] == division.course.term_id
+    assert set(included["TimeSlot"]) == {lecture.time_slot_id for lecture in lectures}
+
+
 def test_get_lecture_non_existent_division(
     client: TestClient, db: Session, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -178,3 +200,38 @@ def test_delete_lecture(client: TestClient, superuser_token_headers: dict[str, s
 def test_delete_lecture_nonexisting(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
     r = client.delete(f"{settings.API_V1_STR}/lectures/{generate_uuid()}", headers=superuser_token_headers)
     assert r.status_code == 404
+
+
+def test_create_lectures_bulk(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    division_id = create_random_division(db).id
+    time_slot_id = create_random_timeslot(db).id
+    data = [
+        {
+            "day": day,
+            "time_slot_id": time_slot_id,
+            "division_id": division_id,
+            "type": get_random_lecture_type(),
+            "room_number": get_random_room_number(),
+        }
+        for day in ("Monday", "Tuesday", "Wednesday")
+    ]
+    r = client.post(f"{settings.API_V1_STR}/lectures/bulk", headers=superuser_token_headers, json=data)
+    assert r.status_code == 200
+    created_lectures = r.json()
+    assert [lecture["day"] for lecture in created_lectures] == ["Monday", "Tuesday", "Wednesday"]
+    assert len(crud.lecture.get_by_division(db, division_id=division_id)) == 3
+
+    r = client.post(f"{settings.API_V1_STR}/lectures/bulk", headers=superuser_token_headers, json=data[:1])
+    assert r.status_code == 409
+    r = client.post(f"{settings.API_V1_STR}/lectures/bulk", headers=superuser_token_headers, json=[data[0], data[0]])
+    assert r.status_code == 409
+
+
+def test_get_all_lectures_matches_schema(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    lecture = create_random_lecture(db)
+    r = client.get(f"{settings.API_V1_STR}/lectures/", headers=superuser_token_headers, params={"limit": 100_000})
+    assert r.status_code == 200
+    result = next(result for result in r.json() if result["id"] == lecture.id)
+    assert result == jsonable_encoder(schemas.Lecture.from_orm(crud.lecture.get(db, id=lecture.id)))
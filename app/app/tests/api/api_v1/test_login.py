@@ -1,7 +1,14 @@
+import pytest
 from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy.orm import Session
 
+from app import crud
+from app.core.cache import principal_cache
 from app.core.config import settings
 from app.core.security import create_token
+from app.schemas import UserUpdate
+from app.tests.utils.user import authentication_token_from_email, create_random_user
 from app.tests.utils.utils import random_email, random_password
 
 
@@ -107,3 +114,29 @@ def test_access_for_refresh(client: TestClient) -> None:
     token = create_token("0").access_token
     r = client.post(f"{settings.API_V1_STR}/login/refresh-token", headers={"Authorization": f"Bearer {token}"})
     assert r.status_code == 400
+
+
+def test_claims_access_token(client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_CLAIMS", True)
+    user = create_random_user(db, type="superuser")
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    claims = jwt.get_unverified_claims(headers["Authorization"].removeprefix("Bearer "))
+    assert claims.keys() == {"ver", "exp", "sub", "type"}
+    db.refresh(user)
+    assert claims["ver"] == user.token_version
+    # As seen by another worker, or after a restart: nothing about the user is held in memory
+    principal_cache.clear()
+    r = client.get(f"{settings.API_V1_STR}/utils/db-pool", headers=headers)
+    assert r.status_code == 200
+
+    crud.user.update(db, db_obj=user, obj_in=UserUpdate(is_active=False))
+    crud.user.update(db, db_obj=user, obj_in=UserUpdate(is_active=True))
+    principal_cache.clear()
+    r = client.get(f"{settings.API_V1_STR}/utils/db-pool", headers=headers)
+    assert r.status_code == 403
+    assert r.json()["detail"] == "Token has been revoked"
+
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    principal_cache.clear()
+    r = client.get(f"{settings.API_V1_STR}/utils/db-pool", headers=headers)
+    assert r.status_code == 200
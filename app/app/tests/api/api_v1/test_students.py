@@ -1,9 +1,11 @@
+import json
 from random import randint
 
+from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app import crud
+from app import crud, schemas
 from app.core.config import settings
 from app.schemas import AdminPermissions
 from app.tests.utils.course import create_random_course
@@ -251,8 +253,49 @@ def test_get_student_me_divisions(client: TestClient, db: Session) -> None:
             compare_api_and_db_query_results(api_result=fetched_divisions[1], db_dict=to_json(division))
 
 
+def test_get_student_me_divisions_not_modified(client: TestClient, db: Session) -> None:
+    student = create_random_student(db)
+    division = create_random_division(db, course_id=create_random_course(db, term_id=student.term_id).id)
+    headers = authentication_token_from_email(client=client, email=student.user.email, db=db)
+    r = client.get(f"{settings.API_V1_STR}/students/me/divisions", headers=headers)
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    r = client.get(f"{settings.API_V1_STR}/students/me/divisions", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+
+    division.students.append({"student": student, "batch_number": 1})
+    db.commit()
+    r = client.get(f"{settings.API_V1_STR}/students/me/divisions", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert [division["id"] for division in r.json()] == [division.id]
+
+
 def test_get_student_me_divisions_superuser(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
     r = client.get(f"{settings.API_V1_STR}/students/me/divisions", headers=superuser_token_headers)
     assert r.status_code == 403
+
+
+def test_get_students_matches_schema(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    course = create_random_course(db)
+    student = create_random_student(db, term_id=course.term_id, school_id=course.term.year.school_id)
+    r = client.get(f"{settings.API_V1_STR}/students/", headers=superuser_token_headers, params={"limit": 100_000})
+    assert r.status_code == 200
+    result = next(result for result in r.json() if result["user_id"] == student.user_id)
+    assert result == jsonable_encoder(schemas.Student.from_orm(crud.student.get(db, id=student.user_id)))
+
+
+def test_get_students_stream(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    create_random_student(db)
+    headers = {**superuser_token_headers, "Accept": "application/x-ndjson"}
+    r = client.get(f"{settings.API_V1_STR}/students/", headers=headers)
+    assert r.status_code == 200
+    streamed = [json.loads(line) for line in r.text.splitlines()]
+    assert len(streamed) == len(crud.student.get_multi(db, limit=100_000))
+    r = client.get(f"{settings.API_V1_STR}/students/", headers=headers, params={"skip": 1, "limit": 2})
+    page = [json.loads(line) for line in r.text.splitlines()]
+    assert len(page) == 2
+    assert all(student in streamed for student in page)
+    r = client.get(f"{settings.API_V1_STR}/students/", headers=headers, params={"cursor": ""})
+    assert r.status_code == 400
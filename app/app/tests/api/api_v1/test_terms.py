@@ -1,6 +1,8 @@
+import json
 from datetime import datetime, timedelta
 from random import choice, randint
 
+import pytest
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
 
@@ -75,6 +77,26 @@ def test_get_term_students(client: TestClient, superuser_token_headers: dict[str
         compare_api_and_db_query_results(api_result=api_obj, db_dict=to_json(db_obj))
 
 
+def test_get_term_students_stream(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    term = create_random_term(db=db)
+    students = [create_random_student(db=db, term_id=term.id) for _ in range(3)]
+    monkeypatch.setattr(settings, "STREAM_BATCH_SIZE", 2)
+    r = client.get(
+        f"{settings.API_V1_STR}/terms/{term.id}/students",
+        headers={**superuser_token_headers, "Accept": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    assert r.headers["Content-Type"] == "application/x-ndjson"
+    streamed = [json.loads(line) for line in r.text.splitlines()]
+    r = client.get(f"{settings.API_V1_STR}/terms/{term.id}/students", headers=superuser_token_headers)
+    assert sorted(streamed, key=lambda student: student["user_id"]) == sorted(
+        r.json(), key=lambda student: student["user_id"]
+    )
+    assert {student["user_id"] for student in streamed} == {student.user_id for student in students}
+
+
 def test_get_term_students_nonexisting(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -74,6 +74,29 @@ def test_create_timeslot_existing(client: TestClient, superuser_token_headers: d
     assert r.status_code == 409
 
 
+def test_create_timeslots_bulk(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    school_id = create_random_school(db).id
+    start = datetime(2000, 1, 1, 8)
+    data = [
+        {
+            "start_time": (start + timedelta(hours=hour)).time().isoformat(),
+            "end_time": (start + timedelta(hours=hour + 1)).time().isoformat(),
+            "school_id": school_id,
+        }
+        for hour in range(3)
+    ]
+    r = client.post(f"{settings.API_V1_STR}/timeslots/bulk", headers=superuser_token_headers, json=data)
+    assert r.status_code == 200
+    created_timeslots = r.json()
+    assert len(crud.timeslot.get_by_school(db, school_id=school_id)) == 3
+
+    r = client.post(f"{settings.API_V1_STR}/timeslots/bulk", headers=superuser_token_headers, json=data[:1])
+    assert r.status_code == 409
+    assert r.json()["detail"]["timeslots"] == [created_timeslots[0]["id"]]
+    r = client.post(f"{settings.API_V1_STR}/timeslots/bulk", headers=superuser_token_headers, json=[data[0], data[0]])
+    assert r.status_code == 409
+
+
 def test_update_timeslot(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
     timeslot = create_random_timeslot(db)
     start_time = datetime.now().time()
@@ -0,0 +1,152 @@
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from app import crud
+from app.core.cache import timetable_cache
+from app.core.config import settings
+from app.schemas import LectureUpdate
+from app.tests.utils.course import create_random_course
+from app.tests.utils.division import create_random_division
+from app.tests.utils.lecture import create_random_lecture
+from app.tests.utils.student import create_random_student
+from app.tests.utils.user import authentication_token_from_email
+from app.utils import generate_uuid
+
+
+def test_get_timetable_division(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    division = create_random_division(db)
+    lectures = [create_random_lecture(db, division_id=division.id) for _ in range(3)]
+    r = client.get(f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers)
+    assert r.status_code == 200
+    timetable = r.json()
+    assert {lecture["id"] for day in timetable.values() for lecture in day} == {lecture.id for lecture in lectures}
+    for day, day_lectures in timetable.items():
+        assert all(lecture["day"] == day for lecture in day_lectures)
+    assert timetable_cache.get([division.id]) is not None
+
+
+def test_get_timetable_division_compound(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    division = create_random_division(db)
+    lectures = [create_random_lecture(db, division_id=division.id) for _ in range(3)]
+    r = client.get(f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers)
+    plain = r.json()
+    r = client.get(
+        f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers, params={"compound": True}
+    )
+    assert r.status_code == 200
+    document = r.json()
+    assert {lecture["id"] for day in document["data"].values() for lecture in day} == {
+        lecture.id for lecture in lectures
+    }
+    included = document["included"]
+    assert list(included["Division"]) == [division.id]
+    for day, day_lectures in document["data"].items():
+        for lecture, plain_lecture in zip(day_lectures, plain[day]):
+            assert lecture["division"] == division.id
+            assert included["TimeSlot"][lecture["time_slot"]]["start_time"] == plain_lecture["time_slot"]["start_time"]
+    assert (compound := timetable_cache.get([division.id], "compound")) and compound.content == r.content
+    assert (cached := timetable_cache.get([division.id])) and cached.content != r.content
+
+
+def test_get_timetable_division_compressed(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    division = create_random_division(db)
+    for _ in range(3):
+        create_random_lecture(db, division_id=division.id)
+    for accept_encoding, encoding in [("br", "br"), ("gzip;q=1, br;q=0.5", "gzip"), ("identity", None)]:
+        r = client.get(
+            f"{settings.API_V1_STR}/timetable/{division.id}",
+            headers={**superuser_token_headers, "Accept-Encoding": accept_encoding},
+        )
+        assert r.status_code == 200
+        assert r.headers.get("Content-Encoding") == encoding
+        assert (cached := timetable_cache.get([division.id])) and r.content == cached.content
+
+
+def test_get_timetable_division_not_modified(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    division = create_random_division(db)
+    lecture = create_random_lecture(db, division_id=division.id)
+    r = client.get(f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers)
+    etag = r.headers["ETag"]
+    assert (cached := timetable_cache.get([division.id])) and etag == cached.etag
+    r = client.get(
+        f"{settings.API_V1_STR}/timetable/{division.id}", headers={**superuser_token_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 304
+    assert r.content == b""
+
+    crud.lecture.update(db, db_obj=lecture, obj_in=LectureUpdate(room_number="Z999"))
+    r = client.get(
+        f"{settings.API_V1_STR}/timetable/{division.id}", headers={**superuser_token_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+
+
+def test_get_timetable_division_nonexisting(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/timetable/{generate_uuid()}", headers=superuser_token_headers)
+    assert r.status_code == 404
+
+
+def test_get_timetable_invalidated_by_lecture_writes(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    division = create_random_division(db)
+    lecture = create_random_lecture(db, division_id=division.id)
+    r = client.get(f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.json()[lecture.day][0]["room_number"] == lecture.room_number
+
+    crud.lecture.update(db, db_obj=lecture, obj_in=LectureUpdate(room_number="Z999"))
+    assert timetable_cache.get([division.id]) is None
+    r = client.get(f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.json()[lecture.day][0]["room_number"] == "Z999"
+
+    crud.lecture.remove(db, id=lecture.id)
+    r = client.get(f"{settings.API_V1_STR}/timetable/{division.id}", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.json() == {}
+
+
+def test_get_timetable_student(client: TestClient, db: Session) -> None:
+    course = create_random_course(db)
+    divisions = [create_random_division(db, course_id=course.id) for _ in range(2)]
+    lectures = [create_random_lecture(db, division_id=division.id) for division in divisions]
+    student = create_random_student(db, school_id=course.term.year.school_id, term_id=course.term_id)
+    for division in divisions:
+        division.students.append({"student": student, "batch_number": 1})
+    db.commit()
+    r = client.get(
+        f"{settings.API_V1_STR}/timetable/",
+        headers=authentication_token_from_email(client=client, db=db, email=student.user.email),
+    )
+    assert r.status_code == 200
+    assert {lecture["id"] for day in r.json().values() for lecture in day} == {lecture.id for lecture in lectures}
+
+
+def test_warm_term_timetables(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    course = create_random_course(db)
+    division = create_random_division(db, course_id=course.id)
+    create_random_lecture(db, division_id=division.id)
+    student = create_random_student(db, school_id=course.term.year.school_id, term_id=course.term_id)
+    division.students.append({"student": student, "batch_number": 1})
+    db.commit()
+    timetable_cache.clear()
+    r = client.post(f"{settings.API_V1_STR}/timetable/warm/{course.term_id}", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert timetable_cache.get([division.id]) is not None
+
+
+def test_warm_term_timetables_nonexisting(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    r = client.post(f"{settings.API_V1_STR}/timetable/warm/{generate_uuid()}", headers=superuser_token_headers)
+    assert r.status_code == 404
@@ -1,18 +1,23 @@
-from os import remove
-from os.path import isfile
-
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.core import security
+from app.core.blobs import has_content
 from app.core.config import settings
 from app.core.security import verify_password
+from app.crud import crud_user
+from app.db.pool import pool_usage
+from app.db.session import engine, primary_pins
+from app.tests.utils.school import create_random_school
 from app.tests.utils.user import authentication_token_from_email, create_random_user
 from app.tests.utils.utils import (
     compare_api_and_db_query_results,
     random_email,
     random_lower_string,
     random_password,
+    random_png,
     to_json,
 )
 from app.utils import generate_uuid
@@ -36,6 +41,22 @@ def test_get_users_normal_user_me(client: TestClient, normal_user_token_headers:
     assert current_user["email"] == settings.EMAIL_TEST_USER
 
 
+def test_get_users_cursor_pagination(client: TestClient, superuser_token_headers: dict, db: Session) -> None:
+    create_random_user(db=db, type="student")
+    create_random_user(db=db, type="student")
+    r = client.get(f"{settings.API_V1_STR}/users/?cursor=&limit=2", headers=superuser_token_headers)
+    assert r.status_code == 200
+    first_page = [user["id"] for user in r.json()]
+    assert len(first_page) == 2
+    assert first_page == sorted(first_page)
+    next_cursor = r.headers["X-Next-Cursor"]
+    r = client.get(f"{settings.API_V1_STR}/users/?cursor={next_cursor}&limit=2", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert all(user["id"] > first_page[-1] for user in r.json())
+    r = client.get(f"{settings.API_V1_STR}/users/?cursor=notacursor", headers=superuser_token_headers)
+    assert r.status_code == 400
+
+
 def test_create_user_new_email(client: TestClient, superuser_token_headers: dict, db: Session) -> None:
     username = random_email()
     password = random_password()
@@ -52,6 +73,25 @@ def test_create_user_new_email(client: TestClient, superuser_token_headers: dict
     compare_api_and_db_query_results(api_result=created_user, db_dict=to_json(user))
 
 
+def test_create_user_hashes_without_connection(
+    client: TestClient, superuser_token_headers: dict, db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    checked_out = []
+
+    def get_password_hash(password: str) -> str:
+        checked_out.append(pool_usage(engine.pool)["checked_out"])
+        return security.get_password_hash(password)
+
+    monkeypatch.setattr(crud_user, "get_password_hash", get_password_hash)
+    # Connections held outside the request (eg. by the `db` fixture)
+    db.commit()
+    idle = pool_usage(engine.pool)["checked_out"]
+    data = {"email": random_email(), "password": random_password(), "type": "student"}
+    r = client.post(f"{settings.API_V1_STR}/users/", headers=superuser_token_headers, json=data)
+    assert r.status_code == 200
+    assert checked_out == [idle]
+
+
 def test_get_existing_user(client: TestClient, superuser_token_headers: dict, db: Session) -> None:
     user = create_random_user(db=db, type="superuser")
     assert user
@@ -294,9 +334,8 @@ def test_update_profile_picture_superuser(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
     user = create_random_user(db, type="student")
-    response = client.get("https://media.rev-amp.tech/logo/revamp.png")
     with open("/tmp/profile_picture.png", "wb") as f:
-        f.write(response.content)
+        f.write(random_png())
     assert user.profile_picture is None
     r = client.put(
         f"{settings.API_V1_STR}/users/{user.id}/profile_picture",
@@ -307,8 +346,9 @@ def test_update_profile_picture_superuser(
     db.refresh(user)
     assert r.status_code == 200
     compare_api_and_db_query_results(api_result=updated_user, db_dict=to_json(user))
-    assert isfile(f"profile_pictures/{updated_user['profile_picture']}")
-    remove(f"profile_pictures/{updated_user['profile_picture']}")
+    assert has_content(updated_user["profile_picture"])
+    crud.user.remove(db, id=user.id)
+    assert not has_content(updated_user["profile_picture"])
 
 
 def test_update_profile_picture_superuser_non_existent_user(
@@ -317,9 +357,8 @@ def test_update_profile_picture_superuser_non_existent_user(
     user_id = generate_uuid()
     while crud.user.get(db, id=user_id):
         user_id = generate_uuid()
-    response = client.get("https://media.rev-amp.tech/logo/revamp.png")
     with open("/tmp/profile_picture.png", "wb") as f:
-        f.write(response.content)
+        f.write(random_png())
     r = client.put(
         f"{settings.API_V1_STR}/users/{user_id}/profile_picture",
         headers=superuser_token_headers,
@@ -348,9 +387,8 @@ def test_update_profile_picture_normal_user(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
     user = create_random_user(db, type="student")
-    response = client.get("https://media.rev-amp.tech/logo/revamp.png")
     with open("/tmp/profile_picture.png", "wb") as f:
-        f.write(response.content)
+        f.write(random_png())
     assert user.profile_picture is None
     r = client.put(
         f"{settings.API_V1_STR}/users/{user.id}/profile_picture",
@@ -364,9 +402,8 @@ def test_update_profile_picture_normal_user_self(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
     user = create_random_user(db, type="student")
-    response = client.get("https://media.rev-amp.tech/logo/revamp.png")
     with open("/tmp/profile_picture.png", "wb") as f:
-        f.write(response.content)
+        f.write(random_png())
     assert user.profile_picture is None
     r = client.put(
         f"{settings.API_V1_STR}/users/{user.id}/profile_picture",
@@ -377,5 +414,111 @@ def test_update_profile_picture_normal_user_self(
     db.refresh(user)
     assert r.status_code == 200
     compare_api_and_db_query_results(api_result=updated_user, db_dict=to_json(user))
-    assert isfile(f"profile_pictures/{updated_user['profile_picture']}")
-    remove(f"profile_pictures/{updated_user['profile_picture']}")
+    assert has_content(updated_user["profile_picture"])
+    crud.user.remove(db, id=user.id)
+    assert not has_content(updated_user["profile_picture"])
+
+
+def test_update_profile_picture_releases_previous(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db, type="student")
+    filenames = []
+    for _ in range(2):
+        content = random_png()
+        r = client.put(
+            f"{settings.API_V1_STR}/users/{user.id}/profile_picture",
+            headers=superuser_token_headers,
+            files={"image": ("profile_picture.png", content, "image/png")},
+        )
+        assert r.status_code == 200
+        filenames.append(r.json()["profile_picture"])
+    r = client.get(f"{settings.API_V1_STR}/users/{user.id}/profile_picture", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/png"
+    assert r.content == content
+    assert not has_content(filenames[0])
+    assert crud.blob.get_by_filename(db, filename=filenames[0]) is None
+    assert has_content(filenames[1])
+    crud.user.remove(db, id=user.id)
+    assert not has_content(filenames[1])
+
+
+def test_update_user_me_pins_reads_to_primary(client: TestClient, db: Session) -> None:
+    user = create_random_user(db, type="student")
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    assert not primary_pins.is_pinned(user.id)
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+    assert not primary_pins.is_pinned(user.id)
+    r = client.put(f"{settings.API_V1_STR}/users/me", headers=headers, json={"full_name": random_lower_string()})
+    assert r.status_code == 200
+    assert primary_pins.is_pinned(user.id)
+
+
+def test_deactivated_user_signed_out(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    user = create_random_user(db, type="student")
+    user_token_headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=user_token_headers)
+    assert r.status_code == 200
+    r = client.put(f"{settings.API_V1_STR}/users/{user.id}", headers=superuser_token_headers, json={"is_active": False})
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=user_token_headers)
+    assert r.status_code == 409
+
+
+def test_get_users_me_school(client: TestClient, db: Session) -> None:
+    school = create_random_school(db)
+    user = create_random_user(db, type="student", school_id=school.id)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    for _ in range(2):
+        r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+        assert r.status_code == 200
+        assert r.json()["school"]["id"] == school.id
+
+
+def test_get_users_me_not_modified(client: TestClient, db: Session) -> None:
+    user = create_random_user(db, type="student")
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["ETag"] == etag
+
+    r = client.put(f"{settings.API_V1_STR}/users/me", headers=headers, json={"full_name": random_lower_string()})
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+
+
+def test_server_timing(
+    client: TestClient, superuser_token_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/users/", headers=superuser_token_headers)
+    assert "Server-Timing" not in r.headers
+    monkeypatch.setattr(settings, "SERVER_TIMING", True)
+    r = client.get(f"{settings.API_V1_STR}/users/", headers=superuser_token_headers)
+    assert r.status_code == 200
+    phases = dict(metric.split(";dur=") for metric in r.headers["Server-Timing"].split(", "))
+    assert {"auth", "db", "handler", "serialization", "total"} <= set(phases)
+    assert all(float(duration) >= 0 for duration in phases.values())
+
+
+def test_response_compression(client: TestClient, superuser_token_headers: dict[str, str], db: Session) -> None:
+    for _ in range(5):
+        create_random_user(db, type="student")
+    for accept_encoding, encoding in [("gzip, br", "br"), ("gzip", "gzip"), ("identity", None)]:
+        r = client.get(
+            f"{settings.API_V1_STR}/users/", headers={**superuser_token_headers, "Accept-Encoding": accept_encoding}
+        )
+        assert r.status_code == 200
+        assert r.headers.get("Content-Encoding") == encoding
+        assert len(r.json()) >= 5
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers={**superuser_token_headers, "Accept-Encoding": "br"})
+    assert r.status_code == 200
+    assert len(r.content) < settings.COMPRESSION_MINIMUM_SIZE
+    assert "Content-Encoding" not in r.headers
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+
+def test_read_db_pool_status(client: TestClient, superuser_token_headers: dict[str, str]) -> None:
+    r = client.get(f"{settings.API_V1_STR}/utils/db-pool", headers=superuser_token_headers)
+    assert r.status_code == 200
+    pools = r.json()
+    assert {"sync", "async"} <= set(pools)
+    sync_pool = pools["sync"]
+    assert sync_pool["size"] == settings.DB_POOL_SIZE
+    assert sync_pool["wait_time"]["count"] > 0
+    assert sync_pool["wait_time"]["buckets"]["+Inf"] == sync_pool["wait_time"]["count"]
+    assert sync_pool["checkout_duration"]["count"] > 0
+
+
+def test_read_db_pool_status_normal_user(client: TestClient, normal_user_token_headers: dict[str, str]) -> None:
+    r = client.get(f"{settings.API_V1_STR}/utils/db-pool", headers=normal_user_token_headers)
+    assert r.status_code == 403
+
+
+def test_read_metrics(client: TestClient, superuser_token_headers: dict[str, str]) -> None:
+    client.get(f"{settings.API_V1_STR}/utils/db-pool", headers=superuser_token_headers)
+    r = client.get(f"{settings.API_V1_STR}/utils/metrics", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    labels = f'method="GET",route="{settings.API_V1_STR}/utils/db-pool"'
+    assert f'http_requests_total{{{labels},status="200"}}' in r.text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}' in r.text
+    assert f"http_request_db_seconds_count{{{labels}}}" in r.text
+    assert "http_requests_in_flight 1" in r.text
+    assert "threadpool_queued_tasks 0" in r.text
+
+
+def test_read_metrics_token(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scraper-token")
+    r = client.get(f"{settings.API_V1_STR}/utils/metrics", headers={"Authorization": "Bearer scraper-token"})
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/utils/metrics", headers={"Authorization": "Bearer wrong-token"})
+    assert r.status_code == 403
+
+
+def test_read_metrics_normal_user(client: TestClient, normal_user_token_headers: dict[str, str]) -> None:
+    r = client.get(f"{settings.API_V1_STR}/utils/metrics", headers=normal_user_token_headers)
+    assert r.status_code == 403
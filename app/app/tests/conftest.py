@@ -1,11 +1,13 @@
-from typing import Generator
+from contextlib import contextmanager
+from typing import Any, Callable, ContextManager, Generator
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import QueryStats, SessionLocal, async_engine, engine
 from app.main import app
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
@@ -40,3 +42,33 @@ def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]
 @pytest.fixture(scope="module")
 def admin_user_token_headers(client: TestClient, db: Session) -> dict[str, str]:
     return authentication_token_from_email(client=client, email=settings.EMAIL_TEST_ADMIN, db=db, user_type="admin")
+
+
+@pytest.fixture
+def query_budget() -> Callable[[int], ContextManager[QueryStats]]:
+    """
+    Fail the test if the block issues more than `max_queries` SQL statements, eg.
+
+        with query_budget(4):
+            r = client.get(...)
+    """
+
+    @contextmanager
+    def budget(max_queries: int) -> Generator[QueryStats, None, None]:
+        stats = QueryStats()
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            stats.record(statement, 0)
+
+        engines = (engine, async_engine.sync_engine)
+        for target in engines:
+            event.listen(target, "after_cursor_execute", record)
+        try:
+            yield stats
+        finally:
+            for target in engines:
+                event.remove(target, "after_cursor_execute", record)
+        repeated = "\n".join(f"{count}x {statement}" for statement, count in stats.repeated(2))
+        assert stats.count <= max_queries, f"{stats.count} queries issued, over the budget of {max_queries}\n{repeated}"
+
+    return budget
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.core.cache import principal_cache
 from app.schemas import AdminUpdate
 from app.tests.utils.user import create_random_user
 
@@ -40,3 +41,17 @@ def test_update_user_admin_with_dict(db: Session) -> None:
     user_2 = crud.admin.get(db, id=user.id)
     assert user_2
     assert user_2.permissions == 5
+
+
+def test_update_admin_invalidates_principal(db: Session) -> None:
+    user = create_random_user(db=db, type="admin")
+    principal = crud.user.get_principal(db, id=user.id)
+    assert principal
+    assert principal.admin_permissions == 0
+    admin = crud.admin.get(db, user.id)
+    assert admin
+    crud.admin.update(db, db_obj=admin, obj_in=AdminUpdate(user_id=user.id, permissions=5))
+    assert principal_cache.get(user.id) is None
+    principal = crud.user.get_principal(db, id=user.id)
+    assert principal
+    assert principal.admin_permissions == 5
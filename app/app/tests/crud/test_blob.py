@@ -0,0 +1,68 @@
+import hashlib
+import io
+from typing import Collection
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.blobs import blob_filename, has_content, save_content
+from app.db.session import SessionLocal
+from app.tests.utils.utils import random_pdf
+
+
+def acquire_blob(db: Session, content: bytes) -> str:
+    sha256 = hashlib.sha256(content).hexdigest()
+    filename = blob_filename(sha256, "application/pdf")
+    crud.blob.acquire(db, sha256=sha256, filename=filename, media_type="application/pdf", size=len(content))
+    if not has_content(filename):
+        save_content(filename, io.BytesIO(content))
+    db.commit()
+    return filename
+
+
+def test_release_blob(db: Session) -> None:
+    content = random_pdf()
+    filename = acquire_blob(db, content)
+    acquire_blob(db, content)
+    crud.blob.release(db, filenames=[filename])
+    blob = crud.blob.get_by_filename(db, filename=filename)
+    assert blob and blob.ref_count == 1
+    assert has_content(filename)
+    crud.blob.release(db, filenames=[filename])
+    assert crud.blob.get_by_filename(db, filename=filename) is None
+    assert not has_content(filename)
+
+
+def test_release_blob_commit_fails(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    filename = acquire_blob(db, random_pdf())
+
+    def fail() -> None:
+        raise RuntimeError("Commit failed")
+
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        crud.blob.release(db, filenames=[filename])
+    monkeypatch.undo()
+    assert crud.blob.get_by_filename(db, filename=filename)
+    assert has_content(filename)
+
+
+def test_release_blob_referenced_again(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    content = random_pdf()
+    filename = acquire_blob(db, content)
+
+    def lock_content(db: Session, *, sha256s: Collection[str]) -> None:
+        # Another request takes a new reference between the deletion of the row and the deletion of the content
+        monkeypatch.undo()
+        other = SessionLocal()
+        try:
+            acquire_blob(other, content)
+        finally:
+            other.close()
+        crud.blob.lock_content(db, sha256s=sha256s)
+
+    monkeypatch.setattr(crud.blob, "lock_content", lock_content)
+    crud.blob.release(db, filenames=[filename])
+    assert crud.blob.get_by_filename(db, filename=filename)
+    assert has_content(filename)
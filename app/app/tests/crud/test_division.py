@@ -113,3 +113,39 @@ def test_remove_students_from_division(db: Session) -> None:
         db.rollback()
     db.refresh(student)
     assert division not in student.divisions
+
+
+def test_add_students_to_division_bulk(db: Session) -> None:
+    division = create_random_division(db)
+    students = [create_random_student(db, term_id=division.course.term_id) for _ in range(3)]
+    student_ids = [student.user_id for student in students]
+    assert crud.division.get_student_ids(db, division_id=division.id, student_ids=student_ids) == set()
+    crud.division.add_students(
+        db, division_id=division.id, batch_numbers={student_id: i + 1 for i, student_id in enumerate(student_ids)}
+    )
+    db.commit()
+    assert crud.division.get_student_ids(db, division_id=division.id, student_ids=student_ids) == set(student_ids)
+    db.refresh(division)
+    assert {
+        student_division.student_id: student_division.batch_number
+        for student_division in getattr(division, "student_division")
+    } == {student_id: i + 1 for i, student_id in enumerate(student_ids)}
+
+
+def test_get_divisions_by_student(db: Session) -> None:
+    division = create_random_division(db)
+    other_division = create_random_division(db)
+    student = create_random_student(db)
+    crud.division.add_students(db, division_id=division.id, batch_numbers={student.user_id: 1})
+    db.commit()
+    assert [d.id for d in crud.division.get_by_student(db, student_id=student.user_id)] == [division.id]
+    assert crud.division.get_ids_by_student(db, student_id=student.user_id) == [division.id]
+    assert crud.division.get_course_ids_by_student(db, student_id=student.user_id) == {division.course_id}
+    assert other_division.id not in crud.division.get_ids_by_student(db, student_id=student.user_id)
+    assert [s.user_id for s in crud.student.get_by_division(db, division_id=division.id, batch_number=1)] == [
+        student.user_id
+    ]
+    assert crud.student.get_by_division(db, division_id=division.id, batch_number=2) == []
+    crud.division.remove_student(db, division_id=division.id, student_id=student.user_id)
+    db.commit()
+    assert crud.division.get_by_student(db, student_id=student.user_id) == []
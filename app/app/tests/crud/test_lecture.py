@@ -2,6 +2,7 @@ import calendar
 import random
 
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import instance_state
 
 from app import crud
 from app.schemas import LectureUpdate
@@ -52,3 +53,37 @@ def test_lecture_by_details(db: Session) -> None:
     )
     assert fetched_lecture
     assert fetched_lecture.id == lecture.id
+
+
+def test_lectures_by_divisions(db: Session) -> None:
+    division = create_random_division(db)
+    other_division = create_random_division(db)
+    lectures = [create_random_lecture(db, division_id=division.id) for _ in range(3)]
+    other_lecture = create_random_lecture(db, division_id=other_division.id)
+    fetched_lectures = crud.lecture.get_by_divisions(db, division_ids=[division.id, other_division.id])
+    assert {lecture.id for lecture in fetched_lectures} == {lecture.id for lecture in lectures + [other_lecture]}
+    assert crud.lecture.get_by_divisions(db, division_ids=[]) == []
+
+
+def test_lecture_timetable(db: Session) -> None:
+    division = create_random_division(db)
+    lectures = [create_random_lecture(db, division_id=division.id) for _ in range(5)]
+    timetable = crud.lecture.get_timetable(db, division_ids=[division.id])
+    assert list(timetable.keys()) == [day for day in calendar.day_name if day in timetable]
+    assert sum(len(day_lectures) for day_lectures in timetable.values()) == len(lectures)
+    for day, day_lectures in timetable.items():
+        assert all(lecture.day == day for lecture in day_lectures)
+        start_times = [lecture.time_slot.start_time for lecture in day_lectures]
+        assert start_times == sorted(start_times)
+
+
+def test_lectures_by_division_eager_loaded(db: Session) -> None:
+    division = create_random_division(db)
+    create_random_lecture(db, division_id=division.id)
+    db.expire_all()
+    fetched_lectures = crud.lecture.get_by_division(db, division_id=division.id)
+    assert fetched_lectures
+    for lecture in fetched_lectures:
+        assert not {"time_slot", "division"} & instance_state(lecture).unloaded
+        assert not {"course", "professor"} & instance_state(lecture.division).unloaded
+        assert "term" not in instance_state(lecture.division.course).unloaded
@@ -41,3 +41,13 @@ def test_remove_student(db: Session) -> None:
     assert student
     crud.student.remove(db, id=student.user_id)
     assert not crud.student.get(db, id=student.user_id)
+
+
+def test_set_term_students(db: Session) -> None:
+    students = [create_random_student(db) for _ in range(3)]
+    term = create_random_term(db)
+    crud.student.set_term(db, ids=[student.user_id for student in students], term_id=term.id)
+    db.commit()
+    for student in students:
+        db.refresh(student)
+        assert student.term_id == term.id
@@ -1,9 +1,9 @@
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.schemas import TimeSlotUpdate
+from app.schemas import TimeSlotCreate, TimeSlotUpdate
 from app.tests.utils.timeslot import create_random_timeslot
 
 from ..utils.school import create_random_school
@@ -50,3 +50,39 @@ def test_timeslot_by_school(db: Session) -> None:
     fetched_timeslot = crud.timeslot.get_by_school(db, school_id=timeslot.school_id)[0]
     assert fetched_timeslot
     assert fetched_timeslot.id == timeslot.id
+
+
+def test_create_update_remove_multi_timeslots(db: Session) -> None:
+    school_id = create_random_school(db).id
+    timeslots_in = [
+        TimeSlotCreate(start_time=time(hour), end_time=time(hour, 50), school_id=school_id) for hour in range(8, 12)
+    ]
+    timeslots = crud.timeslot.create_multi(db, objs_in=timeslots_in)
+    assert [timeslot.start_time for timeslot in timeslots] == [timeslot_in.start_time for timeslot_in in timeslots_in]
+    assert all(timeslot.school_id == school_id for timeslot in timeslots)
+
+    updated_timeslots = crud.timeslot.update_multi(
+        db, objs_in={timeslot.id: {"end_time": time(timeslot.start_time.hour, 55)} for timeslot in timeslots}
+    )
+    assert [timeslot.end_time.minute for timeslot in updated_timeslots] == [55] * len(timeslots)
+
+    ids = [timeslot.id for timeslot in timeslots]
+    assert set(crud.timeslot.remove_multi(db, ids=ids)) == set(ids)
+    assert all(crud.timeslot.get(db, id=id) is None for id in ids)
+
+
+def test_get_page_timeslots(db: Session) -> None:
+    school_id = create_random_school(db).id
+    timeslots = crud.timeslot.create_multi(
+        db,
+        objs_in=[
+            TimeSlotCreate(start_time=time(hour), end_time=time(hour, 50), school_id=school_id) for hour in range(8, 13)
+        ],
+    )
+    fetched_ids = []
+    page, cursor = crud.timeslot.get_page(db, limit=2, school_id=school_id)
+    fetched_ids += [timeslot.id for timeslot in page]
+    while cursor:
+        page, cursor = crud.timeslot.get_page(db, cursor=cursor, limit=2, school_id=school_id)
+        fetched_ids += [timeslot.id for timeslot in page]
+    assert fetched_ids == sorted(timeslot.id for timeslot in timeslots)
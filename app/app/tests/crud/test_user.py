@@ -2,6 +2,7 @@ from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.core.cache import principal_cache
 from app.core.security import verify_password
 from app.schemas import UserCreate, UserUpdate
 from app.tests.utils.user import create_random_user
@@ -141,3 +142,19 @@ def test_update_superuser_not_password(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert user.full_name == user_2.full_name
+
+
+def test_get_principal_cached_until_update(db: Session) -> None:
+    user = create_random_user(db, type="professor", is_admin=True)
+    principal = crud.user.get_principal(db, id=user.id)
+    assert principal
+    assert principal.user["email"] == user.email
+    assert principal.admin_permissions == 0
+    assert "hashed_password" not in principal.user
+    assert principal_cache.get(user.id) is principal
+
+    crud.user.update(db, db_obj=user, obj_in=UserUpdate(is_active=False))
+    assert principal_cache.get(user.id) is None
+    principal = crud.user.get_principal(db, id=user.id)
+    assert principal
+    assert principal.user["is_active"] is False
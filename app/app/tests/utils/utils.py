@@ -26,6 +26,17 @@ def random_email() -> str:
     return f"{random_lower_string()}@{random_lower_string()}.com"
 
 
+def random_png() -> bytes:
+    """
+    Bytes that pass for a PNG image: its signature followed by random data
+    """
+    return b"\x89PNG\r\n\x1a\n" + random.randbytes(1024)
+
+
+def random_pdf() -> bytes:
+    return b"%PDF-1.7\n" + random.randbytes(1024)
+
+
 def get_superuser_token_headers(client: TestClient, type_: str = "access") -> dict[str, str]:
     login_data = {
         "username": settings.FIRST_SUPERUSER,
@@ -0,0 +1,113 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Collection, Optional
+
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.blobs import (
+    EXTENSIONS,
+    MAGIC_BYTES,
+    blob_filename,
+    has_content,
+    save_content,
+)
+from app.core.config import settings
+from app.exceptions import RequestEntityTooLargeException, UnsupportedMediaTypeException
+
+# Uploads are read and hashed this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Room left in a multipart request body for the boundaries, part headers and form fields around the uploaded file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    filename: str
+    media_type: str
+    size: int
+    sha256: str
+
+
+def upload_size_limits() -> dict[str, int]:
+    return {
+        "application/pdf": settings.MAX_PDF_UPLOAD_SIZE,
+        "image/png": settings.MAX_IMAGE_UPLOAD_SIZE,
+        "image/jpeg": settings.MAX_IMAGE_UPLOAD_SIZE,
+    }
+
+
+def max_upload_request_size() -> int:
+    """
+    Largest request body an upload of any type can come in, checked on Content-Length before the body is read
+    """
+    return max(upload_size_limits().values()) + MULTIPART_OVERHEAD
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """
+    The type of a file from its first bytes, None if it isn't one of the types uploads can have
+    """
+    return next((media_type for media_type, magic in MAGIC_BYTES.items() if head.startswith(magic)), None)
+
+
+def inspect_upload(upload: UploadFile, media_types: Collection[str]) -> StoredUpload:
+    """
+    Read an upload `UPLOAD_CHUNK_SIZE` bytes at a time, computing its size and SHA-256 without storing anything.
+
+    Its type is sniffed from the first chunk rather than taken from the client's Content-Type, and must be one of
+    `media_types` (415 otherwise). Uploads larger than the limit for their type are rejected (413) as soon as they are
+    known to be: before reading anything when the size of the upload is known, while reading otherwise.
+    """
+    limits = upload_size_limits()
+    names = " or ".join(EXTENSIONS[media_type].upper() for media_type in media_types)
+    if upload.size is not None and upload.size > max(limits[media_type] for media_type in media_types):
+        raise RequestEntityTooLargeException(detail=f"Uploaded file is larger than allowed for a {names}")
+
+    upload.file.seek(0)
+    chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+    if (media_type := sniff_media_type(chunk)) is None or media_type not in media_types:
+        raise UnsupportedMediaTypeException(detail=f"Uploaded file must be a {names}")
+    limit = limits[media_type]
+
+    sha256, size = hashlib.sha256(), 0
+    while chunk:
+        size += len(chunk)
+        if size > limit:
+            raise RequestEntityTooLargeException(
+                detail=f"Uploaded {EXTENSIONS[media_type].upper()} is larger than {limit} bytes"
+            )
+        sha256.update(chunk)
+        chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+    digest = sha256.hexdigest()
+    return StoredUpload(filename=blob_filename(digest, media_type), media_type=media_type, size=size, sha256=digest)
+
+
+def save_upload(db: Session, upload: UploadFile, media_types: Collection[str]) -> StoredUpload:
+    """
+    Store an upload as a content-addressed blob (see `inspect_upload` for the checks it goes through), taking a
+    reference to it. Content that is already stored, by whoever uploaded it, isn't written again.
+
+    The reference isn't committed: commit it along with the row that holds the returned filename, which keeps the
+    blob's row locked until then.
+
+    Blocking: call it from a sync endpoint (which runs in the threadpool) or through `run_in_threadpool`.
+    """
+    stored = inspect_upload(upload, media_types)
+    crud.blob.acquire(
+        db, sha256=stored.sha256, filename=stored.filename, media_type=stored.media_type, size=stored.size
+    )
+    if not has_content(stored.filename):
+        upload.file.seek(0)
+        save_content(stored.filename, upload.file)
+    return stored
+
+
+def save_image(db: Session, image: UploadFile) -> StoredUpload:
+    return save_upload(db, image, ("image/png", "image/jpeg"))
+
+
+def save_file(db: Session, file: UploadFile) -> StoredUpload:
+    return save_upload(db, file, ("application/pdf",))
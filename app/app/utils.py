@@ -2,13 +2,10 @@ import logging
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from shutil import copyfileobj
 from typing import Any, Optional
-from uuid import uuid4
 
 import emails
 from emails.template import JinjaTemplate
-from fastapi import UploadFile
 from jose import jwt
 
 import app.core.security
@@ -130,19 +127,5 @@ def verify_password_reset_token(token: str) -> Optional[str]:
         return None
 
 
-def save_image(image: UploadFile) -> str:
-    filename = f"{uuid4()}.{(image.content_type or '').replace('image/', '')}"
-    with open(f"./profile_pictures/{filename}", "wb") as buffer:
-        copyfileobj(image.file, buffer)
-    return filename
-
-
-def save_file(file: UploadFile) -> str:
-    filename = f"{uuid4()}.{(file.content_type or '').replace('application/', '')}"
-    with open(f"./files/{filename}", "wb") as buffer:
-        copyfileobj(file.file, buffer)
-    return filename
-
-
 def generate_uuid() -> str:
     return str(uuid.uuid4())
@@ -0,0 +1,126 @@
+"""
+Compare how long the payloads of `GET /students/` and `GET /lectures/` take to serialize through FastAPI's default
+path (`response_model` validation, `jsonable_encoder`, `JSONResponse`) and through the compiled serializers written
+out with `orjson` (`app.api.serialization.orm_response`).
+
+Objects are built in memory with every relationship the schemas nest, so no database is needed, only the settings
+the app requires. Run from the `app` directory:
+
+    PYTHONPATH=. python scripts/benchmark_serialization.py [number of objects] [repetitions]
+"""
+
+import json
+import sys
+import timeit
+from datetime import date, time
+from typing import Any, Callable, Type
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, parse_obj_as
+
+from app import models, schemas
+from app.api.serialization import orm_response
+from app.utils import generate_uuid
+
+
+def build_students(count: int) -> list[models.Student]:
+    school = models.School(id=generate_uuid(), name="School", head="Head")
+    year = models.Year(
+        id=generate_uuid(), name="2023-24", school_id=school.id, school=school, start_year=2023, end_year=2024
+    )
+    term = models.Term(
+        id=generate_uuid(),
+        name="Term",
+        year_id=year.id,
+        year=year,
+        current_year_term=1,
+        start_date=date(2023, 7, 1),
+        end_date=date(2023, 12, 1),
+        has_electives=False,
+        is_active=True,
+    )
+    students = []
+    for i in range(count):
+        user = models.User(
+            id=generate_uuid(),
+            full_name=f"Student {i}",
+            email=f"student{i}@example.com",
+            is_active=True,
+            is_admin=False,
+            type="student",
+            school_id=school.id,
+            school=school,
+        )
+        students.append(models.Student(user_id=user.id, user=user, term_id=term.id, term=term))
+    return students
+
+
+def build_lectures(count: int) -> list[models.Lecture]:
+    student = build_students(1)[0]
+    term, school = student.term, student.user.school
+    professor_user = models.User(
+        id=generate_uuid(),
+        full_name="Professor",
+        email="professor@example.com",
+        is_active=True,
+        is_admin=False,
+        type="professor",
+        school_id=school.id,
+        school=school,
+    )
+    professor = models.Professor(user_id=professor_user.id, user=professor_user)
+    lectures = []
+    for i in range(count):
+        course = models.Course(id=generate_uuid(), name=f"Course {i}", course_code=f"C{i}", term_id=term.id, term=term)
+        division = models.Division(
+            id=generate_uuid(),
+            course_id=course.id,
+            course=course,
+            division_code=i,
+            professor_id=professor.user_id,
+            professor=professor,
+            number_of_batches=4,
+        )
+        time_slot = models.TimeSlot(
+            id=generate_uuid(), start_time=time(9), end_time=time(10), school_id=school.id, school=school
+        )
+        lectures.append(
+            models.Lecture(
+                id=generate_uuid(),
+                day="Monday",
+                time_slot_id=time_slot.id,
+                time_slot=time_slot,
+                division_id=division.id,
+                division=division,
+                type="theory",
+                room_number="A101",
+            )
+        )
+    return lectures
+
+
+def default_path(schema: Type[BaseModel], objs: list[Any]) -> bytes:
+    return JSONResponse(jsonable_encoder(parse_obj_as(list[schema], objs))).body  # type: ignore
+
+
+def compiled_path(schema: Type[BaseModel], objs: list[Any]) -> bytes:
+    return orm_response(schema, objs).body
+
+
+def benchmark(name: str, schema: Type[BaseModel], build: Callable[[int], list[Any]], count: int, number: int) -> None:
+    objs = build(count)
+    assert json.loads(compiled_path(schema, objs)) == json.loads(default_path(schema, objs)), "Payloads differ"
+    default = min(timeit.repeat(lambda: default_path(schema, objs), number=number, repeat=3)) / number
+    compiled = min(timeit.repeat(lambda: compiled_path(schema, objs), number=number, repeat=3)) / number
+    print(
+        f"{name:<16} {count} objects: response_model {default * 1000:8.2f} ms, compiled + orjson "
+        f"{compiled * 1000:8.2f} ms ({default / compiled:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    benchmark("GET /students/", schemas.Student, build_students, count, number)
+    benchmark("GET /lectures/", schemas.Lecture, build_lectures, count, number)